@@ -0,0 +1,144 @@
+"""
+Сравнение построения списка Brief'ов из полных документов DatasetInfoCollection
+и из документов с проекцией DatasetBrief.PROJECTION в объекты со __slots__.
+
+Документы кодируются в BSON и декодируются так же, как их декодирует драйвер при чтении курсора,
+поэтому время включает разбор ответа сервера. С --uri дополнительно измеряется чтение
+из временной коллекции MongoDB через find без проекции и с проекцией.
+
+Запуск из директории app:
+    python -m benchmarks.bench_briefs [--docs 100000] [--repeat 3] [--uri mongodb://localhost:27017/]
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import bson
+import pymongo
+
+from src.models.DatasetBrief import DatasetBrief
+from src.util.search import search_fields
+
+
+class DictBrief:
+    """
+    Прежний Brief: атрибуты хранятся в словаре экземпляра.
+    """
+
+    def __init__(self, dataset_id, dataset_name, dataset_description, dataset_type, dataset_size):
+        self.dataset_id = dataset_id
+        self.dataset_name = dataset_name or "Unnamed Dataset"
+        self.dataset_description = dataset_description or ""
+        self.dataset_type = dataset_type or "Unknown"
+        self.dataset_size = dataset_size or 0
+
+
+def make_documents(count: int) -> list[dict]:
+    created: datetime = datetime(2024, 1, 1)
+    docs: list[dict] = []
+    for i in range(count):
+        name: str = f'Dataset {i} sales by region'
+        description: str = f'Synthetic dataset number {i} with monthly sales, returns and regional breakdown'
+        docs.append({
+            '_id': str(uuid.uuid4()),
+            'name': name,
+            'description': description,
+            'creationDate': created + timedelta(minutes=i),
+            'author': 'bench',
+            'author_login': 'bench',
+            'rowCount': 1000 + i,
+            'columnCount': 12,
+            'size': round(i / 7, 2),
+            'lastVersionNumber': 1,
+            'lastModifiedDate': created + timedelta(minutes=i),
+            'path': f'/data/{i}.csv',
+            'lastModifiedBy': 'bench',
+            'totalViews': i % 500, 'totalDownloads': i % 50,
+            'views7d': i % 70, 'downloads7d': i % 7, 'views30d': i % 300, 'downloads30d': i % 30,
+            **search_fields(name, description),
+        })
+    return docs
+
+
+def project(doc: dict) -> dict:
+    return {'_id': doc['_id'], **{field: doc[field] for field in DatasetBrief.PROJECTION}}
+
+
+def full_briefs(payload: bytes) -> list:
+    return [
+        DictBrief(str(doc.get('_id')), doc.get('name', 'N/A'), doc.get('description', ''), "CSV", doc.get('size', 0))
+        for doc in bson.decode_all(payload)
+    ]
+
+
+def projected_briefs(payload: bytes) -> list:
+    return [DatasetBrief.from_doc(doc) for doc in bson.decode_all(payload)]
+
+
+def measure(func: Callable[[], object], repeat: int) -> tuple[float, float]:
+    """
+    Лучшее время из `repeat` запусков и пик памяти (МБ) одного запуска с удерживаемым результатом.
+    """
+    best: float = float('inf')
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, peak / 2 ** 20
+
+
+def measure_mongo(uri: str, docs: list[dict], repeat: int) -> list[tuple[str, float]]:
+    client = pymongo.MongoClient(uri)
+    collection = client['bench_briefs'][f'briefs_{uuid.uuid4().hex}']
+    try:
+        collection.insert_many(docs, ordered=False)
+        return [
+            ('find full', measure(lambda: [DictBrief(str(d['_id']), d['name'], d['description'], "CSV", d['size'])
+                                           for d in collection.find()], repeat)[0]),
+            ('find projected', measure(lambda: [DatasetBrief.from_doc(d)
+                                                for d in collection.find({}, DatasetBrief.PROJECTION)], repeat)[0]),
+        ]
+    finally:
+        collection.drop()
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--uri', type=str, default=None)
+    args = parser.parse_args()
+
+    docs: list[dict] = make_documents(args.docs)
+    full_payload: bytes = b''.join(bson.encode(doc) for doc in docs)
+    projected_payload: bytes = b''.join(bson.encode(project(doc)) for doc in docs)
+
+    print(f'documents: {args.docs}, BSON full: {len(full_payload) / 2 ** 20:.1f} MB, '
+          f'projected: {len(projected_payload) / 2 ** 20:.1f} MB')
+
+    header: str = f"{'variant':>16} {'time':>10} {'peak memory':>12}"
+    print(header)
+    print('-' * len(header))
+    for label, func in (('full + dict', lambda: full_briefs(full_payload)),
+                        ('projected+slots', lambda: projected_briefs(projected_payload))):
+        seconds, peak = measure(func, args.repeat)
+        print(f'{label:>16} {seconds * 1000:>8.1f}ms {peak:>10.1f}MB')
+
+    uri: Optional[str] = args.uri
+    if uri:
+        for label, seconds in measure_mongo(uri, docs, args.repeat):
+            print(f'{label:>16} {seconds * 1000:>8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
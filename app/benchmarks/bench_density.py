@@ -0,0 +1,82 @@
+"""
+Сравнение времени построения графиков столбца через seaborn (KDE по всем строкам)
+и через бинированную KDE на FFT из src.services.density.
+
+Запуск из директории app:
+    python -m benchmarks.bench_density [--rows 1000 10000 100000 1000000] [--repeat 3]
+"""
+import argparse
+import time
+from io import BytesIO
+from typing import Callable
+
+import numpy as np
+import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from src.services import density
+from src.services.plot_renderer import PlotTask, compute_column_data, render_column
+
+
+def seaborn_column(values: np.ndarray) -> None:
+    """
+    Прежний способ: seaborn считает KDE по каждому значению для гистограммы и для violin plot.
+    """
+    for draw in (lambda ax: sns.histplot(x=values, color='skyblue', kde=True, bins='auto', ax=ax),
+                 lambda ax: sns.violinplot(y=values, color='skyblue', ax=ax)):
+        fig = Figure(figsize=(4, 2))
+        FigureCanvasAgg(fig)
+        draw(fig.subplots())
+        with BytesIO() as buf:
+            fig.savefig(buf, format='svg', bbox_inches='tight', pad_inches=0, dpi=100)
+
+
+def direct_kde(values: np.ndarray) -> None:
+    """
+    KDE прямым суммированием ядер по всем значениям (без бинирования) на сетке того же размера.
+    """
+    bandwidth: float = density.scott_bandwidth(values)
+    grid: np.ndarray = np.linspace(values.min(), values.max(), density.OUTPUT_POINTS)
+    result: np.ndarray = np.zeros(len(grid))
+    for start in range(0, len(values), 4096):
+        chunk: np.ndarray = values[start:start + 4096]
+        result += np.exp(-0.5 * ((grid[:, None] - chunk[None, :]) / bandwidth) ** 2).sum(axis=1)
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    best: float = float('inf')
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    header: str = f"{'rows':>10} {'seaborn svg':>12} {'binned svg':>12} {'chart data':>12} {'direct kde':>12} {'binned kde':>12}"
+    print(header)
+    print('-' * len(header))
+
+    for rows in args.rows:
+        values: np.ndarray = np.concatenate([rng.normal(0, 1, rows // 2), rng.gamma(2, 2, rows - rows // 2)])
+        task = PlotTask(0, 'value', values, categorical=False)
+
+        timings: list[float] = [
+            measure(lambda: seaborn_column(values), args.repeat),
+            measure(lambda: render_column(task), args.repeat),
+            measure(lambda: compute_column_data(task), args.repeat),
+            measure(lambda: direct_kde(values), args.repeat),
+            measure(lambda: density.binned_kde(values), args.repeat),
+        ]
+        print(f'{rows:>10} ' + ' '.join(f'{t * 1000:>10.1f}ms' for t in timings))
+
+
+if __name__ == '__main__':
+    main()
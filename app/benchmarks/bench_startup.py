@@ -0,0 +1,65 @@
+"""
+Время холодного запуска приложения: импорт run.py и первый запрос в новом процессе.
+Каждый замер выполняется в отдельном интерпретаторе с SERVER_MODE=prefork, поэтому фоновые
+потоки и обслуживание при запуске не запускаются, а измеряется только то, что ждет рабочий процесс gunicorn.
+Дополнительно печатается, какие тяжелые модули оказались загружены после импорта.
+
+Запуск из директории app:
+    python -m benchmarks.bench_startup [--repeat 5] [--path /login]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES: tuple[str, ...] = ('numpy', 'pandas', 'matplotlib', 'seaborn')
+
+PROBE: str = '''
+import json, sys, time
+start = time.perf_counter()
+import run
+imported = time.perf_counter()
+client = run.app.test_client()
+response = client.get(sys.argv[1])
+first_request = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "firstRequest": first_request - imported,
+    "status": response.status_code,
+    "heavy": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+'''
+
+
+def probe(path: str) -> dict:
+    env: dict = {**os.environ, 'SERVER_MODE': 'prefork'}
+    output: str = subprocess.run(
+        [sys.executable, '-c', PROBE, path, *HEAVY_MODULES],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--path', type=str, default='/login')
+    args = parser.parse_args()
+
+    results: list[dict] = [probe(args.path) for _ in range(args.repeat)]
+
+    header: str = f"{'stage':>14} {'median':>10} {'min':>10} {'max':>10}"
+    print(header)
+    print('-' * len(header))
+    for stage in ('import', 'firstRequest'):
+        values: list[float] = [result[stage] * 1000 for result in results]
+        print(f'{stage:>14} {statistics.median(values):>8.1f}ms {min(values):>8.1f}ms {max(values):>8.1f}ms')
+
+    print(f"status of {args.path}: {results[-1]['status']}")
+    print(f"heavy modules loaded: {', '.join(results[-1]['heavy']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,24 @@
 import os
 import shutil
-import pymongo
 import datetime
 
 from pathlib import Path
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash
 
-from run import app
-from src.services.dataset_service import DatasetService
-
-
 env_path = Path(__file__).resolve().parent.parent / '.env'
 load_dotenv(env_path)
 
+# приложение (run.py) не импортируется: заполнению БД не нужны планировщик и фоновые потоки
+from src.repository.activity_repository import ActivityRepository
+from src.repository.connection import db
+from src.services.dataset_service import DatasetService
+
 user: str = os.getenv("MONGO_ROOT_USER")
 password: str = os.getenv("MONGO_ROOT_PASS")
 host: str = os.getenv("HOST")
 port: str = os.getenv("PORT")
-uri: str = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
-db_name: str = os.getenv("MONGO_DB_NAME")
-
-client = pymongo.MongoClient(uri)
-client.admin.command('ping')
-
-db = client[db_name]
+db.command('ping')
 
 
 def add_examples() -> None:
@@ -82,8 +76,8 @@ def add_examples() -> None:
             }
         ])
 
-    if not db.DatasetActivityCollection.find().to_list():
-        db.DatasetActivityCollection.insert_many([
+    if db.DatasetActivitySeries.find_one() is None:
+        example_activity: list[dict] = [
             {
                 "_id": dataset_id1,
                 "statistics": {
@@ -235,12 +229,14 @@ def add_examples() -> None:
                     }
                 }
             },
-        ])
+        ]
+        ActivityRepository.import_statistics(example_activity)
+
+    ActivityRepository.reconcile_activity_totals()
 
     if not db.DatasetGraphsCollection.find().to_list():
-        with app.app_context():
-            for dataset_id in (dataset_id1, dataset_id2, dataset_id3):
-                DatasetService.save_plots(dataset_id)
+        for dataset_id in (dataset_id1, dataset_id2, dataset_id3):
+            DatasetService.save_plots(dataset_id)
 
     if not db.UserCollection.find_one({"_id": "c3d4e5f6-g7h8-9123-i4j5-k6l7m8n9o0p1"}):
         john_pass_hash = generate_password_hash("pa$$word123")
@@ -0,0 +1,69 @@
+"""
+Настройки gunicorn для промышленного запуска:
+    gunicorn -c gunicorn.conf.py run:app
+
+Приложение импортируется один раз в мастер-процессе (preload_app). Соединения с MongoDB,
+планировщик, исполнители задач и буфер активности создаются в каждом рабочем процессе после fork.
+Задачи построения графиков забирает только один процесс на всё развертывание (аренда в SchedulerLocks),
+поэтому JOB_WORKERS и PLOT_WORKERS ограничивают построение графиков независимо от WEB_WORKERS.
+Обслуживание при запуске выполняет в фоне первый рабочий процесс.
+
+Переменные окружения:
+    WEB_WORKERS        - число рабочих процессов (по умолчанию 2 * число ядер + 1);
+    WEB_THREADS        - число потоков в процессе для gthread (по умолчанию 4);
+    WEB_WORKER_CLASS   - gthread (по умолчанию), sync или gevent;
+    WEB_WORKER_CONNECTIONS - число одновременных соединений процесса для gevent;
+    WEB_TIMEOUT, WEB_GRACEFUL_TIMEOUT, WEB_KEEPALIVE, WEB_MAX_REQUESTS - таймауты и перезапуск процессов.
+"""
+import multiprocessing
+import os
+
+os.environ['SERVER_MODE'] = 'prefork'
+
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # модули приложения импортируются в мастере до fork, поэтому стандартная библиотека
+    # должна быть пропатчена раньше них, а не при запуске рабочего процесса
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', 1000))
+
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('WEB_KEEPALIVE', 5))
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker) -> None:
+    """
+    Запускает фоновые потоки рабочего процесса. Первый процесс после запуска мастера (age == 1)
+    еще и запускает обслуживание; процессы, перезапущенные позже, его не повторяют.
+    """
+    from run import app, start_services, start_startup_maintenance
+
+    start_services(app)
+    if worker.age == 1:
+        start_startup_maintenance(app)
+
+
+def worker_exit(server, worker) -> None:
+    """
+    Записывает в БД накопленные инкременты активности перед завершением рабочего процесса
+    и отпускает аренду исполнителя задач, чтобы ее сразу взял другой процесс.
+    """
+    from src.services.activity_buffer import activity_buffer
+    from src.services.job_service import job_workers
+
+    activity_buffer.stop()
+    job_workers.stop()
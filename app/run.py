@@ -4,7 +4,10 @@
 """
 
 import os
+import threading
+import time
 
+from typing import Callable
 from urllib.parse import quote_plus
 from flask import Flask
 from flask_cors import CORS
@@ -13,7 +16,15 @@ from flask_apscheduler import APScheduler
 from src.routers import dataset_routes
 from src.routers import auth_routes
 
+from src.repository.activity_repository import ActivityRepository
 from src.repository.dataset_repository import DatasetRepository
+from src.repository.indexes import IndexRegistry, index_cli
+from src.services.activity_buffer import activity_buffer
+from src.services.job_service import job_workers
+from src.services.scheduler_service import SchedulerService
+
+# повторный запуск процесса в течение этого времени не повторяет обслуживание
+STARTUP_MIN_INTERVAL_SECONDS: float = float(os.getenv('STARTUP_MAINTENANCE_INTERVAL', 300))
 
 # --- Flask App Initialization ---
 app: Flask = Flask(__name__, template_folder='templates')
@@ -28,24 +39,23 @@ password = os.getenv("MONGO_ROOT_PASS")
 host = os.getenv("HOST")
 port = os.getenv("PORT")
 
-app.config['MONGO_URI'] = f"mongodb://root:pass@db:27017"
 app.config['UPLOAD_FOLDER'] = os.getenv('DATASET_DIR', './datasets')
 
 app.config['JOBS'] = [
     {
-        'id': 'daily_dataset_activity_update',
-        'func': 'src.repository.dataset_repository:DatasetRepository.reset_day',  
+        'id': 'daily_dataset_activity_rollup',
+        'func': 'src.services.scheduler_service:SchedulerService.rollup_activity',
         'trigger': 'cron',
-        'hour': 0,                     
-        'minute': 0,
+        'hour': 0,
+        'minute': 2,
         'timezone': 'Europe/Moscow'
     },
     {
-        'id': 'daily_dataset_activity_clean',
-        'func': 'src.repository.dataset_repository:DatasetRepository.clear_old_dates',  
+        'id': 'daily_dataset_activity_totals',
+        'func': 'src.services.scheduler_service:SchedulerService.reconcile_activity_totals',
         'trigger': 'cron',
-        'hour': 0,                     
-        'minute': 0,
+        'hour': 0,
+        'minute': 5,
         'timezone': 'Europe/Moscow'
     }
 ]
@@ -53,15 +63,69 @@ app.config['JOBS'] = [
 scheduler = APScheduler()
 scheduler.api_enabled = True
 scheduler.init_app(app)
-scheduler.start()
 
-with app.app_context():
-    DatasetRepository.reset_day()
-    DatasetRepository.clear_old_dates()
+app.cli.add_command(index_cli)
+
+
+def run_startup_maintenance(flask_app: Flask) -> dict:
+    """
+    Создает индексы, переносит старые данные и пересчитывает счетчики активности.
+    Возвращает длительность каждого шага в секундах для истории запусков.
+    """
+    steps: list[tuple[str, Callable]] = [
+        ('migrateLegacyActivity', ActivityRepository.migrate_legacy_activity),
+        ('backfillSearchFields', DatasetRepository.backfill_search_fields),
+        ('rollupActivity', ActivityRepository.rollup_activity),
+        ('reconcileActivityTotals', ActivityRepository.reconcile_activity_totals),
+    ]
+    if os.getenv('APPLY_INDEXES_ON_STARTUP', 'true').lower() == 'true':
+        steps.insert(0, ('applyIndexes', IndexRegistry.apply))
+
+    durations: dict[str, float] = {}
+    with flask_app.app_context():
+        for name, step in steps:
+            start: float = time.perf_counter()
+            step()
+            durations[name] = round(time.perf_counter() - start, 3)
+    return durations
+
+
+def start_startup_maintenance(flask_app: Flask) -> threading.Thread:
+    """
+    Запускает обслуживание в фоновом потоке, чтобы процесс сразу начал принимать запросы.
+    Обслуживание выполняется под арендой планировщика: одновременно запущенные реплики
+    выполняют его один раз.
+    """
+    thread = threading.Thread(
+        target=SchedulerService.run_exclusive,
+        args=('startup_maintenance', lambda: run_startup_maintenance(flask_app), STARTUP_MIN_INTERVAL_SECONDS),
+        name='startup-maintenance',
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def start_services(flask_app: Flask) -> None:
+    """
+    Запускает фоновые потоки процесса: планировщик, исполнителей задач и запись буфера активности.
+    Потоки не переживают fork, поэтому под gunicorn функция вызывается в каждом рабочем процессе.
+    """
+    scheduler.start()
+
+    job_workers.init_app(flask_app)
+    job_workers.start()
+
+    activity_buffer.init_app(flask_app)
+    activity_buffer.start()
 
 
+# под gunicorn (SERVER_MODE=prefork) обслуживание и фоновые потоки запускают хуки gunicorn.conf.py
+if os.getenv('SERVER_MODE', 'dev') == 'dev':
+    start_services(app)
+    start_startup_maintenance(app)
 
 CORS(app)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG', 'True').lower() == 'true')
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG', 'false').lower() == 'true')
@@ -1,5 +1,9 @@
-from src.services.user_service import UserService
-from flask import render_template
+from src.repository.connection import mongo
+from src.repository.scheduler_repository import SchedulerRepository
+from src.services.activity_buffer import activity_buffer
+from src.services.dataset_service import filter_cache
+from src.services.user_service import UserService, user_cache
+from flask import Response, jsonify, render_template
 
 class AdminController:
     """
@@ -28,3 +32,16 @@ class AdminController:
         """
         
         return render_template('admin_panel.html', users=UserService.get_users())
+
+    @staticmethod
+    def get_metrics() -> Response:
+        """
+        Возвращает внутренние метрики приложения
+        """
+        return jsonify({
+            'activityBuffer': activity_buffer.metrics(),
+            'filterCache': filter_cache.metrics(),
+            'userCache': user_cache.metrics(),
+            'mongo': mongo.metrics(),
+            'schedulerHistory': SchedulerRepository.get_history(),
+        })
@@ -3,19 +3,24 @@
 """
 import os
 
-from io import BytesIO
+from datetime import date, timedelta
 from pathlib import PosixPath
-from typing import Optional
-from flask import render_template, Request, Response, current_app, make_response, jsonify, flash, redirect, url_for, send_file
+from typing import Iterator, Optional
+from flask import render_template, Request, Response, current_app, make_response, jsonify, flash, redirect, url_for
+from bson import json_util
 from flask_login import current_user
 from werkzeug.datastructures import FileStorage
 
 from src.models.Dataset import Dataset
-from src.models.DatasetActivity import DatasetActivity
+from src.models.DatasetActivity import GRANULARITIES, DatasetActivity
 from src.models.DatasetFormValues import DatasetFormValues
+from src.models.DatasetJob import DatasetJob
+from src.models.DatasetPreview import DatasetPreview
 from src.models.FilterValues import FilterValues
-from src.services.dataset_service import DatasetService
-from werkzeug.exceptions import BadRequest
+from src.services.dataset_service import ACTIVITY_HISTORY_DAYS, DatasetService
+from src.services.job_service import JobService
+from src.util.csv_upload import UploadedCsv, remove_row_index, spool_csv_upload
+from werkzeug.exceptions import BadRequest, NotFound
 
 
 class DatasetController:
@@ -24,13 +29,15 @@ class DatasetController:
     """
     @staticmethod
     def update_dataset(dataset_id: str, form_values: DatasetFormValues, editor_username: str, filepath: str) -> None:
-        old_dataset: Dataset = DatasetService.get_dataset(dataset_id)
+        old_dataset: Optional[Dataset] = DatasetService.get_dataset(dataset_id)
+        if old_dataset is None:
+            raise Exception(f'Element with {dataset_id} not found')
 
         dataset: Dataset = Dataset.from_form_values(form_values, old_dataset.dataset_id, old_dataset.dataset_author,
                                                     old_dataset.dataset_author_login,
                                                     filepath)
 
-        if not form_values.dataset_data:
+        if not form_values.dataset_file:
             dataset.dataset_columns = old_dataset.dataset_columns
             dataset.dataset_rows = old_dataset.dataset_rows
             dataset.dataset_size = old_dataset.dataset_size
@@ -44,30 +51,49 @@ class DatasetController:
     @staticmethod
     def render_all_datasets() -> str:
         """
-        Обращается к методу сервиса для получения списка Brief'ов всех датасетов в БД.
-        Отображает страницу с полученными датасетами.
+        Обращается к методу сервиса для получения первой страницы Brief'ов всех датасетов в БД.
+        Отображает страницу с полученными датасетами. Следующие страницы подгружаются при прокрутке.
         """
-        all_datasets_brief = DatasetService.get_all_datasets_brief()
-        return render_template('all_datasets.html', datasets_brief=all_datasets_brief)
+        all_datasets_brief, next_token = DatasetService.get_all_datasets_brief()
+        return render_template('all_datasets.html', datasets_brief=all_datasets_brief, next_token=next_token)
 
     @staticmethod
-    def filter_datasets(request: Request) -> Response:
+    def filter_datasets(request: Request) -> Response | BadRequest:
         """
-        Обращается к методу сервиса для получения списка Brief'ов датасетов, которые прошли фильтрацию.
+        Обращается к методу сервиса для получения страницы Brief'ов датасетов, которые прошли фильтрацию.
+        Поле формы `after` содержит токен следующей страницы из предыдущего ответа.
+        Ответ: {"items": [...], "next": токен или null, если страница последняя}.
+        В режиме отладки (debug или FILTER_EXPLAIN=true) с полем формы `explain`
+        вместо страницы возвращаются план запроса и вывод explain MongoDB.
         """
 
         filters: FilterValues = DatasetService.extract_filter_values(request)
-        filtered_briefs: list = DatasetService.get_filtered_briefs(filters)
+        after: Optional[str] = request.form.get('after') or None
 
-        response: Response = make_response(jsonify([brief.to_dict() for brief in filtered_briefs]), 200)
+        if request.form.get('explain') and (current_app.debug or os.getenv('FILTER_EXPLAIN', 'false').lower() == 'true'):
+            try:
+                explained: dict = DatasetService.explain_filtered_briefs(filters, after)
+            except ValueError as e:
+                return BadRequest(f'Invalid page token: {e}')
+            return current_app.response_class(json_util.dumps(explained), mimetype='application/json')
+
+        try:
+            filtered_briefs, next_token = DatasetService.get_filtered_briefs(filters, after)
+        except ValueError as e:
+            return BadRequest(f'Invalid page token: {e}')
+
+        response: Response = make_response(jsonify({
+            'items': [brief.to_dict() for brief in filtered_briefs],
+            'next': next_token
+        }), 200)
         return response
 
     @staticmethod
-    def add_dataset(request: Request) -> Response:
+    def add_dataset(request: Request) -> Response | BadRequest:
         """
         Создается объект DatasetFormData из данных request'а.
         Обращается к методу сервиса для добавления датасета в БД.
-        Сохраняется файл в выделенной директории.
+        Файл, сохраненный во временный файл при разборе формы, переименовывается в выделенной директории.
         Возвращается response, содержащий URL страницы, открываемой после добавления.
         """
         try:
@@ -75,19 +101,24 @@ class DatasetController:
         except Exception:
             username = 'noname'
 
-        form_values: DatasetFormValues = DatasetController._extract_form_values(request)
+        try:
+            form_values: DatasetFormValues = DatasetController._extract_form_values(request)
+        except ValueError as e:
+            return BadRequest(f'Invalid dataset file: {e}')
+        if form_values.dataset_file is None:
+            return BadRequest('Dataset file is required')
 
         filepath: str = current_app.config['UPLOAD_FOLDER']
-        dataset_id = DatasetService.save_dataset(form_values, author_username=username, filepath=filepath)
-
-        filepath = os.path.join(filepath, f'{dataset_id}.csv')
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'x') as file:
-            file.writelines(form_values.dataset_data)
+        try:
+            dataset_id = DatasetService.save_dataset(form_values, author_username=username, filepath=filepath)
+        except Exception:
+            form_values.dataset_file.discard()
+            raise
 
-        DatasetService.init_dataset_activity(dataset_id)
+        form_values.dataset_file.move_to(os.path.join(filepath, f'{dataset_id}.csv'))
+        DatasetService.save_preview(dataset_id, 1, form_values.dataset_file)
 
-        DatasetService.save_plots(dataset_id)
+        JobService.enqueue_plots(dataset_id, dataset_version=1)
         response: Response = make_response()
         response.headers['redirect'] = '/datasets/'
         return response
@@ -100,11 +131,13 @@ class DatasetController:
         return render_template('add_dataset.html')
 
     @staticmethod
-    def render_edit_dataset(dataset_id: str) -> str | BadRequest:
+    def render_edit_dataset(dataset_id: str) -> str | BadRequest | NotFound:
         """
         Обращается к методу сервиса для получения объекта Brief для датасета с индексом dataset_id.
         """
-        dataset_brief: Dataset = DatasetService.get_dataset(dataset_id)
+        dataset_brief: Optional[Dataset] = DatasetService.get_dataset(dataset_id)
+        if dataset_brief is None:
+            return NotFound('Dataset not found')
         if dataset_brief.dataset_author_login != current_user.login and not current_user.is_admin:
             return BadRequest('Invalid user')
 
@@ -122,10 +155,14 @@ class DatasetController:
             return BadRequest(f'Invalid user: {e}')
 
         DatasetService.remove_graphs(dataset_id)
+        DatasetService.remove_preview(dataset_id)
+        DatasetService.remove_dataset_activity(dataset_id)
+        JobService.remove_dataset_jobs(dataset_id)
 
         filepath: str = current_app.config['UPLOAD_FOLDER']
         filepath = os.path.join(filepath, f'{dataset_id}.csv')
         PosixPath(filepath).unlink()
+        remove_row_index(filepath)
 
         response: Response = make_response()
         response.headers['redirect'] = f'/datasets/{dataset_id}'
@@ -136,9 +173,9 @@ class DatasetController:
         """
         Создается объект DatasetFormData из данных request'а.
         Обращается к методу сервиса для изменения датасета в БД.
-        Сохраняется файл в выделенной директории.
+        Новый файл, если он был передан, переименовывается в выделенной директории.
         Возвращается response, содержащий URL страницы, открываемой после добавления.
-        В случае смены файла, графики перерисовываются.
+        В случае смены файла, графики перерисовываются в фоновой задаче.
         """
 
         try:
@@ -146,36 +183,49 @@ class DatasetController:
         except Exception as e:
             return BadRequest(f'Invalid user: {e}')
 
-        form_values: DatasetFormValues = DatasetController._extract_form_values(request)
+        try:
+            form_values: DatasetFormValues = DatasetController._extract_form_values(request)
+        except ValueError as e:
+            return BadRequest(f'Invalid dataset file: {e}')
 
         try:
-            DatasetService.update_dataset(dataset_id, form_values, editor_username=username,
-                                          filepath=current_app.config['UPLOAD_FOLDER'])
+            dataset: Dataset = DatasetService.update_dataset(dataset_id, form_values, editor_username=username,
+                                                             filepath=current_app.config['UPLOAD_FOLDER'])
         except Exception as e:
+            if form_values.dataset_file:
+                form_values.dataset_file.discard()
             return BadRequest(f'Invalid user: {e}')
 
         file_changed: bool = False
-        if request.files['dataset']:
+        if form_values.dataset_file:
             filepath: str = current_app.config['UPLOAD_FOLDER']
-            filepath: str = os.path.join(filepath, f'{dataset_id}.csv')
-            with open(filepath, 'w') as file:
-                file.writelines(form_values.dataset_data)
+            form_values.dataset_file.move_to(os.path.join(filepath, f'{dataset_id}.csv'))
+            DatasetService.save_preview(dataset_id, dataset.dataset_version, form_values.dataset_file)
             file_changed = True
 
         if file_changed:
-            DatasetService.update_graphs(dataset_id)
+            JobService.enqueue_plots(dataset_id, dataset_version=dataset.dataset_version)
+        else:
+            DatasetService.keep_preview(dataset_id, dataset.dataset_version)
 
         response: Response = make_response()
         response.headers['redirect'] = f'/datasets/'
         return response
 
     @staticmethod
-    def get_dataset(dataset_id: str) -> Dataset:
+    def get_dataset(dataset_id: str) -> Optional[Dataset]:
         """
-        Возвращается структура, содержащая данные о датасете.
+        Возвращается структура, содержащая данные о датасете, или None, если датасета нет.
         """
-        dataset: Dataset = DatasetService.get_dataset(dataset_id)
+        dataset: Optional[Dataset] = DatasetService.get_dataset(dataset_id)
         return dataset
+
+    @staticmethod
+    def get_preview(dataset: Dataset) -> DatasetPreview:
+        """
+        Возвращает заголовок и первые строки датасета для таблицы на его странице.
+        """
+        return DatasetService.get_preview(dataset)
     
     @staticmethod
     def incr_dataset_views(dataset_id: str) -> None:
@@ -194,33 +244,148 @@ class DatasetController:
         return activity
 
     @staticmethod
-    def get_plots(dataset_id: str) -> Optional[dict[list]]:
-        return DatasetService.get_plots(dataset_id)
+    def get_plots_index(dataset_id: str) -> Optional[dict]:
+        return DatasetService.get_plots_index(dataset_id)
+
+    @staticmethod
+    def get_plot(dataset_id: str, col_idx: int, request: Request) -> Response:
+        """
+        Возвращает один график столбца `col_idx`.
+        ETag строится из версии датасета (lastVersionNumber), для которой построены графики.
+        Страница запрашивает график по URL с этой версией (`?v=`), поэтому такой ответ кэшируется надолго.
+        Запрос с устаревшей версией перенаправляется на URL текущей версии, без версии - отдается
+        с обязательной проверкой ETag.
+        """
+        plot: Optional[dict] = DatasetService.get_plot(dataset_id, col_idx)
+        if plot is None:
+            return make_response(jsonify({'error': 'Plot not found'}), 404)
+
+        requested_version: Optional[str] = request.args.get('v')
+        current_version: str = str(plot['version'])
+        if requested_version is not None and requested_version != current_version:
+            response: Response = redirect(f'{request.path}?v={current_version}')
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        graph: dict = plot['graph']
+        for key in ('data', 'violin'):
+            if isinstance(graph.get(key), bytes):
+                graph[key] = graph[key].decode('utf-8')
+
+        response = make_response(jsonify(graph), 200)
+        response.set_etag(f'{dataset_id}-{current_version}-{col_idx}')
+        if requested_version is None:
+            response.headers['Cache-Control'] = 'private, no-cache'
+        else:
+            response.headers['Cache-Control'] = f"private, max-age={int(os.getenv('PLOT_CACHE_MAX_AGE', 31536000))}, immutable"
+        return response.make_conditional(request)
+
+    @staticmethod
+    def get_rows(dataset_id: str, request: Request) -> Response | BadRequest:
+        """
+        Возвращает страницу строк датасета: `limit` записей, начиная с записи `offset`.
+        Размер страницы ограничен MAX_ROWS_PAGE.
+        """
+        try:
+            offset: int = int(request.args.get('offset', 0))
+            limit: int = int(request.args.get('limit', os.getenv('MAX_ROWS_NUM', 30)))
+        except ValueError:
+            return BadRequest('Invalid offset or limit')
+
+        if offset < 0 or limit < 0:
+            return BadRequest('Invalid offset or limit')
+        limit = min(limit, int(os.getenv('MAX_ROWS_PAGE', 100)))
+
+        dataset: Optional[Dataset] = DatasetService.get_dataset(dataset_id)
+        if dataset is None:
+            return make_response(jsonify({'error': 'Dataset not found'}), 404)
+
+        try:
+            rows: list[list[str]] = DatasetService.get_rows(dataset, offset, limit)
+        except FileNotFoundError:
+            return make_response(jsonify({'error': 'CSV file not found'}), 404)
+
+        return make_response(jsonify({
+            'offset': offset,
+            'limit':  limit,
+            'total':  dataset.dataset_rows,
+            'rows':   rows,
+        }), 200)
+
+    @staticmethod
+    def get_activity_series(dataset_id: str, request: Request) -> Response | BadRequest:
+        """
+        Возвращает просмотры и загрузки датасета за диапазон ?from=&to= (YYYY-MM-DD)
+        по дням, неделям или месяцам (?granularity=). Без уровня он выбирается по длине диапазона.
+        """
+        try:
+            date_to: date = date.fromisoformat(request.args['to']) if request.args.get('to') else date.today()
+            date_from: date = date.fromisoformat(request.args['from']) if request.args.get('from') \
+                else date_to - timedelta(days=ACTIVITY_HISTORY_DAYS - 1)
+        except ValueError:
+            return BadRequest('Invalid date range')
+
+        granularity: Optional[str] = request.args.get('granularity') or None
+        if date_from > date_to or (granularity is not None and granularity not in GRANULARITIES):
+            return BadRequest('Invalid date range or granularity')
+
+        if granularity == 'day' and (date_to - date_from).days >= int(os.getenv('MAX_ACTIVITY_DAYS', 366)):
+            return BadRequest('Date range is too long for daily granularity')
+
+        activity: DatasetActivity = DatasetService.get_activity_series(dataset_id, date_from, date_to, granularity)
+        return make_response(jsonify(activity.to_dict()), 200)
 
     @staticmethod
-    def export_datasets() -> Response:
+    def has_pending_jobs(dataset_id: str) -> bool:
+        return JobService.has_pending_jobs(dataset_id)
+
+    @staticmethod
+    def get_dataset_jobs(dataset_id: str) -> Response:
+        """
+        Возвращает статус фоновых задач датасета.
+        """
+        jobs: list[DatasetJob] = JobService.get_dataset_jobs(dataset_id)
+        return make_response(jsonify({
+            'pending': any(job.is_pending for job in jobs),
+            'jobs': [job.to_dict() for job in jobs],
+        }), 200)
+
+    @staticmethod
+    def export_datasets(request: Request) -> Response | BadRequest:
         """
         Обращается к методу сервиса для получения архива, содержащего дамп БД.
+        Параметр `mode=delta` запрашивает инкрементальную копию - изменения с момента предыдущей копии.
+        Архив отдается потоком по мере формирования, поэтому длина ответа заранее неизвестна.
         """
-        zip_file_bytes: BytesIO
+        chunks: Iterator[bytes]
         file_name: str
-        zip_file_bytes, file_name = DatasetService.export_datasets_archive()
-
-        response = make_response(send_file(
-            zip_file_bytes,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=file_name
-        ))
+        try:
+            chunks, file_name = DatasetService.export_datasets_archive(request.args.get('mode', 'full'))
+        except ValueError as e:
+            return BadRequest(str(e))
+
+        response: Response = current_app.response_class(
+            chunks, mimetype='application/zip', direct_passthrough=True
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename={file_name}'
+        # обратный прокси не должен накапливать архив целиком перед отправкой клиенту
+        response.headers['X-Accel-Buffering'] = 'no'
         return response
 
     @staticmethod
-    def import_datasets(request: Request) -> Response:
+    def import_datasets(request: Request) -> Response | BadRequest:
         """
-        Обращается к методу сервиса для загрузки архива, содержащего дамп БД.
+        Обращается к методу сервиса для загрузки архивов, содержащих дамп БД:
+        полной копии и/или цепочки инкрементальных копий в поле `backup`.
         """
-        backup: FileStorage = request.files['backup']
-        DatasetService.import_datasets_archive(backup)
+        backups: list[FileStorage] = request.files.getlist('backup')
+        if not backups:
+            return BadRequest('No backup archives')
+
+        try:
+            DatasetService.import_datasets_archive(backups)
+        except ValueError as e:
+            return BadRequest(str(e))
 
         response: Response = make_response()
         response.headers['redirect'] = f'/datasets/'
@@ -228,10 +393,18 @@ class DatasetController:
 
     @staticmethod
     def _extract_form_values(request) -> DatasetFormValues:
+        """
+        Достает значения формы. Файл датасета копируется блоками во временный файл
+        в UPLOAD_FOLDER без чтения в память целиком.
+        """
         form_data = request.form
         dataset_name: str = form_data['name']
         dataset_description: str = form_data['description']
 
-        dataset_fs: FileStorage = request.files['dataset']
-        dataset_data = '\n'.join([v.decode('utf-8').strip() for v in dataset_fs.readlines()])
-        return DatasetFormValues(dataset_name, dataset_description, dataset_data)
\ No newline at end of file
+        dataset_fs: Optional[FileStorage] = request.files.get('dataset')
+        dataset_file: Optional[UploadedCsv] = spool_csv_upload(
+            dataset_fs, current_app.config['UPLOAD_FOLDER'],
+            preview_rows=int(os.getenv('MAX_ROWS_NUM', 30)),
+            preview_cols=int(os.getenv('MAX_COLS_NUM', 30))
+        )
+        return DatasetFormValues(dataset_name, dataset_description, dataset_file)
\ No newline at end of file
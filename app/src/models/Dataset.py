@@ -2,9 +2,6 @@
 Структура для хранения информации о датасете.
 """
 from datetime import datetime
-from io import StringIO
-
-import pandas as pd
 
 from src.models.DatasetFormValues import DatasetFormValues
 
@@ -14,6 +11,18 @@ class Dataset:
     Структура для хранения информации о датасете.
     """
 
+    __slots__ = (
+        'dataset_id', 'dataset_name', 'dataset_description', 'dataset_creation_date', 'dataset_author',
+        'dataset_author_login', 'dataset_columns', 'dataset_rows', 'dataset_size', 'dataset_version',
+        'dataset_last_update', 'dataset_path', 'dataset_last_editor',
+    )
+
+    # поля документа DatasetInfoCollection, из которых строится объект
+    PROJECTION: dict = {
+        'name': 1, 'description': 1, 'creationDate': 1, 'author': 1, 'author_login': 1, 'rowCount': 1,
+        'columnCount': 1, 'size': 1, 'lastVersionNumber': 1, 'lastModifiedDate': 1, 'path': 1, 'lastModifiedBy': 1,
+    }
+
     def __init__(
             self,
             dataset_id: str,
@@ -44,6 +53,16 @@ class Dataset:
         self.dataset_path: str = dataset_path
         self.dataset_last_editor: str = dataset_last_editor
 
+    @classmethod
+    def from_doc(cls, doc: dict):
+        """
+        Альтернативный конструктор из документа DatasetInfoCollection.
+        """
+        return cls(str(doc['_id']), doc['name'], doc['description'], doc['creationDate'],
+                   doc['author'], doc['author_login'], doc['rowCount'], doc['columnCount'],
+                   doc['size'], doc['lastVersionNumber'], doc['lastModifiedDate'], doc['path'],
+                   doc['lastModifiedBy'])
+
     @classmethod
     def from_form_values(cls, form_values: DatasetFormValues, dataset_id: str, author: str, author_login: str, filepath: str):
         """
@@ -55,11 +74,10 @@ class Dataset:
         dataset_path: str = filepath
         dataset_version: int = 1
 
-        if form_values.dataset_data:
-            df: pd.DataFrame = pd.read_csv(StringIO(form_values.dataset_data))
-            dataset_rows: int = df.shape[0]
-            dataset_columns: int = df.shape[1]
-            dataset_size: float = round(len(form_values.dataset_data.encode()) / 1024, 2)
+        if form_values.dataset_file:
+            dataset_rows: int = form_values.dataset_file.rows
+            dataset_columns: int = form_values.dataset_file.columns
+            dataset_size: float = round(form_values.dataset_file.size / 1024, 2)
         else:
             dataset_rows: int = 0
             dataset_columns: int = 0
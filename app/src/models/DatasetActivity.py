@@ -1,6 +1,12 @@
+from datetime import date, timedelta
+
+GRANULARITIES: tuple[str, ...] = ('day', 'week', 'month')
+
+
 class DatasetActivity:
-    def __init__(self,dataset_id , activity_dict: dict):
+    def __init__(self,dataset_id , activity_dict: dict, granularity: str = 'day'):
         self.dataset_id = dataset_id
+        self.granularity = granularity
         activities = sorted(activity_dict['statistics'].items())
         self.statistics = {
             'dates': [],
@@ -16,3 +22,31 @@ class DatasetActivity:
             self.statistics['downloads'].append(i[1]['downloads'])
     
         
+
+
+    @staticmethod
+    def period_start(day: date, granularity: str) -> date:
+        """
+        Возвращает начало периода (дня, недели с понедельника или месяца), в который попадает `day`.
+        """
+        if granularity == 'week':
+            return day - timedelta(days=day.weekday())
+        if granularity == 'month':
+            return day.replace(day=1)
+        return day
+
+    def to_dict(self) -> dict:
+        return {'granularity': self.granularity, **self.statistics}
+
+    def add_pending(self, pending: dict[str, dict[str, int]]) -> None:
+        """
+        Добавляет к статистике инкременты, которые еще не записаны в БД.
+        Инкремент учитывается, только если его период входит в статистику.
+        """
+        for day, counters in sorted(pending.items()):
+            period: str = str(DatasetActivity.period_start(date.fromisoformat(day), self.granularity))
+            if period not in self.statistics['dates']:
+                continue
+            i = self.statistics['dates'].index(period)
+            self.statistics['views'][i] += counters.get('views', 0)
+            self.statistics['downloads'][i] += counters.get('downloads', 0)
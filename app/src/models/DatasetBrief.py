@@ -6,8 +6,14 @@
 class DatasetBrief:
     """
     Класс для хранения краткой информации о датасете.
+    Списки Brief'ов бывают большими, поэтому атрибуты хранятся в __slots__, а не в словаре экземпляра.
     """
 
+    __slots__ = ('dataset_id', 'dataset_name', 'dataset_description', 'dataset_type', 'dataset_size')
+
+    # поля документа DatasetInfoCollection, которые нужны карточке датасета
+    PROJECTION: dict = {'name': 1, 'description': 1, 'size': 1}
+
     def __init__(
             self,
             dataset_id: str | None = None,
@@ -22,6 +28,13 @@ class DatasetBrief:
         self.dataset_type: str = dataset_type or "Unknown"
         self.dataset_size: int = dataset_size or 0
 
+    @classmethod
+    def from_doc(cls, doc: dict):
+        """
+        Альтернативный конструктор из документа DatasetInfoCollection с проекцией PROJECTION.
+        """
+        return cls(str(doc['_id']), doc.get('name'), doc.get('description'), "CSV", doc.get('size'))
+
     def to_dict(self) -> dict:
         """
         Преобразует объект в словарь для сериализации в JSON
@@ -1,6 +1,9 @@
 """
 Структура для хранения основных данных из формы создания датасета.
 """
+from typing import Optional
+
+from src.util.csv_upload import UploadedCsv
 
 
 class DatasetFormValues:
@@ -8,7 +11,7 @@ class DatasetFormValues:
     Структура для хранения данных из формы создания датасета.
     """
 
-    def __init__(self, dataset_name: str, dataset_description: str, dataset_data: str):
+    def __init__(self, dataset_name: str, dataset_description: str, dataset_file: Optional[UploadedCsv]):
         self.dataset_name: str = dataset_name
         self.dataset_description: str = dataset_description
-        self.dataset_data: str = dataset_data
+        self.dataset_file: Optional[UploadedCsv] = dataset_file
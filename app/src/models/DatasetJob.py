@@ -0,0 +1,51 @@
+"""
+Структура для хранения информации о фоновой задаче датасета.
+"""
+from datetime import datetime
+from typing import Optional
+
+
+class JobCancelled(Exception):
+    """
+    Выбрасывается обработчиком, если задачу больше не нужно выполнять (например, датасет удален).
+    Такая задача не повторяется.
+    """
+
+
+class DatasetJob:
+    """
+    Фоновая задача, связанная с датасетом (например, построение графиков).
+    """
+
+    def __init__(self, job_document: dict):
+        self.job_id: str = job_document['_id']
+        self.job_type: str = job_document['type']
+        self.dataset_id: str = job_document['datasetId']
+        self.status: str = job_document['status']
+        self.attempts: int = job_document.get('attempts', 0)
+        self.max_attempts: int = job_document.get('maxAttempts', 1)
+        self.progress: dict = job_document.get('progress') or {'done': 0, 'total': 0}
+        self.error: Optional[str] = job_document.get('error')
+        self.created_at: datetime = job_document.get('createdAt')
+        self.finished_at: Optional[datetime] = job_document.get('finishedAt')
+
+    @property
+    def is_pending(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def to_dict(self) -> dict:
+        """
+        Преобразует объект в словарь для сериализации в JSON
+        """
+        return {
+            'job_id': self.job_id,
+            'type': self.job_type,
+            'dataset_id': self.dataset_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,27 @@
+"""
+Структура для хранения предпросмотра датасета.
+"""
+
+
+class DatasetPreview:
+    """
+    Заголовок и первые строки датасета, отображаемые на его странице.
+    Снимок относится к версии датасета `dataset_version`.
+    """
+
+    def __init__(self, dataset_id: str, dataset_version: int, headers: list[str], rows: list[list[str]]):
+        self.dataset_id: str = dataset_id
+        self.dataset_version: int = dataset_version
+        self.headers: list[str] = headers
+        self.rows: list[list[str]] = rows
+
+    def to_dict(self) -> dict:
+        """
+        Метод для представления объекта класса в виде словаря.
+        """
+        return {
+            '_id':     self.dataset_id,
+            'version': self.dataset_version,
+            'headers': self.headers,
+            'rows':    self.rows,
+        }
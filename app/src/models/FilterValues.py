@@ -1,9 +1,13 @@
 """
 Структура для хранения фильтров отображения датасетов на главной странице.
 """
+import hashlib
+import json
 from typing import Optional
 from datetime import datetime
 
+from src.util.search import normalize
+
 
 class FilterValues:
     """
@@ -44,3 +48,12 @@ class FilterValues:
         self.modify_date_to: Optional[datetime] = modify_date_to
 
         self.sort: Optional[dict] = sort
+
+    def cache_key(self) -> str:
+        """
+        Канонический ключ фильтров: формы, отличающиеся только регистром и пробелами в названии
+        или порядком полей, дают один и тот же ключ.
+        """
+        values: dict = {**vars(self), 'name': normalize(self.name)}
+        canonical: str = json.dumps(values, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
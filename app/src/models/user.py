@@ -11,6 +11,12 @@ class User(UserMixin):
     """
     Класс пользователя. Использует UserMixin для интеграции с Flask-Login.
     """
+
+    __slots__ = (
+        '_id', 'username', 'login', 'password_hash', 'status', 'createdDatasetsCount',
+        'accountCreationDate', 'lastAccountModificationDate',
+    )
+
     def __init__(self, user_data: dict):
         """
         Инициализирует пользователя из словаря данных MongoDB.
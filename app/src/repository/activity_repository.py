@@ -0,0 +1,398 @@
+"""
+Содержит репозиторий активности датасетов (просмотры и загрузки по дням).
+Активность хранится как временной ряд: один документ коллекции DatasetActivitySeries на датасет и месяц,
+дни без просмотров и загрузок в документе отсутствуют и считаются нулями.
+Старые документы удаляет сама MongoDB по TTL-индексу на поле expireAt.
+
+Прежде чем документы месяцев удаляются, задача rollup_activity сворачивает завершенные месяцы
+в недельные и месячные суммы (коллекция DatasetActivityRollups, один документ на датасет, уровень и год).
+Недельные суммы хранятся ACTIVITY_WEEKLY_RETENTION_DAYS дней, месячные - все время жизни датасета,
+поэтому объем истории ограничен, а сама история охватывает годы.
+"""
+import os
+
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import pymongo
+
+from src.models.DatasetActivity import GRANULARITIES, DatasetActivity
+from src.repository.connection import db
+from src.repository.dataset_repository import ACTIVITY_TOTAL_FIELDS, ACTIVITY_WINDOWS, DatasetRepository
+
+ACTIVITY_HISTORY_DAYS: int = 30
+ROLLUP_TIERS: tuple[str, ...] = ('week', 'month')
+LEGACY_ACTIVITY_COLLECTION: str = 'DatasetActivityCollection'
+RECONCILE_BATCH_SIZE: int = 1000
+
+
+def _month_key(day: date) -> str:
+    return day.strftime('%Y-%m')
+
+
+def _bucket_id(dataset_id: str, month: str) -> str:
+    return f'{dataset_id}:{month}'
+
+
+def _bucket_expire_at(month: str) -> datetime:
+    """
+    Документ месяца удаляется через ACTIVITY_RETENTION_DAYS дней после окончания месяца.
+    """
+    month_start: datetime = datetime.strptime(month, '%Y-%m')
+    next_month: datetime = (month_start + timedelta(days=32)).replace(day=1)
+    return next_month + timedelta(days=int(os.getenv('ACTIVITY_RETENTION_DAYS', ACTIVITY_HISTORY_DAYS)))
+
+
+def _rollup_id(dataset_id: str, tier: str, year: int) -> str:
+    return f'{dataset_id}:{tier}:{year}'
+
+
+def _rollup_expire_at(tier: str, year: int) -> Optional[datetime]:
+    """
+    Недельные суммы удаляются через ACTIVITY_WEEKLY_RETENTION_DAYS дней после окончания года,
+    месячные хранятся всегда.
+    """
+    if tier != 'week':
+        return None
+    return datetime(year + 1, 1, 1) + timedelta(days=int(os.getenv('ACTIVITY_WEEKLY_RETENTION_DAYS', 730)))
+
+
+def _iter_periods(date_from: date, date_to: date, granularity: str) -> list[date]:
+    periods: list[date] = []
+    period: date = DatasetActivity.period_start(date_from, granularity)
+    while period <= date_to:
+        periods.append(period)
+        if granularity == 'day':
+            period += timedelta(days=1)
+        elif granularity == 'week':
+            period += timedelta(days=7)
+        else:
+            period = (period + timedelta(days=32)).replace(day=1)
+    return periods
+
+
+class ActivityRepository:
+    """
+    Класс-репозиторий для активности датасетов.
+    """
+
+    @staticmethod
+    def apply_activity_increments(increments: dict[tuple[str, str], dict[str, int]]) -> None:
+        """
+        Записывает накопленные инкременты просмотров и загрузок одним bulk_write.
+        Ключ - (id датасета, дата в формате YYYY-MM-DD), значение - прибавки к счетчикам.
+        Документ месяца создается при первом инкременте за этот месяц.
+        Вместе со статистикой по дням увеличиваются итоговые счетчики в DatasetInfoCollection.
+        """
+        bulk_operations = []
+        totals: dict[str, dict[str, int]] = {}
+
+        for (dataset_id, day), counters in increments.items():
+            views: int = counters.get('views', 0)
+            downloads: int = counters.get('downloads', 0)
+            bulk_operations.append(ActivityRepository._increment_operation(dataset_id, day, views, downloads))
+
+            age: int = (date.today() - date.fromisoformat(day)).days
+            dataset_totals: dict[str, int] = totals.setdefault(dataset_id, dict.fromkeys(ACTIVITY_TOTAL_FIELDS, 0))
+            dataset_totals['totalViews'] += views
+            dataset_totals['totalDownloads'] += downloads
+            for window in ACTIVITY_WINDOWS:
+                if age < window:
+                    dataset_totals[f'views{window}d'] += views
+                    dataset_totals[f'downloads{window}d'] += downloads
+
+        if bulk_operations:
+            db['DatasetActivitySeries'].bulk_write(bulk_operations, ordered=False)
+            db['DatasetInfoCollection'].bulk_write([
+                pymongo.UpdateOne({'_id': dataset_id}, {'$inc': dataset_totals})
+                for dataset_id, dataset_totals in totals.items()
+            ], ordered=False)
+
+    @staticmethod
+    def choose_granularity(date_from: date, date_to: date) -> str:
+        """
+        Выбирает самый подробный уровень, данные которого еще хранятся для всего диапазона
+        и который дает не слишком много точек.
+        """
+        today: date = date.today()
+        if date_from >= today - timedelta(days=ACTIVITY_HISTORY_DAYS - 1) and (date_to - date_from).days < 92:
+            return 'day'
+
+        weekly_retention: int = int(os.getenv('ACTIVITY_WEEKLY_RETENTION_DAYS', 730))
+        if date_from >= today - timedelta(days=weekly_retention) and (date_to - date_from).days < 2 * 366:
+            return 'week'
+        return 'month'
+
+    @staticmethod
+    def get_activity_series(dataset_id: str, date_from: date, date_to: date,
+                            granularity: Optional[str] = None) -> DatasetActivity:
+        """
+        Возвращает просмотры и загрузки датасета за [date_from, date_to] по дням, неделям или месяцам.
+        Если уровень не задан, он выбирается по длине диапазона.
+        Периоды без активности заполняются нулями.
+
+        Дневной ряд строится по документам месяцев. Недельный и месячный - по свернутым суммам
+        для уже свернутых месяцев и по документам месяцев для остальных, поэтому ни один день
+        не учитывается дважды.
+        """
+        if granularity is None:
+            granularity = ActivityRepository.choose_granularity(date_from, date_to)
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'Unknown granularity {granularity}')
+
+        periods: list[date] = _iter_periods(date_from, date_to, granularity)
+        range_from: date = periods[0] if periods else date_from
+        statistics: dict[str, dict[str, int]] = {str(period): {'views': 0, 'downloads': 0} for period in periods}
+
+        def add(period: date, views: int, downloads: int) -> None:
+            counters: Optional[dict[str, int]] = statistics.get(str(period))
+            if counters is not None:
+                counters['views'] += views
+                counters['downloads'] += downloads
+
+        bucket_query: dict = {
+            'datasetId': dataset_id,
+            'month': {'$gte': _month_key(range_from), '$lte': _month_key(date_to)}
+        }
+        if granularity != 'day':
+            bucket_query['rolledUp'] = {'$ne': True}
+
+        unrolled_months: set[str] = set()
+        for bucket in db['DatasetActivitySeries'].find(bucket_query, {'month': 1, 'days': 1}):
+            unrolled_months.add(bucket['month'])
+            for day_of_month, counters in bucket.get('days', {}).items():
+                day: date = date.fromisoformat(f"{bucket['month']}-{day_of_month}")
+                if range_from <= day <= date_to:
+                    add(DatasetActivity.period_start(day, granularity), counters.get('views', 0), counters.get('downloads', 0))
+
+        if granularity != 'day':
+            rollups = db['DatasetActivityRollups'].find({
+                'datasetId': dataset_id,
+                'tier': granularity,
+                'year': {'$gte': range_from.year, '$lte': date_to.year}
+            })
+            for rollup in rollups:
+                for period, parts in rollup.get('periods', {}).items():
+                    for source_month, counters in parts.items():
+                        # месяц мог быть свернут, но еще не помечен - тогда он уже учтен по дням
+                        if source_month not in unrolled_months:
+                            add(date.fromisoformat(period), counters.get('views', 0), counters.get('downloads', 0))
+
+        return DatasetActivity(dataset_id, {'statistics': statistics}, granularity)
+
+    @staticmethod
+    def remove_dataset_activity(dataset_id: str) -> None:
+        """
+        Удаляет активность датасета из БД.
+        """
+        db['DatasetActivitySeries'].delete_many({'datasetId': dataset_id})
+        db['DatasetActivityRollups'].delete_many({'datasetId': dataset_id})
+
+    @staticmethod
+    def rollup_activity() -> dict:
+        """
+        Сворачивает завершенные месяцы в недельные и месячные суммы и помечает их флагом rolledUp.
+        Возвращает число свернутых документов месяцев и записанных частей сумм.
+        Каждый месяц записывает свою часть суммы периода (periods.<начало периода>.<месяц>) через $set,
+        поэтому повторная свертка того же месяца ничего не удваивает, а неделя на стыке месяцев
+        складывается из частей двух месяцев.
+        """
+        current_month: str = _month_key(date.today())
+        buckets = db['DatasetActivitySeries'].find(
+            {'month': {'$lt': current_month}, 'rolledUp': {'$ne': True}},
+            {'datasetId': 1, 'month': 1, 'days': 1}
+        )
+
+        rollup_operations = []
+        rolled_ids: list[str] = []
+        stats: dict = {'bucketsRolledUp': 0, 'rollupPartsWritten': 0}
+        for bucket in buckets:
+            parts: dict[tuple[str, int, str], dict[str, int]] = {}
+            for day_of_month, counters in bucket.get('days', {}).items():
+                day: date = date.fromisoformat(f"{bucket['month']}-{day_of_month}")
+                for tier in ROLLUP_TIERS:
+                    period: date = DatasetActivity.period_start(day, tier)
+                    part: dict[str, int] = parts.setdefault((tier, period.year, str(period)), {'views': 0, 'downloads': 0})
+                    part['views'] += counters.get('views', 0)
+                    part['downloads'] += counters.get('downloads', 0)
+
+            for (tier, year, period), part in parts.items():
+                rollup_operations.append(pymongo.UpdateOne(
+                    {'_id': _rollup_id(bucket['datasetId'], tier, year)},
+                    {
+                        '$set': {f"periods.{period}.{bucket['month']}": part},
+                        '$setOnInsert': {
+                            'datasetId': bucket['datasetId'],
+                            'tier': tier,
+                            'year': year,
+                            'expireAt': _rollup_expire_at(tier, year)
+                        }
+                    },
+                    upsert=True
+                ))
+            rolled_ids.append(bucket['_id'])
+            stats['bucketsRolledUp'] += 1
+            stats['rollupPartsWritten'] += len(parts)
+
+            if len(rollup_operations) >= 1000:
+                ActivityRepository._write_rollups(rollup_operations, rolled_ids)
+                rollup_operations, rolled_ids = [], []
+
+        ActivityRepository._write_rollups(rollup_operations, rolled_ids)
+        return stats
+
+    @staticmethod
+    def _write_rollups(rollup_operations: list, rolled_ids: list[str]) -> None:
+        if rollup_operations:
+            db['DatasetActivityRollups'].bulk_write(rollup_operations, ordered=False)
+        if rolled_ids:
+            db['DatasetActivitySeries'].update_many({'_id': {'$in': rolled_ids}}, {'$set': {'rolledUp': True}})
+
+    @staticmethod
+    def reconcile_activity_totals() -> dict:
+        """
+        Пересчитывает итоговые счетчики активности в DatasetInfoCollection.
+        Возвращает число датасетов с пересчитанными и с обнуленными счетчиками.
+        Окна за 7 и 30 дней сдвигаются каждый день и считаются по документам месяцев.
+        totalViews и totalDownloads складываются из месячных сумм и еще не свернутых месяцев.
+        История до появления свертки могла быть уже удалена, поэтому итоговые счетчики
+        только поднимаются до этой суммы через $max.
+        """
+        today: date = date.today()
+        not_rolled: dict = {'$ne': ['$rolledUp', True]}
+        sums: dict = {
+            'totalViews': {'$sum': {'$cond': [not_rolled, '$days.v.views', 0]}},
+            'totalDownloads': {'$sum': {'$cond': [not_rolled, '$days.v.downloads', 0]}},
+        }
+        for window in ACTIVITY_WINDOWS:
+            window_start: str = str(today - timedelta(days=window - 1))
+            for field in ('views', 'downloads'):
+                sums[f'{field}{window}d'] = {'$sum': {
+                    '$cond': [{'$gte': ['$day', window_start]}, f'$days.v.{field}', 0]
+                }}
+
+        window_fields: tuple[str, ...] = tuple(
+            field for field in ACTIVITY_TOTAL_FIELDS if field not in ('totalViews', 'totalDownloads')
+        )
+        datasets: dict[str, dict] = {}
+
+        cursor = db['DatasetActivitySeries'].aggregate([
+            {'$project': {'datasetId': 1, 'month': 1, 'rolledUp': 1, 'days': {'$objectToArray': '$days'}}},
+            {'$unwind': '$days'},
+            {'$addFields': {'day': {'$concat': ['$month', '-', '$days.k']}}},
+            {'$group': {'_id': '$datasetId', **sums}},
+        ])
+        for doc in cursor:
+            datasets[doc.pop('_id')] = doc
+
+        cursor = db['DatasetActivityRollups'].aggregate([
+            {'$match': {'tier': 'month'}},
+            {'$project': {'datasetId': 1, 'periods': {'$objectToArray': '$periods'}}},
+            {'$unwind': '$periods'},
+            {'$project': {'datasetId': 1, 'parts': {'$objectToArray': '$periods.v'}}},
+            {'$unwind': '$parts'},
+            {'$group': {
+                '_id': '$datasetId',
+                'totalViews': {'$sum': '$parts.v.views'},
+                'totalDownloads': {'$sum': '$parts.v.downloads'}
+            }},
+        ])
+        for doc in cursor:
+            dataset: dict = datasets.setdefault(doc['_id'], {
+                'totalViews': 0, 'totalDownloads': 0, **dict.fromkeys(window_fields, 0)
+            })
+            dataset['totalViews'] += doc['totalViews']
+            dataset['totalDownloads'] += doc['totalDownloads']
+
+        bulk_operations = []
+        for dataset_id, doc in datasets.items():
+            totals: dict = {'totalViews': doc.pop('totalViews'), 'totalDownloads': doc.pop('totalDownloads')}
+            bulk_operations.append(pymongo.UpdateOne({'_id': dataset_id}, {'$set': doc, '$max': totals}))
+
+        # у датасетов без активности за хранимые дни счетчики окон обнуляются; кандидаты - только датасеты
+        # с ненулевым окном (индексы по полям окон), и обнуляются они пачками ограниченного размера
+        stale_ids: list[str] = [
+            doc['_id'] for doc in db['DatasetInfoCollection'].find(
+                {'$or': [{field: {'$gt': 0}} for field in window_fields]}, {'_id': 1}
+            )
+            if doc['_id'] not in datasets
+        ]
+        reset: int = 0
+        for start in range(0, len(stale_ids), RECONCILE_BATCH_SIZE):
+            reset += db['DatasetInfoCollection'].update_many(
+                {'_id': {'$in': stale_ids[start:start + RECONCILE_BATCH_SIZE]}},
+                {'$set': dict.fromkeys(window_fields, 0)}
+            ).modified_count
+
+        updated: int = 0
+        for start in range(0, len(bulk_operations), RECONCILE_BATCH_SIZE):
+            updated += db['DatasetInfoCollection'].bulk_write(
+                bulk_operations[start:start + RECONCILE_BATCH_SIZE], ordered=False
+            ).modified_count
+
+        # окна сдвинулись, поэтому кэшированные выборки по просмотрам и загрузкам устарели
+        DatasetRepository.bump_catalog_version()
+        return {'datasetsUpdated': updated, 'datasetsReset': reset}
+
+    @staticmethod
+    def import_statistics(activities: list[dict]) -> None:
+        """
+        Сохраняет активность в формате {'_id': id датасета, 'statistics': {'YYYY-MM-DD': {views, downloads}}}
+        в документы месяцев. Счетчики поднимаются через $max, поэтому повторный импорт ничего не удваивает.
+        """
+        bulk_operations = []
+        for activity in activities:
+            for day, counters in activity.get('statistics', {}).items():
+                views: int = counters.get('views', 0)
+                downloads: int = counters.get('downloads', 0)
+                if not views and not downloads:
+                    continue
+
+                month, day_of_month = day[:7], day[8:10]
+                bulk_operations.append(pymongo.UpdateOne(
+                    {'_id': _bucket_id(activity['_id'], month)},
+                    {
+                        '$max': {f'days.{day_of_month}.views': views, f'days.{day_of_month}.downloads': downloads},
+                        '$setOnInsert': {
+                            'datasetId': activity['_id'],
+                            'month': month,
+                            'expireAt': _bucket_expire_at(month)
+                        }
+                    },
+                    upsert=True
+                ))
+
+        if bulk_operations:
+            db['DatasetActivitySeries'].bulk_write(bulk_operations, ordered=False)
+
+    @staticmethod
+    def migrate_legacy_activity() -> None:
+        """
+        Переносит статистику из прежней коллекции DatasetActivityCollection (карта дат в одном документе)
+        в документы месяцев и удаляет прежнюю коллекцию.
+        """
+        if LEGACY_ACTIVITY_COLLECTION not in db.list_collection_names():
+            return
+
+        collection = db[LEGACY_ACTIVITY_COLLECTION]
+        batch: list[dict] = []
+        for doc in collection.find({'statistics': {'$exists': True}}):
+            batch.append(doc)
+            if len(batch) >= 1000:
+                ActivityRepository.import_statistics(batch)
+                batch = []
+        ActivityRepository.import_statistics(batch)
+
+        collection.drop()
+
+    @staticmethod
+    def _increment_operation(dataset_id: str, day: str, views: int, downloads: int) -> pymongo.UpdateOne:
+        month, day_of_month = day[:7], day[8:10]
+        return pymongo.UpdateOne(
+            {'_id': _bucket_id(dataset_id, month)},
+            {
+                '$inc': {f'days.{day_of_month}.views': views, f'days.{day_of_month}.downloads': downloads},
+                '$setOnInsert': {'datasetId': dataset_id, 'month': month, 'expireAt': _bucket_expire_at(month)}
+            },
+            upsert=True
+        )
@@ -0,0 +1,360 @@
+"""
+Содержит репозиторий резервных копий: полный и инкрементальный экспорт БД и CSV-файлов датасетов
+в ZIP-архив и восстановление из полной копии и цепочки инкрементальных.
+
+Каждый архив содержит manifest.json: вид копии (full или delta), ее идентификатор, идентификатор
+предыдущей копии цепочки и отметку времени `until`, на момент которой снята копия. Выполненные копии
+записываются в коллекцию BackupHistory; следующая инкрементальная копия берет изменения начиная
+с `until` последней записи. Изменения определяются по lastModifiedDate датасета, updatedAt графиков,
+времени изменения CSV-файла и отметкам об удалении в DatasetTombstones.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+from glob import glob
+from typing import Iterator, Optional, Tuple
+
+import bson
+import pymongo
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+
+from src.repository.connection import db, mongo_uri
+from src.repository.dataset_repository import DatasetRepository
+from src.util.csv_upload import remove_row_index
+from src.util.zip_stream import CHUNK_SIZE, command_chunks, file_chunks, stream_entry, stream_zip
+
+BACKUP_FORMAT: int = 1
+MANIFEST_NAME: str = 'manifest.json'
+
+# коллекции инкрементальной копии и поле времени последнего изменения документа
+DELTA_COLLECTIONS: dict[str, str] = {
+    'DatasetInfoCollection': 'lastModifiedDate',
+    'DatasetGraphsCollection': 'updatedAt',
+}
+TOMBSTONES_COLLECTION: str = 'DatasetTombstones'
+
+# документы удаленного датасета: коллекция и поле с id датасета (то же, что удаляется при удалении датасета)
+DATASET_DOCUMENTS: tuple[tuple[str, str], ...] = (
+    ('DatasetInfoCollection', '_id'),
+    ('DatasetGraphsCollection', '_id'),
+    ('DatasetPreviewCollection', '_id'),
+    ('DatasetActivitySeries', 'datasetId'),
+    ('DatasetActivityRollups', 'datasetId'),
+    ('DatasetJobCollection', 'datasetId'),
+)
+
+# время изменения пишется приложением до записи в БД, поэтому интервалы соседних копий
+# перекрываются: запись, завершившаяся уже после снятия копии, попадет в следующую
+DELTA_OVERLAP: timedelta = timedelta(minutes=5)
+
+BULK_BATCH_SIZE: int = 1000
+
+
+class BackupRepository:
+    """
+    Класс-репозиторий для резервных копий БД и файлов датасетов.
+    """
+
+    @staticmethod
+    def _datasets_dir() -> str:
+        return current_app.config['UPLOAD_FOLDER']
+
+    @staticmethod
+    def get_last_backup() -> Optional[dict]:
+        """
+        Последняя снятая или восстановленная копия - основа следующей инкрементальной копии.
+        """
+        return db['BackupHistory'].find_one({}, sort=[('until', pymongo.DESCENDING)])
+
+    @staticmethod
+    def export_archive(kind: str = 'full', pretty_json: bool = False) -> Tuple[Iterator[bytes], str]:
+        """
+        Возвращает генератор байтов ZIP-архива и имя архива.
+        Полная копия содержит дамп БД (`mongodump --archive`) и все CSV-файлы,
+        инкрементальная - только документы, CSV-файлы и удаления с момента предыдущей копии.
+        Копия записывается в BackupHistory, когда архив сформирован до конца.
+        Если для инкрементальной копии нет подходящей предыдущей, выбрасывается ValueError.
+        """
+        now: datetime = datetime.now()
+        # архив формируется уже после выхода из обработчика запроса, поэтому директория определяется сразу
+        datasets_dir: str = BackupRepository._datasets_dir()
+        manifest: dict = {
+            'format': BACKUP_FORMAT,
+            'kind': kind,
+            '_id': uuid.uuid4().hex,
+            'baseBackupId': None,
+            'database': os.getenv('MONGO_DB_NAME'),
+            'since': None,
+            'until': now,
+            'counts': {},
+        }
+
+        if kind == 'delta':
+            base: Optional[dict] = BackupRepository.get_last_backup()
+            if base is None:
+                raise ValueError('No previous backup, make a full backup first')
+            # отметки об удалении старше BACKUP_TOMBSTONE_DAYS уже удалены по TTL-индексу
+            if base['until'] < now - timedelta(days=int(os.getenv('BACKUP_TOMBSTONE_DAYS', 90))):
+                raise ValueError('Previous backup is older than tombstone retention, make a full backup')
+            manifest['baseBackupId'] = base['_id']
+            manifest['since'] = base['until'] - DELTA_OVERLAP
+            entries: Iterator = BackupRepository._delta_entries(manifest, datasets_dir)
+        elif kind == 'full':
+            entries = BackupRepository._full_entries(manifest, pretty_json, datasets_dir)
+        else:
+            raise ValueError(f'Unknown backup kind: {kind}')
+
+        def entries_with_manifest() -> Iterator[tuple[zipfile.ZipInfo, Iterator[bytes]]]:
+            yield from entries
+            # счетчики известны только после записи всех файлов, поэтому манифест - последняя запись архива
+            yield stream_entry(MANIFEST_NAME), iter([json_util.dumps(manifest, indent=2).encode()])
+            BackupRepository._record_backup(manifest, createdAt=datetime.now())
+
+        file_name: str = f'{"dump" if kind == "full" else "delta"}_{now.strftime("%Y%m%d_%H%M%S")}.zip'
+        return stream_zip(entries_with_manifest()), file_name
+
+    @staticmethod
+    def _full_entries(manifest: dict, pretty_json: bool, datasets_dir: str) -> Iterator[tuple[zipfile.ZipInfo, Iterator[bytes]]]:
+        """
+        Дамп пишется командой `mongodump --archive` прямо в запись `mongodb_dump/<БД>.archive`,
+        CSV-файлы читаются блоками из директории датасетов - временные файлы не создаются.
+        С `pretty_json` в архив дополнительно попадают коллекции в виде JSON (по документу на строку)
+        для просмотра человеком; для восстановления они не нужны.
+        """
+        db_name: str = manifest['database']
+        mongodump_cmd = [
+            "mongodump",
+            "--uri", mongo_uri(),
+            "--db", db_name,
+            "--archive"
+        ]
+        yield stream_entry(f"mongodb_dump/{db_name}.archive"), command_chunks(mongodump_cmd)
+
+        if pretty_json:
+            for collection_name in sorted(db.list_collection_names()):
+                yield (stream_entry(f"mongodb_dump/{db_name}/{collection_name}.json"),
+                       BackupRepository._collection_json_chunks(collection_name))
+
+        csv_files: list[str] = []
+        if os.path.exists(datasets_dir):
+            csv_files = sorted(glob(os.path.join(datasets_dir, "*.csv")))
+        manifest['counts']['datasets'] = len(csv_files)
+        for csv_file in csv_files:
+            yield zipfile.ZipInfo.from_file(csv_file, f"datasets/{os.path.basename(csv_file)}"), file_chunks(csv_file)
+
+    @staticmethod
+    def _delta_entries(manifest: dict, datasets_dir: str) -> Iterator[tuple[zipfile.ZipInfo, Iterator[bytes]]]:
+        """
+        Документы коллекций, измененные начиная с `since`, в виде BSON (как в файлах mongodump),
+        отметки об удалении датасетов и CSV-файлы, измененные с того же момента.
+        """
+        since: datetime = manifest['since']
+        counts: dict = manifest['counts']
+
+        for collection_name, field in DELTA_COLLECTIONS.items():
+            yield (stream_entry(f"delta/{collection_name}.bson"),
+                   BackupRepository._raw_chunks(collection_name, {field: {'$gte': since}}, counts))
+        yield (stream_entry(f"delta/{TOMBSTONES_COLLECTION}.bson"),
+               BackupRepository._raw_chunks(TOMBSTONES_COLLECTION, {'deletedAt': {'$gte': since}}, counts))
+
+        counts['datasets'] = 0
+        if not os.path.exists(datasets_dir):
+            return
+        with os.scandir(datasets_dir) as entries:
+            changed: list[str] = sorted(
+                entry.path for entry in entries
+                if entry.name.endswith('.csv') and datetime.fromtimestamp(entry.stat().st_mtime) >= since
+            )
+        for csv_file in changed:
+            counts['datasets'] += 1
+            yield zipfile.ZipInfo.from_file(csv_file, f"datasets/{os.path.basename(csv_file)}"), file_chunks(csv_file)
+
+    @staticmethod
+    def _raw_chunks(collection_name: str, query: dict, counts: dict) -> Iterator[bytes]:
+        """
+        Документы коллекции без декодирования в словари, блоками до CHUNK_SIZE байт.
+        Число документов записывается в `counts[collection_name]`.
+        """
+        collection = db.get_collection(collection_name, codec_options=CodecOptions(document_class=RawBSONDocument))
+        counts[collection_name] = 0
+        buffer: list[bytes] = []
+        size: int = 0
+        for doc in collection.find(query).sort('_id', pymongo.ASCENDING):
+            buffer.append(doc.raw)
+            size += len(doc.raw)
+            counts[collection_name] += 1
+            if size >= CHUNK_SIZE:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b"".join(buffer)
+
+    @staticmethod
+    def _collection_json_chunks(collection_name: str) -> Iterator[bytes]:
+        """
+        Документы коллекции в Relaxed Extended JSON, по документу на строку, блоками до CHUNK_SIZE байт.
+        """
+        lines: list[bytes] = []
+        size: int = 0
+        for doc in db[collection_name].find().sort('_id', pymongo.ASCENDING):
+            line: bytes = (json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n").encode()
+            lines.append(line)
+            size += len(line)
+            if size >= CHUNK_SIZE:
+                yield b"".join(lines)
+                lines, size = [], 0
+        if lines:
+            yield b"".join(lines)
+
+    @staticmethod
+    def _record_backup(manifest: dict, **fields) -> None:
+        record: dict = {key: value for key, value in manifest.items() if key not in ('format', 'database')}
+        db['BackupHistory'].replace_one({'_id': manifest['_id']}, {**record, **fields}, upsert=True)
+
+    @staticmethod
+    def import_archives(backups: list[FileStorage]) -> None:
+        """
+        Восстанавливает БД и CSV-файлы из полной копии и цепочки инкрементальных копий.
+        Архивы упорядочиваются сами: сначала полная копия, затем инкрементальные по `until`.
+        Без полной копии инкрементальные применяются к текущему состоянию БД.
+        Каждая инкрементальная копия должна продолжать предыдущую, иначе выбрасывается ValueError
+        и ничего не восстанавливается. Архивы без манифеста считаются полными копиями старого формата.
+        """
+        temp_dir = tempfile.mkdtemp()
+
+        try:
+            archives: list[tuple[dict, str]] = []
+            for number, backup in enumerate(backups):
+                backup_path = os.path.join(temp_dir, f"backup_{number}.zip")
+                backup.save(backup_path)
+                archives.append((BackupRepository._read_manifest(backup_path), backup_path))
+
+            fulls = [archive for archive in archives if archive[0]['kind'] == 'full']
+            deltas = sorted((archive for archive in archives if archive[0]['kind'] == 'delta'),
+                            key=lambda archive: archive[0]['until'])
+            if len(fulls) > 1:
+                raise ValueError('Only one full backup can be imported at once')
+
+            previous: Optional[dict] = fulls[0][0] if fulls else BackupRepository.get_last_backup()
+            for manifest, _ in deltas:
+                if previous is None or manifest['baseBackupId'] != previous.get('_id'):
+                    raise ValueError(f'Backup {manifest["_id"]} does not continue the backup chain')
+                previous = manifest
+
+            for manifest, backup_path in fulls:
+                BackupRepository._restore_full(backup_path, temp_dir)
+                if manifest.get('_id') is not None:
+                    BackupRepository._record_backup(manifest, restoredAt=datetime.now())
+            for manifest, backup_path in deltas:
+                BackupRepository._apply_delta(backup_path)
+                BackupRepository._record_backup(manifest, restoredAt=datetime.now())
+
+            DatasetRepository.bump_catalog_version()
+
+        finally:
+            # Очищаем временные файлы
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _read_manifest(backup_path: str) -> dict:
+        with zipfile.ZipFile(backup_path, 'r') as zip_ref:
+            if MANIFEST_NAME not in zip_ref.namelist():
+                return {'kind': 'full', '_id': None}
+            manifest: dict = json_util.loads(zip_ref.read(MANIFEST_NAME))
+
+        if manifest.get('format') != BACKUP_FORMAT or manifest.get('kind') not in ('full', 'delta'):
+            raise ValueError(f'Unsupported backup archive: format {manifest.get("format")}, kind {manifest.get("kind")}')
+        return manifest
+
+    @staticmethod
+    def _restore_full(backup_path: str, temp_dir: str) -> None:
+        """
+        Заменяет все CSV-файлы и коллекции БД содержимым полной копии.
+        """
+        extract_dir = os.path.join(temp_dir, "full")
+
+        # Распаковываем
+        with zipfile.ZipFile(backup_path, 'r') as zip_ref:
+            zip_ref.extractall(extract_dir)
+
+        db_name: str = os.getenv('MONGO_DB_NAME')
+        db_dump_archive = os.path.join(extract_dir, "mongodb_dump", f"{db_name}.archive")
+        db_dump_dir = os.path.join(extract_dir, "mongodb_dump", db_name)
+        csv_dir = os.path.join(extract_dir, "datasets")
+        datasets_dir = BackupRepository._datasets_dir()
+
+        # Удаляем старые CSV
+        for item in os.listdir(datasets_dir):
+            os.remove(os.path.join(datasets_dir, item))
+
+        # Копируем новые
+        if os.path.exists(csv_dir):
+            for item in os.listdir(csv_dir):
+                shutil.copy2(os.path.join(csv_dir, item), os.path.join(datasets_dir, item))
+
+        # Восстановление MongoDB: архив mongodump или, для старых архивов, директория с BSON-файлами
+        cmd = [
+            'mongorestore',
+            '--uri', mongo_uri(),
+            '--drop'
+        ]
+        if os.path.exists(db_dump_archive):
+            cmd += [f'--archive={db_dump_archive}', '--nsInclude', f'{db_name}.*']
+        else:
+            cmd.append(db_dump_dir)
+        subprocess.run(cmd, check=True)
+
+    @staticmethod
+    def _apply_delta(backup_path: str) -> None:
+        """
+        Заменяет измененные документы и CSV-файлы, затем удаляет датасеты, удаленные после предыдущей копии.
+        Повторное применение той же копии ничего не меняет.
+        """
+        datasets_dir: str = BackupRepository._datasets_dir()
+        with zipfile.ZipFile(backup_path, 'r') as zip_ref:
+            for collection_name in DELTA_COLLECTIONS:
+                with zip_ref.open(f"delta/{collection_name}.bson") as dump:
+                    BackupRepository._replace_documents(collection_name, bson.decode_file_iter(dump))
+
+            for member in zip_ref.infolist():
+                if not member.filename.startswith("datasets/") or member.is_dir():
+                    continue
+                target = os.path.join(datasets_dir, os.path.basename(member.filename))
+                with zip_ref.open(member) as source, open(f"{target}.restore", 'wb') as destination:
+                    shutil.copyfileobj(source, destination, CHUNK_SIZE)
+                os.replace(f"{target}.restore", target)
+                remove_row_index(target)
+
+            with zip_ref.open(f"delta/{TOMBSTONES_COLLECTION}.bson") as dump:
+                dataset_ids: list[str] = [tombstone['_id'] for tombstone in bson.decode_file_iter(dump)]
+
+        for start in range(0, len(dataset_ids), BULK_BATCH_SIZE):
+            batch: list[str] = dataset_ids[start:start + BULK_BATCH_SIZE]
+            for collection_name, field in DATASET_DOCUMENTS:
+                db[collection_name].delete_many({field: {'$in': batch}})
+
+        for dataset_id in dataset_ids:
+            csv_file = os.path.join(datasets_dir, f"{dataset_id}.csv")
+            if os.path.exists(csv_file):
+                os.remove(csv_file)
+            remove_row_index(csv_file)
+
+    @staticmethod
+    def _replace_documents(collection_name: str, documents: Iterator[dict]) -> None:
+        bulk_operations: list[pymongo.ReplaceOne] = []
+        for doc in documents:
+            bulk_operations.append(pymongo.ReplaceOne({'_id': doc['_id']}, doc, upsert=True))
+            if len(bulk_operations) >= BULK_BATCH_SIZE:
+                db[collection_name].bulk_write(bulk_operations, ordered=False)
+                bulk_operations = []
+
+        if bulk_operations:
+            db[collection_name].bulk_write(bulk_operations, ordered=False)
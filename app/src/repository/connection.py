@@ -0,0 +1,185 @@
+"""
+Подключение к MongoDB, общее для всех репозиториев.
+В каждом процессе создается один MongoClient с пулом соединений. Клиент создается при первом
+обращении к БД, а в дочернем процессе после fork - заново, потому что соединения и фоновые
+потоки клиента родителя в дочернем процессе не работают.
+Слушатели pymongo собирают время выполнения команд и число открытых и закрытых соединений пула.
+"""
+import os
+import threading
+from typing import Optional
+
+import pymongo
+from pymongo import monitoring
+from werkzeug.local import LocalProxy
+
+
+def mongo_uri() -> str:
+    return os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+
+
+def _optional_ms(name: str) -> Optional[int]:
+    value: str = os.getenv(name, '')
+    return int(value) if value else None
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Число, суммарное и максимальное время выполнения и число ошибок для каждой команды MongoDB.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands: dict[str, dict] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record(event.command_name, event.duration_micros, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._record(event.command_name, event.duration_micros, failed=True)
+
+    def _record(self, command_name: str, duration_micros: int, failed: bool) -> None:
+        milliseconds: float = duration_micros / 1000
+        with self._lock:
+            stats: dict = self._commands.setdefault(
+                command_name, {'count': 0, 'failed': 0, 'totalMs': 0.0, 'maxMs': 0.0}
+            )
+            stats['count'] += 1
+            stats['failed'] += int(failed)
+            stats['totalMs'] += milliseconds
+            stats['maxMs'] = max(stats['maxMs'], milliseconds)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                name: {**stats, 'avgMs': stats['totalMs'] / stats['count'] if stats['count'] else 0.0}
+                for name, stats in self._commands.items()
+            }
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Счетчики соединений пула: сколько создано, закрыто и сколько сейчас выдано запросам.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {
+            'created': 0, 'closed': 0, 'checkedOut': 0, 'checkOutFailed': 0, 'poolCleared': 0
+        }
+
+    def _add(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        self._add('poolCleared')
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        self._add('created')
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self._add('closed')
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        self._add('checkOutFailed')
+
+    def connection_checked_out(self, event) -> None:
+        self._add('checkedOut')
+
+    def connection_checked_in(self, event) -> None:
+        self._add('checkedOut', -1)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self._counters, 'open': self._counters['created'] - self._counters['closed']}
+
+
+class MongoConnection:
+    """
+    Владелец единственного MongoClient процесса.
+    Размер пула и таймауты задаются переменными окружения MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_TIME_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS и MONGO_WAIT_QUEUE_TIMEOUT_MS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client: Optional[pymongo.MongoClient] = None
+        self._pid: Optional[int] = None
+        self._options: dict = {}
+        self.commands = CommandMetrics()
+        self.pool = PoolMetrics()
+
+    @property
+    def client(self) -> pymongo.MongoClient:
+        client: Optional[pymongo.MongoClient] = self._client
+        if client is not None and self._pid == os.getpid():
+            return client
+
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._client = self._connect()
+                self._pid = os.getpid()
+            return self._client
+
+    def get_db(self):
+        return self.client[os.getenv('MONGO_DB_NAME')]
+
+    def close(self) -> None:
+        """
+        Закрывает соединения клиента текущего процесса. Следующее обращение к БД создаст новый клиент.
+        """
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def metrics(self) -> dict:
+        """
+        Настройки пула, счетчики соединений и время выполнения команд для страницы метрик.
+        """
+        return {
+            'pid': self._pid,
+            'options': self._options,
+            'pool': self.pool.metrics(),
+            'commands': self.commands.metrics(),
+        }
+
+    def _connect(self) -> pymongo.MongoClient:
+        options: dict = {
+            'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+            'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+            'maxIdleTimeMS': _optional_ms('MONGO_MAX_IDLE_TIME_MS'),
+            'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+            'socketTimeoutMS': _optional_ms('MONGO_SOCKET_TIMEOUT_MS'),
+            'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+            'waitQueueTimeoutMS': _optional_ms('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        }
+        self._options = {key: value for key, value in options.items() if value is not None}
+        print(f"MongoConnection: creating client in process {os.getpid()} (pool {self._options['maxPoolSize']})")
+        return pymongo.MongoClient(mongo_uri(), event_listeners=[self.commands, self.pool], **self._options)
+
+
+mongo = MongoConnection()
+
+db = LocalProxy(mongo.get_db)
@@ -2,60 +2,62 @@
 Содержит репозитории приложения.
 Репозиторий напрямую работает с БД - добавляет, изменяет, удаляет и ищет записи в БД.
 """
+import base64
 import os
-import re
-import shutil
-import subprocess
-import tempfile
-import zipfile
+import uuid
 import pymongo
 
-from datetime import datetime, date, timedelta, time
+from datetime import datetime, timedelta
 
-from glob import glob
-from io import BytesIO
-from typing import Any, List, Optional, Tuple
-from bson import ObjectId
-from flask import current_app, g, logging
-from flask_pymongo import PyMongo
+from typing import Any, Optional
+from bson import json_util
+from pymongo.errors import DuplicateKeyError
 from pymongo.results import InsertOneResult
-from werkzeug.datastructures import FileStorage
-from werkzeug.local import LocalProxy
 
 from src.models.Dataset import Dataset
-from src.models.DatasetActivity import DatasetActivity
 from src.models.DatasetBrief import DatasetBrief
+from src.models.DatasetPreview import DatasetPreview
 from src.models.FilterValues import FilterValues
+from src.repository.connection import db
+from src.repository.filter_planner import FilterPlan, FilterPlanner
+from src.util.search import search_fields
 
-# --- Database Connection ---
-uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
-client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=5000)
-db = None
+ACTIVITY_WINDOWS: tuple[int, ...] = (7, 30)
+ACTIVITY_TOTAL_FIELDS: tuple[str, ...] = (
+    'totalViews', 'totalDownloads',
+    *(f'{field}{window}d' for window in ACTIVITY_WINDOWS for field in ('views', 'downloads'))
+)
 
-try:
-    client.admin.command('ping')
-    print("Successfully connected to MongoDB for DatasetRepository.")
-    db_name = os.getenv('MONGO_DB_NAME')
-    db = client[db_name]
-except Exception as e:
-    print(f"Error connecting to MongoDB for DatasetRepository: {e}")
+# документ коллекции CatalogState с версией каталога датасетов
+CATALOG_STATE_ID: str = 'datasets'
 
 
-def get_db():
+def _encode_page_token(doc: dict, sort_query: list[tuple[str, int]]) -> str:
     """
-    Геттер экземпляра БД
+    Непрозрачный токен позиции: последнее значение поля сортировки, _id и сама сортировка
+    вместе с направлением _id.
     """
-    db_name = os.getenv('MONGO_DB_NAME')
+    field: str = sort_query[0][0]
+    position: dict = {
+        'sort': [[key, direction] for key, direction in sort_query],
+        'value': doc.get(field),
+        'id': doc['_id'],
+    }
+    return base64.urlsafe_b64encode(json_util.dumps(position).encode('utf-8')).decode('ascii')
 
-    dbase = getattr(g, db_name, None)
-
-    if dbase is None:
-        dbase = g._database = PyMongo(current_app).cx[db_name]
-
-    return dbase
 
+def _decode_page_token(token: str, sort_query: list[tuple[str, int]]) -> dict:
+    """
+    Разбирает токен позиции. Токен другой сортировки или поврежденный токен вызывает ValueError.
+    """
+    try:
+        position: dict = json_util.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f'Invalid page token: {e}')
 
-db = LocalProxy(get_db)
+    if position.get('sort') != [[key, direction] for key, direction in sort_query] or 'id' not in position:
+        raise ValueError('Page token does not match the sort order')
+    return position
 
 
 class DatasetRepository:
@@ -64,164 +66,97 @@ class DatasetRepository:
     """
 
     @staticmethod
-    def get_all_datasets_brief() -> list[DatasetBrief]:
+    def get_all_datasets_brief(after: Optional[str] = None, limit: int = 30) -> tuple[list[DatasetBrief], Optional[str]]:
         """
-        Возвращает список Brief'ов всех датасетов в БД из коллекции DatasetInfo.
-        Если БД пустая или недоступна, то возвращается пустой список.
+        Возвращает страницу Brief'ов всех датасетов в БД из коллекции DatasetInfo, упорядоченных по _id,
+        и токен следующей страницы.
+        Ошибки БД не перехватываются, чтобы пустая страница из-за недоступной БД не попала в кэш выборок.
         """
-        briefs: list[DatasetBrief] = []
-        if db is None:
-            print("DatasetRepository: Cannot get datasets, DB connection not available.")
-            return briefs
-
-        try:
-            cursor = db.DatasetInfoCollection.find()
-            datasets_info: list[dict[str, Any]] = [doc for doc in cursor]
-            for doc in datasets_info:
-                briefs.append(
-                    DatasetBrief(
-                        dataset_id=str(doc.get('_id')),
-                        dataset_name=doc.get('name', 'N/A'),
-                        dataset_description=doc.get('description', ''),
-                        dataset_type="CSV",
-                        dataset_size=doc.get('size', 0)
-                    )
-                )
-        except Exception as e:
-            print(f"DatasetRepository: Error fetching dataset briefs from MongoDB: {e}")
-
-        return briefs
+        return DatasetRepository._get_briefs_page(FilterPlanner.plan(None), after, limit)
 
     @staticmethod
-    def get_filtered_briefs(filters: FilterValues) -> list:
-        pipeline: list = []
-
-        # join collections
-        pipeline.append({
-            '$lookup': {
-                'from': 'DatasetActivityCollection',
-                'localField': '_id',
-                'foreignField': "_id",
-                'as': "activity"
-            }
-        })
-
-        # unwrap activity array
-        pipeline.append({
-            '$unwind': {
-                'path': '$activity',
-                'preserveNullAndEmptyArrays': True
-            }
-        })
-
-        # rewrite 'activity' field to contain only statistics object
-        pipeline.append({
-            '$addFields': {
-                'activity': {
-                    '$objectToArray': '$activity.statistics'
-                }
-            }
-        })
-
-        # turn statistics object into array of entries
-        pipeline.append({
-            '$unwind': '$activity'
-        })
-
-        # group and sum views and downloads
-        pipeline.append({
-            '$group': {
-                '_id': '$_id',
-                'doc': {
-                    '$first': '$$ROOT'
-                },
-                'totalViews': {
-                    '$sum': '$activity.v.views'
-                },
-                'totalDownloads': {
-                    '$sum': '$activity.v.downloads'
-                }
-            }
-        })
-
-        # add fields into original objects
-        pipeline.append({
-            '$addFields': {
-                'doc.totalViews': '$totalViews',
-                'doc.totalDownloads': '$totalDownloads'
-            }
-        })
-
-        # unwrap object
-        pipeline.append({
-            '$replaceRoot': {
-                'newRoot': '$doc'
-            }
-        })
-
-        # remove activity field
-        pipeline.append({
-            '$project': {
-                'activity': 0
-            }
-        })
-
-        query: dict = {}
-
-        if filters.name:
-            name_regex = re.compile(f'.*{re.escape(filters.name)}.*', re.IGNORECASE)
-            query['name'] = {'$regex': name_regex}
+    def get_filtered_briefs(filters: FilterValues, after: Optional[str] = None,
+                            limit: int = 30) -> tuple[list[DatasetBrief], Optional[str]]:
+        """
+        Возвращает страницу Brief'ов датасетов, прошедших фильтрацию, и токен следующей страницы.
+        Страницы выбираются по ключу (поле сортировки, _id), поэтому стоимость страницы
+        не зависит от ее номера.
+        """
+        return DatasetRepository._get_briefs_page(FilterPlanner.plan(filters), after, limit)
 
-        if filters.size_from is not None or filters.size_to is not None:
-            query['size'] = DatasetRepository._create_from_to_query(filters.size_from, filters.size_to)
+    @staticmethod
+    def explain_filtered_briefs(filters: FilterValues, after: Optional[str] = None, limit: int = 30) -> dict:
+        """
+        Возвращает план запроса страницы и вывод explain MongoDB со статистикой выполнения.
+        """
+        plan: FilterPlan = FilterPlanner.plan(filters)
+        keyset: dict = DatasetRepository._page_keyset(plan, after)
 
-        if filters.row_size_from is not None or filters.row_size_to is not None:
-            query['rowCount'] = DatasetRepository._create_from_to_query(filters.row_size_from, filters.row_size_to)
+        if plan.uses_aggregation:
+            command: dict = {'aggregate': 'DatasetInfoCollection', 'pipeline': plan.pipeline(keyset, limit + 1), 'cursor': {}}
+        else:
+            find: dict = plan.find_command(keyset, limit + 1)
+            command = {'find': 'DatasetInfoCollection', **find, 'sort': dict(find['sort'])}
 
-        if filters.column_size_from is not None or filters.column_size_to is not None:
-            query['columnCount'] = DatasetRepository._create_from_to_query(filters.column_size_from, filters.column_size_to)
+        return {
+            'plan': plan.describe(),
+            'explain': db.command('explain', command, verbosity='executionStats'),
+        }
 
-        if filters.views_from is not None or filters.views_to is not None:
-            query['totalViews'] = DatasetRepository._create_from_to_query(filters.views_from, filters.views_to)
+    @staticmethod
+    def _get_briefs_page(plan: FilterPlan, after: Optional[str], limit: int) -> tuple[list[DatasetBrief], Optional[str]]:
+        """
+        Выбирает `limit` документов после позиции из токена `after`.
+        Запрашивается на один документ больше, чтобы узнать, есть ли следующая страница.
+        """
+        keyset: dict = DatasetRepository._page_keyset(plan, after)
 
-        if filters.downloads_from is not None or filters.downloads_to is not None:
-            query['totalDownloads'] = DatasetRepository._create_from_to_query(filters.downloads_from, filters.downloads_to)
+        if plan.uses_aggregation:
+            cursor = db.DatasetInfoCollection.aggregate(plan.pipeline(keyset, limit + 1))
+        else:
+            find: dict = plan.find_command(keyset, limit + 1)
+            cursor = db.DatasetInfoCollection.find(find['filter'], find['projection']).sort(find['sort']).limit(find['limit'])
 
-        if filters.creation_date_from is not None or filters.creation_date_to is not None:
-            query['creationDate'] = DatasetRepository._create_from_to_query(filters.creation_date_from, filters.creation_date_to)
+        docs: list[dict] = list(cursor)
+        next_token: Optional[str] = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_token = _encode_page_token(docs[-1], plan.sort_query)
 
-        if filters.modify_date_from is not None or filters.modify_date_to is not None:
-            query['lastModifiedDate'] = DatasetRepository._create_from_to_query(filters.modify_date_from, filters.modify_date_to)
+        briefs: list[DatasetBrief] = [DatasetBrief.from_doc(doc) for doc in docs]
 
-        pipeline.append({
-            '$match': query
-        })
+        return briefs, next_token
 
-        sort_query: dict = {}
-        if filters.sort is not None:
-            sort_query[filters.sort['field']] = pymongo.ASCENDING if filters.sort['order'] == 'asc' else pymongo.DESCENDING
+    @staticmethod
+    def _page_keyset(plan: FilterPlan, after: Optional[str]) -> dict:
+        if not after:
+            return {}
+        return DatasetRepository._keyset_condition(plan.sort_query, _decode_page_token(after, plan.sort_query))
 
-        sort_query['_id'] = 1
+    @staticmethod
+    def _keyset_condition(sort_query: list[tuple[str, int]], position: dict) -> dict:
+        """
+        Условие "после позиции" для сортировки (field, _id) с одинаковым направлением обоих ключей,
+        поэтому один индекс (field, _id) обслуживает сортировку в обе стороны.
+        Документы без поля сортировки MongoDB ставит первыми по возрастанию и последними по убыванию.
+        """
+        after_id: Any = position['id']
+        field, direction = sort_query[0]
+        id_after: dict = {'$gt' if direction == pymongo.ASCENDING else '$lt': after_id}
+        if len(sort_query) == 1:
+            return {'_id': id_after}
 
-        pipeline.append({
-            '$sort': sort_query
-        })
+        value: Any = position['value']
+        same_value: dict = {field: value, '_id': id_after}
 
-        cursor = db.DatasetInfoCollection.aggregate(pipeline)
-
-        briefs: list = []
-        for doc in cursor:
-            briefs.append(
-                DatasetBrief(
-                    dataset_id=str(doc.get('_id')),
-                    dataset_name=doc.get('name', 'N/A'),
-                    dataset_description=doc.get('description', ''),
-                    dataset_type="CSV",
-                    dataset_size=doc.get('size', 0)
-                )
-            )
+        if value is None:
+            if direction == pymongo.ASCENDING:
+                return {'$or': [{field: {'$ne': None}}, same_value]}
+            return same_value
 
-        return briefs
+        if direction == pymongo.ASCENDING:
+            return {'$or': [{field: {'$gt': value}}, same_value]}
+        return {'$or': [{field: {'$lt': value}}, {field: None}, same_value]}
 
     @staticmethod
     def add_dataset(dataset: Dataset) -> str:
@@ -231,19 +166,14 @@ class DatasetRepository:
         # потенциально может случиться такое, что uuid нагенерит два одинаковых id
         # и тут из-за этого все упадет
         # надо обернуть в try-catch и в блоке catch перегенерить id
-        inserted: InsertOneResult = db['DatasetInfoCollection'].insert_one(dataset.to_dict())
+        inserted: InsertOneResult = db['DatasetInfoCollection'].insert_one({
+            **dataset.to_dict(),
+            **search_fields(dataset.dataset_name, dataset.dataset_description),
+            **dict.fromkeys(ACTIVITY_TOTAL_FIELDS, 0)
+        })
+        DatasetRepository.bump_catalog_version()
         return inserted.inserted_id
 
-    @staticmethod
-    def add_plots(dataset_id: str, graphs: dict[int, bytes]) -> None:
-        """
-        Добавляет графики в БД.
-        """
-        if graphs:
-            db['DatasetGraphsCollection'].insert_one(
-                {'_id': dataset_id, 'graphs': graphs},
-            )
-
     @staticmethod
     def edit_dataset(dataset: Dataset) -> None:
         """
@@ -251,19 +181,81 @@ class DatasetRepository:
         """
         db['DatasetInfoCollection'].update_one(
             {'_id': dataset.dataset_id},
-            {'$set': dataset.to_dict()}
+            {'$set': {**dataset.to_dict(), **search_fields(dataset.dataset_name, dataset.dataset_description)}}
         )
+        DatasetRepository.bump_catalog_version()
 
     @staticmethod
-    def edit_plots(dataset_id: str, graphs: dict[int, bytes]) -> None:
+    def get_catalog_version() -> Optional[str]:
         """
-        Изменяет графики для датасета в БД
+        Возвращает текущую версию каталога датасетов (None, если каталог еще не менялся).
+        Версия меняется при каждом изменении списка датасетов, по ней сбрасываются кэши выборок.
         """
-        db['DatasetGraphsCollection'].update_one(
-            {'_id': dataset_id},
-            {'$set': {'graphs': graphs}}
+        state = db['CatalogState'].find_one({'_id': CATALOG_STATE_ID}, {'version': 1})
+        return state['version'] if state is not None else None
+
+    @staticmethod
+    def bump_catalog_version() -> None:
+        """
+        Меняет версию каталога и увеличивает счетчик изменений.
+        Версия - случайная строка, а не сам счетчик: после восстановления БД из архива
+        счетчик возвращается к старому значению, а версия не совпадет ни с одной из прежних.
+        """
+        db['CatalogState'].update_one(
+            {'_id': CATALOG_STATE_ID},
+            {'$inc': {'changes': 1}, '$set': {'version': uuid.uuid4().hex}},
+            upsert=True
         )
 
+    @staticmethod
+    def backfill_search_fields() -> None:
+        """
+        Заполняет поля для поиска у датасетов, добавленных до их появления.
+        """
+        collection = db['DatasetInfoCollection']
+        bulk_operations = []
+        for doc in collection.find({'searchTrigrams': {'$exists': False}}, {'name': 1, 'description': 1}):
+            bulk_operations.append(pymongo.UpdateOne(
+                {'_id': doc['_id']},
+                {'$set': search_fields(doc.get('name', ''), doc.get('description', ''))}
+            ))
+            if len(bulk_operations) >= 1000:
+                collection.bulk_write(bulk_operations, ordered=False)
+                bulk_operations = []
+
+        if bulk_operations:
+            collection.bulk_write(bulk_operations, ordered=False)
+
+    @staticmethod
+    def edit_plots(dataset_id: str, graphs: list[dict], dataset_version: int) -> bool:
+        """
+        Изменяет (или создает) графики для датасета в БД.
+        Графики не перезаписываются, если в БД уже лежат графики более новой версии датасета.
+        Возвращает False, если датасет удален: графики не записываются, а записанные одновременно
+        с удалением датасета удаляются, чтобы в DatasetGraphsCollection не оставалось документов без датасета.
+        """
+        if DatasetRepository.get_dataset_version(dataset_id) is None:
+            return False
+
+        try:
+            db['DatasetGraphsCollection'].update_one(
+                {'_id': dataset_id, '$or': [
+                    {'version': {'$lt': dataset_version}},
+                    {'version': {'$exists': False}},
+                ]},
+                {'$set': {'graphs': graphs, 'version': dataset_version, 'updatedAt': datetime.now()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # документ с более новой версией графиков уже существует
+            pass
+
+        if DatasetRepository.get_dataset_version(dataset_id) is None:
+            # датасет удален между проверкой и записью графиков
+            db['DatasetGraphsCollection'].delete_one({'_id': dataset_id, 'version': dataset_version})
+            return False
+        return True
+
     @staticmethod
     def get_dataset(dataset_id: str) -> Optional[Dataset]:
         """
@@ -272,184 +264,116 @@ class DatasetRepository:
         """
         collection = db['DatasetInfoCollection']
 
-        dataset = collection.find_one({'_id': dataset_id})
+        dataset = collection.find_one({'_id': dataset_id}, Dataset.PROJECTION)
         if dataset is None:
-            raise Exception(f'Element with {dataset_id} not found')
+            return None
 
-        info: Dataset = Dataset(dataset_id, dataset['name'], dataset['description'], dataset['creationDate'],
-                                dataset['author'], dataset['author_login'], dataset['rowCount'], dataset['columnCount'],
-                                dataset['size'], dataset['lastVersionNumber'], dataset['lastModifiedDate'], dataset['path'],
-                                dataset['lastModifiedBy'])
+        info: Dataset = Dataset.from_doc(dataset)
         return info
 
     @staticmethod
-    def init_dataset_activity(dataset_id: str) -> None:
-        """
-        Создает активность для датасета в БД.
-        """
-        db['DatasetActivityCollection'].insert_one({
-            '_id': dataset_id,
-            'statistics': {
-                str(date.today()): {
-                    'views': 0,
-                    'downloads': 0
-                }
-            }
-        })
+    def get_dataset_version(dataset_id: str) -> Optional[int]:
+        """
+        Возвращает номер последней версии датасета или None, если датасета нет.
+        """
+        dataset = db['DatasetInfoCollection'].find_one({'_id': dataset_id}, {'lastVersionNumber': 1})
+        if dataset is None:
+            return None
+        return dataset['lastVersionNumber']
 
     @staticmethod
-    def incr_dataset_views(dataset_id: str) -> None:
+    def get_plots_index(dataset_id: str) -> Optional[dict]:
         """
-        Увеличивает число просмотров на странице.
+        Возвращает версию графиков и краткое описание каждого графика (номер и имя столбца, тип)
+        без самих данных графиков. Если графиков нет, возвращает None.
         """
-        collection = db['DatasetActivityCollection']
-        collection.update_one(
-            {"_id": dataset_id},
-            {"$inc": {
-                f"statistics.{str(date.today())}.views": 1,
-                f"statistics.{str(date.today())}.downloads": 0
-                }}
-        )
+        cursor = db['DatasetGraphsCollection'].aggregate([
+            {'$match': {'_id': dataset_id}},
+            {'$project': {
+                '_id': 0,
+                'version': {'$ifNull': ['$version', 0]},
+                'graphs': {'$map': {
+                    'input': {'$ifNull': ['$graphs', []]},
+                    'in': {
+                        'name': '$$this.name',
+                        'col_name': '$$this.col_name',
+                        # у графиков, сохраненных до появления поля kind, violin есть только у числовых столбцов
+                        'kind': {'$ifNull': ['$$this.kind', {'$cond': [
+                            {'$eq': [{'$type': '$$this.violin'}, 'missing']}, 'categorical', 'numeric'
+                        ]}]},
+                    },
+                }},
+            }},
+        ])
+        return next(cursor, None)
 
     @staticmethod
-    def incr_dataset_downloads(dataset_id: str) -> None:
+    def get_plot(dataset_id: str, col_idx: int) -> Optional[dict]:
         """
-        Увеличивает число загрузок на странице.
+        Возвращает версию графиков и один график столбца `col_idx`.
+        Из массива graphs забирается только нужный элемент.
         """
-        collection = db['DatasetActivityCollection']
-        collection.update_one(
-            {"_id": dataset_id},
-            {"$inc": {
-                f"statistics.{str(date.today())}.views": 0,
-                f"statistics.{str(date.today())}.downloads": 1
-                }}
+        res = db['DatasetGraphsCollection'].find_one(
+            {'_id': dataset_id},
+            {'_id': 0, 'version': 1, 'graphs': {'$elemMatch': {'name': str(col_idx)}}}
         )
+        if not res or not res.get('graphs'):
+            return None
+        return {'version': res.get('version', 0), 'graph': res['graphs'][0]}
 
     @staticmethod
-    def get_dataset_activity(dataset_id: str) -> Optional[DatasetActivity]:
+    def save_preview(preview: DatasetPreview) -> None:
         """
-        Возвращает объект Activity для датасета с индексом dataset_id.
-        Если датасета с индексом dataset_id нет, то возвращает None.
+        Сохраняет (или заменяет) снимок предпросмотра датасета.
         """
-        collection = db['DatasetActivityCollection']
-
-        activity = collection.find_one({'_id': dataset_id})
-        if activity is None:
-            raise Exception(f'Element with {dataset_id} not found')
-
-        info: DatasetActivity = DatasetActivity(dataset_id, activity)
-        return info
-
+        db['DatasetPreviewCollection'].replace_one({'_id': preview.dataset_id}, preview.to_dict(), upsert=True)
 
     @staticmethod
-    def clear_old_dates() -> None:
-        collection = db['DatasetActivityCollection']
-
-        # Calculate cutoff date (30 days ago)
-        cutoff_date = (datetime.now() - timedelta(days=30)).date()
-
-        docs = collection.find({"statistics": {"$exists": True}})
-
-        # Prepare bulk operations
-        bulk_operations = []
-
-        for doc in docs:
-
-            old_dates = []
-
-            # Check each date in statistics
-            for date_str in doc['statistics'].keys():
-                date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-                if date_obj < cutoff_date:
-                    old_dates.append(date_str)
-
-
-            # Create update operation if we have dates to remove
-            if old_dates:
-                unset_fields = {f"statistics.{date}": "" for date in old_dates}
-                bulk_operations.append(
-                    pymongo.UpdateOne(
-                        {"_id": doc["_id"]},
-                        {"$unset": unset_fields}
-                    )
-                )
-
-            if bulk_operations:
-                collection.bulk_write(bulk_operations)
+    def get_preview(dataset_id: str) -> Optional[DatasetPreview]:
+        """
+        Возвращает снимок предпросмотра датасета или None, если его нет.
+        """
+        preview = db['DatasetPreviewCollection'].find_one({'_id': dataset_id})
+        if preview is None:
+            return None
+        return DatasetPreview(dataset_id, preview['version'], preview['headers'], preview['rows'])
 
     @staticmethod
-    def reset_day() -> None:
+    def set_preview_version(dataset_id: str, dataset_version: int) -> None:
         """
-        Создает новый день.
+        Переносит снимок предпросмотра на новую версию датасета, если файл датасета не менялся.
         """
-        collection = db['DatasetActivityCollection']
-        docs = collection.find({"statistics": {"$exists": True}})
-
-        # Prepare bulk operations
-        bulk_operations = []
-
-        for doc in docs:
-            # Find the latest date in statistics
-            dates = list(doc["statistics"].keys())
-
-            if not dates:
-                DatasetRepository.init_dataset_activity(doc['_id'])
-                dates = list(doc["statistics"].keys())
-
-            latest_date = date.fromisoformat(max(dates))
-            today = date.today()
-
-            if latest_date >= today:
-                continue
-
-            # If we have to create more than 30 empty days - we create only 30
-            if (today - latest_date).days > 30:
-                latest_date = today - timedelta(days=30)
-
-            empty_entry = {
-                'views': 0,
-                'downloads': 0
-            }
-
-            current_date = latest_date + timedelta(days=1)
-            updates = {}
-
-            while current_date <= today:
-                updates[f"statistics.{current_date.isoformat()}"] = empty_entry
-                current_date += timedelta(days=1)
-
-            # Add update operation to bulk
-            if updates:
-                bulk_operations.append(
-                    pymongo.UpdateOne(
-                        {"_id": doc["_id"]},
-                        {"$set": updates}
-                    )
-                )
-
-        # Execute all operations in bulk
-        if bulk_operations:
-            collection.bulk_write(bulk_operations)
-
+        db['DatasetPreviewCollection'].update_one(
+            {'_id': dataset_id},
+            {'$set': {'version': dataset_version}}
+        )
 
     @staticmethod
-    def get_plots(dataset_id: str) -> Optional[list[dict]]:
+    def remove_preview(dataset_id: str) -> None:
         """
-        Получить список всех графиков для датасета
+        Удаляет снимок предпросмотра из БД.
         """
-        collection = db['DatasetGraphsCollection']
-        res = collection.find_one({'_id': dataset_id})
-        if res and 'graphs' in res and res['graphs'] is not None:
-            return res['graphs']
+        db['DatasetPreviewCollection'].delete_one({'_id': dataset_id})
 
     @staticmethod
     def remove_dataset(dataset_id: str) -> None:
         """
-        Удаляет датасет из БД.
+        Удаляет датасет из БД и оставляет отметку об удалении для инкрементальной резервной копии.
+        Отметка хранится BACKUP_TOMBSTONE_DAYS дней.
         """
         db['DatasetInfoCollection'].delete_one(
             {'_id': dataset_id},
         )
+        deleted_at: datetime = datetime.now()
+        db['DatasetTombstones'].update_one(
+            {'_id': dataset_id},
+            {'$set': {
+                'deletedAt': deleted_at,
+                'expireAt': deleted_at + timedelta(days=int(os.getenv('BACKUP_TOMBSTONE_DAYS', 90))),
+            }},
+            upsert=True
+        )
+        DatasetRepository.bump_catalog_version()
 
     @staticmethod
     def remove_graphs(dataset_id: str) -> None:
@@ -459,112 +383,3 @@ class DatasetRepository:
         db['DatasetGraphsCollection'].delete_one(
             {'_id': dataset_id}
         )
-
-    @staticmethod
-    def export_datasets_archive() -> Tuple[BytesIO, str]:
-        temp_dir = tempfile.mkdtemp()
-
-        try:
-            # Создаем временную структуру директорий
-            db_dump_dir = os.path.join(temp_dir, "mongodb_dump")
-            csv_dir = os.path.join(temp_dir, "datasets")
-            datasets_dir = "/app/datasets"
-
-            os.makedirs(db_dump_dir, exist_ok=True)
-            os.makedirs(csv_dir, exist_ok=True)
-
-            # 1. Делаем mongodump
-            mongodump_cmd = [
-                "mongodump",
-                "--uri", uri,
-                "--out", db_dump_dir
-            ]
-            subprocess.run(mongodump_cmd, check=True)
-
-            # 2. Конвертируем BSON → JSON через bsondump
-            bson_files = glob(os.path.join(db_dump_dir, db_name, "*.bson"))
-            for bson_file in bson_files:
-                json_file = bson_file.replace(".bson", ".json")
-                subprocess.run(["bsondump", "--pretty", "--outFile", json_file, bson_file], check=True)
-
-            # 3. Копируем CSV файлы в отдельную директорию
-            if os.path.exists(datasets_dir):
-                for csv_file in glob(os.path.join(datasets_dir, "*.csv")):
-                    shutil.copy2(
-                        csv_file,
-                        os.path.join(csv_dir, os.path.basename(csv_file))
-                    )
-
-            # 4. Создаем ZIP-архив с правильной структурой
-            zip_buffer = BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        # Сохраняем файлы с относительными путями внутри архива
-                        arcname = os.path.relpath(file_path, temp_dir)
-                        zipf.write(file_path, arcname)
-
-            zip_buffer.seek(0)
-            return zip_buffer, f'dump_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
-
-        finally:
-            # Очищаем временные файлы
-            shutil.rmtree(temp_dir, ignore_errors=True)
-
-    @staticmethod
-    def import_datasets_archive(backup: FileStorage) -> None:
-        temp_dir = tempfile.mkdtemp()
-
-        try:
-            # Сохраняем архив
-            backup_path = os.path.join(temp_dir, backup.filename)
-            backup.save(backup_path)
-
-            # Распаковываем
-            with zipfile.ZipFile(backup_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            db_dump_dir = os.path.join(temp_dir, "mongodb_dump", db_name)
-            csv_dir = os.path.join(temp_dir, "datasets")
-            datasets_dir = "/app/datasets"
-
-            # Удаляем старые CSV
-            for item in os.listdir(datasets_dir):
-                os.remove(os.path.join(datasets_dir, item))
-
-            # Копируем новые
-            if os.path.exists(csv_dir):
-                for item in os.listdir(csv_dir):
-                    shutil.copy2(os.path.join(csv_dir, item), os.path.join(datasets_dir, item))
-
-            # Восстановление MongoDB
-            cmd = [
-                'mongorestore',
-                '--uri', uri,
-                '--drop',
-                db_dump_dir
-            ]
-            subprocess.run(cmd, check=True)
-
-        finally:
-            # Очищаем временные файлы
-            shutil.rmtree(temp_dir, ignore_errors=True)
-
-    @staticmethod
-    def _create_from_to_query(from_: Optional[int | float | datetime], to_: Optional[int | float | datetime]) -> dict:
-        INT64_MAX: int = 9223372036854775807
-        DATETIME_MAX: datetime = datetime.today() + timedelta(days=1)
-
-        query: dict = {}
-        if from_ is not None:
-            if isinstance(from_, datetime):
-                query['$gte'] = min(from_, DATETIME_MAX)
-            else:
-                query['$gte'] = min(from_, INT64_MAX)
-        if to_ is not None:
-            if isinstance(to_, datetime):
-                query['$lte'] = min(datetime.combine(to_.date(), time.max), DATETIME_MAX)
-            else:
-                query['$lte'] = min(to_, INT64_MAX)
-        return query
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Планировщик запроса списка датасетов по фильтрам главной страницы.
+Все фильтруемые поля, включая просмотры и загрузки за 30 дней, хранятся в документах
+DatasetInfoCollection, поэтому каждый фильтр - предикат по индексируемому полю.
+Планировщик выбирает, чем выполнить запрос: обычным find, если вычисляемых полей не нужно,
+или агрегацией, если сортировка идет по релевантности поиска, и куда поставить условие
+следующей страницы - до или после вычисления релевантности.
+"""
+from datetime import datetime, time, timedelta
+from typing import Optional
+
+import pymongo
+
+from src.models.DatasetBrief import DatasetBrief
+from src.models.FilterValues import FilterValues
+from src.util.search import search_query
+
+# поле документа и атрибуты FilterValues с границами диапазона
+RANGE_FILTERS: tuple[tuple[str, str, str], ...] = (
+    ('size', 'size_from', 'size_to'),
+    ('rowCount', 'row_size_from', 'row_size_to'),
+    ('columnCount', 'column_size_from', 'column_size_to'),
+    ('views30d', 'views_from', 'views_to'),
+    ('downloads30d', 'downloads_from', 'downloads_to'),
+    ('creationDate', 'creation_date_from', 'creation_date_to'),
+    ('lastModifiedDate', 'modify_date_from', 'modify_date_to'),
+)
+
+SCORE_FIELD: str = 'searchScore'
+
+
+class FilterPlan:
+    """
+    План запроса: условие, сортировка (последний ключ всегда _id в направлении первого) и выражение релевантности,
+    если сортировка идет по ней.
+    """
+
+    def __init__(self, query: dict, sort_query: list[tuple[str, int]], score: Optional[dict] = None):
+        self.query: dict = query
+        self.sort_query: list[tuple[str, int]] = sort_query
+        self.score: Optional[dict] = score
+
+    @property
+    def sort_field(self) -> str:
+        return self.sort_query[0][0]
+
+    @property
+    def uses_aggregation(self) -> bool:
+        """
+        Агрегация нужна только для сортировки по релевантности, которой нет в документах.
+        """
+        return self.score is not None
+
+    def projection(self) -> dict:
+        """
+        Поля карточки и поле сортировки, нужное для токена следующей страницы.
+        """
+        if self.uses_aggregation:
+            return {**DatasetBrief.PROJECTION, SCORE_FIELD: self.score}
+        return {**DatasetBrief.PROJECTION, self.sort_field: 1}
+
+    def find_command(self, keyset: dict, limit: int) -> dict:
+        """
+        Аргументы find: условие следующей страницы объединяется с фильтрами в одно условие по индексу.
+        """
+        return {
+            'filter': {'$and': [self.query, keyset]} if keyset else self.query,
+            'projection': self.projection(),
+            'sort': self.sort_query,
+            'limit': limit,
+        }
+
+    def pipeline(self, keyset: dict, limit: int) -> list[dict]:
+        """
+        Стадии агрегации. Фильтры стоят в первой стадии $match и используют индексы,
+        поля поиска отбрасываются сразу после вычисления релевантности.
+        """
+        return [
+            {'$match': self.query},
+            {'$project': self.projection()},
+            {'$match': keyset},
+            {'$sort': dict(self.sort_query)},
+            {'$limit': limit},
+        ]
+
+    def describe(self) -> dict:
+        return {
+            'method': 'aggregate' if self.uses_aggregation else 'find',
+            'query': self.query,
+            'sort': self.sort_query,
+            'projection': self.projection(),
+        }
+
+
+class FilterPlanner:
+    """
+    Строит FilterPlan по значениям фильтров.
+    """
+
+    @staticmethod
+    def plan(filters: Optional[FilterValues]) -> FilterPlan:
+        """
+        План для фильтров `filters` или для списка всех датасетов, если фильтров нет.
+        """
+        if filters is None:
+            return FilterPlan({}, [('_id', pymongo.ASCENDING)])
+
+        query: dict = {}
+        score: Optional[dict] = None
+
+        if filters.name:
+            name_condition, score = search_query(filters.name)
+            query.update(name_condition)
+
+        for field, from_attr, to_attr in RANGE_FILTERS:
+            from_: Optional[int | float | datetime] = getattr(filters, from_attr)
+            to_: Optional[int | float | datetime] = getattr(filters, to_attr)
+            if from_ is not None or to_ is not None:
+                query[field] = FilterPlanner._range_condition(from_, to_)
+
+        sort_query: list[tuple[str, int]] = []
+        if filters.sort is not None:
+            sort_query.append((filters.sort['field'], pymongo.ASCENDING if filters.sort['order'] == 'asc' else pymongo.DESCENDING))
+            # при явной сортировке релевантность не нужна, и поиск выполняется обычным find
+            score = None
+        elif score is not None:
+            # без явной сортировки результаты поиска упорядочены по релевантности
+            sort_query.append((SCORE_FIELD, pymongo.DESCENDING))
+
+        # _id идет в том же направлении, что и основное поле: индекс (field, _id) читается в обратном порядке
+        sort_query.append(('_id', sort_query[0][1] if sort_query else pymongo.ASCENDING))
+        return FilterPlan(query, sort_query, score)
+
+    @staticmethod
+    def _range_condition(from_: Optional[int | float | datetime], to_: Optional[int | float | datetime]) -> dict:
+        INT64_MAX: int = 9223372036854775807
+        DATETIME_MAX: datetime = datetime.today() + timedelta(days=1)
+
+        query: dict = {}
+        if from_ is not None:
+            if isinstance(from_, datetime):
+                query['$gte'] = min(from_, DATETIME_MAX)
+            else:
+                query['$gte'] = min(from_, INT64_MAX)
+        if to_ is not None:
+            if isinstance(to_, datetime):
+                query['$lte'] = min(datetime.combine(to_.date(), time.max), DATETIME_MAX)
+            else:
+                query['$lte'] = min(to_, INT64_MAX)
+        return query
@@ -0,0 +1,153 @@
+"""
+Реестр индексов всех коллекций приложения.
+Индексы описываются декларативно и создаются идемпотентно при запуске приложения
+(если APPLY_INDEXES_ON_STARTUP не равен false) или командой `flask indexes apply`.
+Команда `flask indexes report` показывает недостающие, лишние и неиспользуемые (по $indexStats) индексы.
+"""
+import json
+from typing import Optional
+
+import click
+import pymongo
+from flask.cli import AppGroup
+from pymongo.errors import OperationFailure
+
+from src.repository.connection import db
+from src.repository.dataset_repository import ACTIVITY_TOTAL_FIELDS
+
+# поля, по которым на главной странице фильтруют и сортируют датасеты
+DATASET_RANGE_FIELDS: tuple[str, ...] = (
+    'size', 'rowCount', 'columnCount', 'creationDate', 'lastModifiedDate', *ACTIVITY_TOTAL_FIELDS
+)
+
+
+class IndexSpec:
+    """
+    Описание одного индекса коллекции.
+    """
+
+    def __init__(self, collection: str, keys: list[tuple[str, int]], **options):
+        self.collection: str = collection
+        self.keys: list[tuple[str, int]] = keys
+        # имя по умолчанию совпадает с тем, которое MongoDB дает индексу без явного имени
+        self.name: str = options.pop('name', None) or '_'.join(f'{field}_{direction}' for field, direction in keys)
+        self.options: dict = options
+
+
+INDEXES: list[IndexSpec] = [
+    # вход, регистрация и поиск автора при загрузке датасета
+    IndexSpec('UserCollection', [('login', pymongo.ASCENDING)], unique=True),
+    IndexSpec('UserCollection', [('username', pymongo.ASCENDING)]),
+
+    # фильтр по диапазону поля и сортировка по нему с _id для стабильного порядка;
+    # _id сортируется в направлении поля, поэтому индекс обслуживает и убывающую сортировку
+    *(
+        IndexSpec('DatasetInfoCollection', [(field, pymongo.ASCENDING), ('_id', pymongo.ASCENDING)])
+        for field in DATASET_RANGE_FIELDS
+    ),
+
+    # поиск по подстроке названия и по словам названия и описания
+    IndexSpec('DatasetInfoCollection', [('searchTrigrams', pymongo.ASCENDING)]),
+    IndexSpec('DatasetInfoCollection', [('searchTokens', pymongo.ASCENDING)]),
+
+    IndexSpec('DatasetActivitySeries', [('datasetId', pymongo.ASCENDING), ('month', pymongo.ASCENDING)]),
+    IndexSpec('DatasetActivitySeries', [('month', pymongo.ASCENDING), ('rolledUp', pymongo.ASCENDING)]),
+    IndexSpec('DatasetActivitySeries', [('expireAt', pymongo.ASCENDING)], expireAfterSeconds=0),
+
+    IndexSpec('DatasetActivityRollups', [('datasetId', pymongo.ASCENDING), ('tier', pymongo.ASCENDING),
+                                         ('year', pymongo.ASCENDING)]),
+    IndexSpec('DatasetActivityRollups', [('tier', pymongo.ASCENDING)]),
+    IndexSpec('DatasetActivityRollups', [('expireAt', pymongo.ASCENDING)], expireAfterSeconds=0),
+
+    # выбор следующей задачи из очереди и задачи с истекшей арендой
+    IndexSpec('DatasetJobCollection', [('status', pymongo.ASCENDING), ('runAfter', pymongo.ASCENDING)]),
+    IndexSpec('DatasetJobCollection', [('status', pymongo.ASCENDING), ('leaseUntil', pymongo.ASCENDING)]),
+    IndexSpec('DatasetJobCollection', [('datasetId', pymongo.ASCENDING), ('createdAt', pymongo.DESCENDING)]),
+    IndexSpec('DatasetJobCollection', [('datasetId', pymongo.ASCENDING), ('type', pymongo.ASCENDING),
+                                       ('status', pymongo.ASCENDING)]),
+
+    # инкрементальные резервные копии: изменения графиков и удаления датасетов после предыдущей копии
+    IndexSpec('DatasetGraphsCollection', [('updatedAt', pymongo.ASCENDING)]),
+    IndexSpec('DatasetTombstones', [('deletedAt', pymongo.ASCENDING)]),
+    IndexSpec('DatasetTombstones', [('expireAt', pymongo.ASCENDING)], expireAfterSeconds=0),
+    IndexSpec('BackupHistory', [('until', pymongo.DESCENDING)]),
+
+    # история запусков задач планировщика: последние запуски и удаление по сроку хранения
+    IndexSpec('SchedulerJobHistory', [('startedAt', pymongo.DESCENDING)]),
+    IndexSpec('SchedulerJobHistory', [('jobId', pymongo.ASCENDING), ('startedAt', pymongo.DESCENDING)]),
+    IndexSpec('SchedulerJobHistory', [('expireAt', pymongo.ASCENDING)], expireAfterSeconds=0),
+]
+
+
+class IndexRegistry:
+    """
+    Создание индексов из реестра и отчет о состоянии индексов в БД.
+    """
+
+    @staticmethod
+    def apply(indexes: Optional[list[IndexSpec]] = None) -> list[str]:
+        """
+        Создает все индексы реестра. Уже существующие индексы с тем же описанием не пересоздаются.
+        Возвращает список индексов, которые создать не удалось (например, из-за дубликатов
+        для уникального индекса или индекса с тем же именем, но другим описанием).
+        """
+        failed: list[str] = []
+        for spec in indexes if indexes is not None else INDEXES:
+            try:
+                db[spec.collection].create_index(spec.keys, name=spec.name, **spec.options)
+            except OperationFailure as e:
+                print(f"IndexRegistry: Error creating index {spec.collection}.{spec.name}: {e}")
+                failed.append(f'{spec.collection}.{spec.name}')
+        return failed
+
+    @staticmethod
+    def report(indexes: Optional[list[IndexSpec]] = None) -> dict[str, dict]:
+        """
+        Для каждой коллекции возвращает недостающие индексы реестра, индексы, которых нет в реестре,
+        и индексы, к которым не было обращений с момента запуска сервера БД ($indexStats).
+        """
+        indexes = indexes if indexes is not None else INDEXES
+        collections: dict[str, list[IndexSpec]] = {}
+        for spec in indexes:
+            collections.setdefault(spec.collection, []).append(spec)
+
+        existing_collections: list[str] = db.list_collection_names()
+        report: dict[str, dict] = {}
+        for collection, specs in collections.items():
+            existing: dict = db[collection].index_information() if collection in existing_collections else {}
+            expected: set[str] = {spec.name for spec in specs}
+
+            usage: dict[str, int] = {}
+            if existing:
+                for stats in db[collection].aggregate([{'$indexStats': {}}]):
+                    usage[stats['name']] = usage.get(stats['name'], 0) + stats['accesses']['ops']
+
+            report[collection] = {
+                'missing': sorted(expected - set(existing)),
+                'unknown': sorted(set(existing) - expected - {'_id_'}),
+                'unused': sorted(name for name, ops in usage.items() if ops == 0 and name != '_id_'),
+                'accesses': usage,
+            }
+        return report
+
+
+index_cli = AppGroup('indexes', help='Управление индексами MongoDB.')
+
+
+@index_cli.command('apply')
+def apply_indexes_command() -> None:
+    """
+    Создает недостающие индексы из реестра.
+    """
+    failed: list[str] = IndexRegistry.apply()
+    click.echo(f'Indexes applied: {len(INDEXES) - len(failed)}, failed: {len(failed)}')
+    for name in failed:
+        click.echo(f'  failed: {name}')
+
+
+@index_cli.command('report')
+def report_indexes_command() -> None:
+    """
+    Печатает недостающие, лишние и неиспользуемые индексы.
+    """
+    click.echo(json.dumps(IndexRegistry.report(), indent=2, ensure_ascii=False))
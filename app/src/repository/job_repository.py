@@ -0,0 +1,156 @@
+"""
+Содержит репозиторий фоновых задач.
+Задачи хранятся в коллекции DatasetJobCollection и переживают перезапуск приложения.
+"""
+import uuid
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pymongo
+
+from src.repository.connection import db
+
+
+class JobRepository:
+    """
+    Класс-репозиторий для фоновых задач.
+    """
+
+    @staticmethod
+    def add_job(job_type: str, dataset_id: str, payload: dict, max_attempts: int) -> str:
+        """
+        Добавляет задачу в очередь. Еще не начатые задачи того же типа для датасета отменяются,
+        так как новая задача их заменяет.
+        """
+        now: datetime = datetime.now()
+        db['DatasetJobCollection'].update_many(
+            {'datasetId': dataset_id, 'type': job_type, 'status': 'queued'},
+            {'$set': {'status': 'cancelled', 'updatedAt': now, 'finishedAt': now}}
+        )
+
+        job_id: str = str(uuid.uuid4())
+        db['DatasetJobCollection'].insert_one({
+            '_id': job_id,
+            'type': job_type,
+            'datasetId': dataset_id,
+            'payload': payload,
+            'status': 'queued',
+            'attempts': 0,
+            'maxAttempts': max_attempts,
+            'progress': {'done': 0, 'total': 0},
+            'error': None,
+            'createdAt': now,
+            'updatedAt': now,
+            'runAfter': now,
+            'leaseUntil': None,
+            'finishedAt': None,
+        })
+        return job_id
+
+    @staticmethod
+    def claim_next_job(lease_seconds: float) -> Optional[dict]:
+        """
+        Атомарно забирает следующую задачу из очереди.
+        Задачи, аренда которых истекла (процесс-исполнитель упал), забираются повторно.
+        """
+        now: datetime = datetime.now()
+        return db['DatasetJobCollection'].find_one_and_update(
+            {'$or': [
+                {'status': 'queued', 'runAfter': {'$lte': now}},
+                {'status': 'running', 'leaseUntil': {'$lt': now}},
+            ]},
+            {
+                '$set': {
+                    'status': 'running',
+                    'leaseUntil': now + timedelta(seconds=lease_seconds),
+                    'updatedAt': now,
+                },
+                '$inc': {'attempts': 1},
+            },
+            sort=[('runAfter', pymongo.ASCENDING)],
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def set_job_progress(job_id: str, done: int, total: int, lease_seconds: float) -> bool:
+        """
+        Сохраняет прогресс выполнения задачи и продлевает ее аренду.
+        Возвращает False, если задача больше не выполняется (удалена вместе с датасетом или отменена).
+        """
+        now: datetime = datetime.now()
+        result = db['DatasetJobCollection'].update_one(
+            {'_id': job_id, 'status': 'running'},
+            {'$set': {
+                'progress': {'done': done, 'total': total},
+                'leaseUntil': now + timedelta(seconds=lease_seconds),
+                'updatedAt': now,
+            }}
+        )
+        return result.matched_count == 1
+
+    @staticmethod
+    def complete_job(job_id: str) -> None:
+        """
+        Помечает задачу как выполненную.
+        """
+        now: datetime = datetime.now()
+        db['DatasetJobCollection'].update_one(
+            {'_id': job_id},
+            {'$set': {'status': 'done', 'error': None, 'leaseUntil': None, 'updatedAt': now, 'finishedAt': now}}
+        )
+
+    @staticmethod
+    def cancel_job(job_id: str, reason: str) -> None:
+        """
+        Помечает задачу как отмененную. Удаленная задача не создается заново.
+        """
+        now: datetime = datetime.now()
+        db['DatasetJobCollection'].update_one(
+            {'_id': job_id},
+            {'$set': {'status': 'cancelled', 'error': reason, 'leaseUntil': None, 'updatedAt': now, 'finishedAt': now}}
+        )
+
+    @staticmethod
+    def fail_job(job_id: str, error: str, retry_delay: Optional[float]) -> None:
+        """
+        Возвращает задачу в очередь через `retry_delay` секунд.
+        Если `retry_delay` равен None, задача помечается как окончательно проваленная.
+        """
+        now: datetime = datetime.now()
+        if retry_delay is None:
+            update: dict = {'status': 'failed', 'finishedAt': now}
+        else:
+            update: dict = {'status': 'queued', 'runAfter': now + timedelta(seconds=retry_delay)}
+
+        update.update({'error': error, 'leaseUntil': None, 'updatedAt': now})
+        db['DatasetJobCollection'].update_one({'_id': job_id}, {'$set': update})
+
+    @staticmethod
+    def get_dataset_jobs(dataset_id: str, limit: int = 10) -> list[dict]:
+        """
+        Возвращает последние задачи датасета, начиная с самой новой.
+        """
+        cursor = db['DatasetJobCollection'].find(
+            {'datasetId': dataset_id},
+            {'payload': 0}
+        ).sort('createdAt', pymongo.DESCENDING).limit(limit)
+        return list(cursor)
+
+    @staticmethod
+    def has_pending_jobs(dataset_id: str) -> bool:
+        """
+        Проверяет, есть ли у датасета невыполненные задачи.
+        """
+        job = db['DatasetJobCollection'].find_one(
+            {'datasetId': dataset_id, 'status': {'$in': ['queued', 'running']}},
+            {'_id': 1}
+        )
+        return job is not None
+
+    @staticmethod
+    def remove_dataset_jobs(dataset_id: str) -> None:
+        """
+        Удаляет все задачи датасета.
+        """
+        db['DatasetJobCollection'].delete_many({'datasetId': dataset_id})
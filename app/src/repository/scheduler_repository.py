@@ -0,0 +1,98 @@
+"""
+Содержит репозиторий блокировок и истории запусков задач планировщика.
+Блокировка - документ коллекции SchedulerLocks на задачу: владелец, срок аренды и время последнего запуска.
+История запусков хранится в SchedulerJobHistory и удаляется по TTL-индексу на поле expireAt.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pymongo
+from pymongo.errors import DuplicateKeyError
+
+from src.repository.connection import db
+
+
+class SchedulerRepository:
+    """
+    Класс-репозиторий для блокировок и истории задач планировщика.
+    """
+
+    @staticmethod
+    def acquire_lease(job_id: str, owner: str, lease_seconds: float, min_interval_seconds: float) -> bool:
+        """
+        Берет аренду задачи, если ее никто не держит и задача не запускалась последние `min_interval_seconds`.
+        Документ задачи создается при первом запуске. Если документ есть, но условие не выполнено,
+        upsert пытается вставить документ с тем же _id и получает DuplicateKeyError - аренда занята.
+        """
+        now: datetime = datetime.now()
+        try:
+            lock: Optional[dict] = db['SchedulerLocks'].find_one_and_update(
+                {
+                    '_id': job_id,
+                    'leaseUntil': {'$lt': now},
+                    'lastStartedAt': {'$lt': now - timedelta(seconds=min_interval_seconds)},
+                },
+                {'$set': {
+                    'owner': owner,
+                    'leaseUntil': now + timedelta(seconds=lease_seconds),
+                    'heartbeatAt': now,
+                    'lastStartedAt': now,
+                }},
+                upsert=True,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return False
+        return lock is not None and lock['owner'] == owner
+
+    @staticmethod
+    def renew_lease(job_id: str, owner: str, lease_seconds: float) -> bool:
+        """
+        Продлевает аренду. Возвращает False, если аренда уже перешла к другому процессу.
+        """
+        now: datetime = datetime.now()
+        result = db['SchedulerLocks'].update_one(
+            {'_id': job_id, 'owner': owner},
+            {'$set': {'leaseUntil': now + timedelta(seconds=lease_seconds), 'heartbeatAt': now}}
+        )
+        return result.matched_count == 1
+
+    @staticmethod
+    def release_lease(job_id: str, owner: str) -> None:
+        now: datetime = datetime.now()
+        db['SchedulerLocks'].update_one(
+            {'_id': job_id, 'owner': owner},
+            {'$set': {'owner': None, 'leaseUntil': now, 'lastFinishedAt': now}}
+        )
+
+    @staticmethod
+    def add_history(job_id: str, owner: str, started_at: datetime, finished_at: datetime,
+                    status: str, result: Optional[dict], error: Optional[str]) -> None:
+        """
+        Записывает запуск задачи: длительность, результат (число затронутых документов) или ошибку.
+        """
+        retention_days: int = int(os.getenv('SCHEDULER_HISTORY_DAYS', 90))
+        db['SchedulerJobHistory'].insert_one({
+            'jobId': job_id,
+            'owner': owner,
+            'status': status,
+            'startedAt': started_at,
+            'finishedAt': finished_at,
+            'durationSeconds': (finished_at - started_at).total_seconds(),
+            'result': result,
+            'error': error,
+            'expireAt': finished_at + timedelta(days=retention_days),
+        })
+
+    @staticmethod
+    def get_history(limit: int = 20) -> list[dict]:
+        """
+        Последние запуски задач, начиная с самых новых.
+        """
+        return list(
+            db['SchedulerJobHistory']
+            .find({}, {'_id': 0, 'expireAt': 0})
+            .sort('startedAt', pymongo.DESCENDING)
+            .limit(limit)
+        )
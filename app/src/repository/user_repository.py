@@ -1,24 +1,8 @@
 """
 Содержит репозиторий для работы с данными пользователей в БД.
 """
-import os
-import pymongo
-
 from src.models.user import User
-
-
-uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
-client = pymongo.MongoClient(uri)
-db = None
-
-try:
-    client.admin.command('ping')
-    print("Successfully connected to MongoDB.")
-    db_name = os.getenv('MONGO_DB_NAME')
-    db = client[db_name]
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    db = None
+from src.repository.connection import db
 
 
 class UserRepository:
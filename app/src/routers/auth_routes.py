@@ -123,8 +123,9 @@ def load_user(user_id: str):
     """
     Функция, используемая Flask-Login для перезагрузки 
     пользовательского объекта из идентификатора пользователя, сохраненного в сеансе.
+    Пользователь берется из кэша процесса, заблокированный пользователь не загружается.
     """
-    return UserRepository.find_by_id(user_id)
+    return UserService.load_user(user_id)
 
 @login_manager.unauthorized_handler
 def unauthorized():
@@ -2,7 +2,6 @@
 Настраивает пути для endpoint'ов приложения. Сохраняет их в blueprint.
 """
 import os
-import pandas as pd
 
 from flask import Blueprint, Response, request, send_from_directory, current_app, render_template
 from flask_login import login_required
@@ -14,6 +13,7 @@ from src.controllers.admin_controller import AdminController
 
 from src.models import Dataset
 from src.models.DatasetActivity import DatasetActivity
+from src.models.DatasetPreview import DatasetPreview
 from src.util.decorators import admin_required
 
 bp: Blueprint = Blueprint('datasets', __name__)
@@ -88,34 +88,36 @@ def get_dataset(dataset_id: str) -> BadRequest | tuple[str, int] | str:
         return BadRequest('Invalid method')
 
     try:
-        dataset_info: Dataset = DatasetController.get_dataset(dataset_id)
-        dataset_graphs: Optional[list[dict]] = DatasetController.get_plots(dataset_id)
-        filepath: str = f'{dataset_info.dataset_path}/{dataset_info.dataset_id}.csv'
-
+        dataset_info: Optional[Dataset] = DatasetController.get_dataset(dataset_id)
+        if dataset_info is None:
+            return "Dataset not found", 404
+        plots_index: Optional[dict] = DatasetController.get_plots_index(dataset_id)
         max_cols_num: int = int(os.getenv('MAX_COLS_NUM'))
         max_rows_num: int = int(os.getenv('MAX_ROWS_NUM'))
         per_page_charts: int = int(os.getenv('PER_PAGE_CHARTS'))
 
-        df = pd.read_csv(filepath, nrows=max_rows_num, usecols=range(min(dataset_info.dataset_columns, max_cols_num)))
+        # предпросмотр сохраняется при загрузке файла, поэтому CSV здесь не читается
+        dataset_preview: DatasetPreview = DatasetController.get_preview(dataset_info)
+        headers: list[str] = list(dataset_preview.headers)
+        rows: list[list[str]] = [list(row) for row in dataset_preview.rows]
 
         if dataset_info.dataset_columns > max_cols_num:
-            df['...'] = '...'
-
-        headers = df.columns.tolist()
-        rows = df.values.tolist()
+            headers.append('...')
+            for row in rows:
+                row.append('...')
 
         if dataset_info.dataset_rows > max_rows_num:
             rows.append(['...'] * min(dataset_info.dataset_columns, max_cols_num))
 
+        plots_pending: bool = DatasetController.has_pending_jobs(dataset_id)
+
         DatasetController.incr_dataset_views(dataset_id)
         dataset_activity: DatasetActivity = DatasetController.get_dataset_activity(dataset_id)
         
         
-        dataset_graphs = [] if dataset_graphs is None else dataset_graphs
-        for d in dataset_graphs:
-            d['data'] = d['data'].decode('utf-8')
-            if 'violin' in d:
-                d['violin'] = d['violin'].decode('utf-8')
+        # сами графики страница загружает лениво через /dataset/<id>/plots/<col_idx>
+        dataset_graphs: list[dict] = plots_index['graphs'] if plots_index else []
+        plots_version: int = plots_index['version'] if plots_index else 0
 
         return render_template(
             'one_dataset.html',
@@ -124,7 +126,10 @@ def get_dataset(dataset_id: str) -> BadRequest | tuple[str, int] | str:
             headers=headers,
             rows=rows,
             max_cols_num=max_cols_num,
+            max_rows_num=max_rows_num,
             plots=dataset_graphs,
+            plots_version=plots_version,
+            plots_pending=plots_pending,
             per_page_charts=per_page_charts
         )
 
@@ -132,10 +137,55 @@ def get_dataset(dataset_id: str) -> BadRequest | tuple[str, int] | str:
         return "CSV file not found on server", 404
 
     except Exception as e:
-        raise e
+        print(f"get_dataset: Error rendering dataset {dataset_id}: {e}")
         return "Something went wrong", 500
 
 
+@bp.route('/dataset/<dataset_id>/plots/<int:col_idx>', methods=['GET'])
+@login_required
+def get_dataset_plot(dataset_id: str, col_idx: int) -> Response | BadRequest:
+    """
+    Обращается к методу контроллера для получения одного графика датасета.
+    """
+    if request.method != 'GET':
+        return BadRequest('Invalid method')
+    return DatasetController.get_plot(dataset_id, col_idx, request)
+
+
+@bp.route('/dataset/<dataset_id>/rows', methods=['GET'])
+@login_required
+def get_dataset_rows(dataset_id: str) -> Response | BadRequest:
+    """
+    Обращается к методу контроллера для получения страницы строк датасета (?offset=&limit=).
+    """
+    if request.method != 'GET':
+        return BadRequest('Invalid method')
+    return DatasetController.get_rows(dataset_id, request)
+
+
+@bp.route('/dataset/<dataset_id>/activity', methods=['GET'])
+@login_required
+def get_dataset_activity(dataset_id: str) -> Response | BadRequest:
+    """
+    Обращается к методу контроллера для получения ряда просмотров и загрузок датасета
+    (?from=&to=&granularity=).
+    """
+    if request.method != 'GET':
+        return BadRequest('Invalid method')
+    return DatasetController.get_activity_series(dataset_id, request)
+
+
+@bp.route('/dataset/<dataset_id>/jobs', methods=['GET'])
+@login_required
+def get_dataset_jobs(dataset_id: str) -> Response | BadRequest:
+    """
+    Обращается к методу контроллера для получения статуса фоновых задач датасета.
+    """
+    if request.method != 'GET':
+        return BadRequest('Invalid method')
+    return DatasetController.get_dataset_jobs(dataset_id)
+
+
 @bp.route('/dataset/download/<dataset_id>', methods=['GET'])
 @login_required
 def download_dataset(dataset_id: str):
@@ -164,7 +214,7 @@ def export_datasets() -> Response | BadRequest:
     if request.method != 'GET':
         return BadRequest('Invalid method')
 
-    return DatasetController.export_datasets()
+    return DatasetController.export_datasets(request)
 
 @bp.route('/datasets/import', methods=['POST'])
 @admin_required
@@ -222,4 +272,17 @@ def get_users() -> Response | BadRequest:
     try:
         return AdminController.get_users()
     except Exception as e:
-        return BadRequest(str(e))
\ No newline at end of file
+        return BadRequest(str(e))
+
+
+@bp.route('/admin/metrics/', methods=['GET'])
+@login_required
+@admin_required
+def get_metrics() -> Response | BadRequest:
+    """
+    Обращается к методу контроллера для получения внутренних метрик приложения.
+    Требует привилегии админа.
+    """
+    if request.method != 'GET':
+        return BadRequest('Invalid method')
+    return AdminController.get_metrics()
@@ -0,0 +1,180 @@
+"""
+Буфер счетчиков просмотров и загрузок датасетов.
+Инкременты копятся в памяти процесса по ключу (dataset_id, дата) и записываются в БД
+одним bulk_write раз в ACTIVITY_FLUSH_INTERVAL секунд или после ACTIVITY_FLUSH_THRESHOLD инкрементов.
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import date
+from typing import Optional
+
+from flask import Flask
+
+from src.repository.activity_repository import ActivityRepository
+
+ACTIVITY_FIELDS: tuple[str, ...] = ('views', 'downloads')
+
+
+class ActivityBuffer:
+    """
+    Потокобезопасный буфер инкрементов активности с фоновым потоком записи.
+    Пока буфер не запущен (например, в скриптах без приложения), инкременты пишутся в БД сразу.
+    """
+
+    def __init__(self):
+        self.app: Optional[Flask] = None
+
+        self.flush_interval: float = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', 5))
+        self.flush_threshold: int = int(os.getenv('ACTIVITY_FLUSH_THRESHOLD', 1000))
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+        self._pending: dict[tuple[str, str], dict[str, int]] = {}
+        self._buffered: int = 0
+
+        self._added_total: int = 0
+        self._flushed_total: int = 0
+        self._flushes: int = 0
+        self._failed_flushes: int = 0
+        self._last_flush_at: Optional[float] = None
+        self._last_flush_seconds: Optional[float] = None
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+
+    def start(self) -> None:
+        """
+        Запускает поток записи и регистрирует запись остатка буфера при завершении процесса.
+        Повторный вызов в том же процессе ничего не делает.
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        # после fork поток родителя не существует, а его буфер записывает сам родитель
+        with self._lock:
+            self._pending = {}
+            self._buffered = 0
+
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='activity-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """
+        Останавливает поток записи и сбрасывает в БД все накопленные инкременты.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self._thread = None
+        self.flush()
+
+    def add(self, dataset_id: str, field: str, amount: int = 1) -> None:
+        """
+        Добавляет `amount` к счетчику `field` датасета за сегодняшний день.
+        """
+        if self._thread is None or self._pid != os.getpid():
+            ActivityRepository.apply_activity_increments({(dataset_id, str(date.today())): {field: amount}})
+            return
+
+        with self._lock:
+            counters: dict[str, int] = self._pending.setdefault(
+                (dataset_id, str(date.today())), dict.fromkeys(ACTIVITY_FIELDS, 0)
+            )
+            counters[field] += amount
+            self._buffered += amount
+            self._added_total += amount
+            buffered: int = self._buffered
+
+        if buffered >= self.flush_threshold:
+            self._wakeup.set()
+
+    def pending(self, dataset_id: str) -> dict[str, dict[str, int]]:
+        """
+        Возвращает еще не записанные в БД инкременты датасета по датам.
+        """
+        with self._lock:
+            return {
+                day: dict(counters)
+                for (pending_id, day), counters in self._pending.items()
+                if pending_id == dataset_id
+            }
+
+    def flush(self) -> int:
+        """
+        Записывает накопленные инкременты одним bulk_write. Возвращает число записанных инкрементов.
+        Если запись не удалась, инкременты возвращаются в буфер и будут записаны при следующей попытке.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                buffered, self._buffered = self._buffered, 0
+
+            if not pending:
+                return 0
+
+            start: float = time.perf_counter()
+            try:
+                if self.app is not None:
+                    with self.app.app_context():
+                        ActivityRepository.apply_activity_increments(pending)
+                else:
+                    ActivityRepository.apply_activity_increments(pending)
+            except Exception as e:
+                print(f"ActivityBuffer: Error while flushing activity: {e}")
+                self._restore(pending, buffered)
+                with self._lock:
+                    self._failed_flushes += 1
+                return 0
+
+            with self._lock:
+                self._flushed_total += buffered
+                self._flushes += 1
+                self._last_flush_at = time.time()
+                self._last_flush_seconds = time.perf_counter() - start
+            return buffered
+
+    def metrics(self) -> dict:
+        """
+        Счетчики буфера для страницы метрик.
+        """
+        with self._lock:
+            return {
+                'buffered':           self._buffered,
+                'bufferedKeys':       len(self._pending),
+                'added':              self._added_total,
+                'flushed':            self._flushed_total,
+                'flushes':            self._flushes,
+                'failedFlushes':      self._failed_flushes,
+                'lastFlushAt':        self._last_flush_at,
+                'lastFlushSeconds':   self._last_flush_seconds,
+                'flushInterval':      self.flush_interval,
+                'flushThreshold':     self.flush_threshold,
+            }
+
+    def _restore(self, pending: dict[tuple[str, str], dict[str, int]], buffered: int) -> None:
+        with self._lock:
+            for key, counters in pending.items():
+                current: dict[str, int] = self._pending.setdefault(key, dict.fromkeys(ACTIVITY_FIELDS, 0))
+                for field, amount in counters.items():
+                    current[field] = current.get(field, 0) + amount
+            self._buffered += buffered
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+activity_buffer = ActivityBuffer()
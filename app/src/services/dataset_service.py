@@ -3,26 +3,35 @@
 """
 import os
 import uuid
-import numpy as np
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-from io import BytesIO
-from datetime import datetime, timezone
-from typing import Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterator, Optional, Tuple
 
 from flask_login import current_user
+from pymongo.errors import PyMongoError
 
 from src.models.Dataset import Dataset
 from src.models.DatasetActivity import DatasetActivity
 from src.models.DatasetFormValues import DatasetFormValues
+from src.models.DatasetJob import JobCancelled
+from src.models.DatasetPreview import DatasetPreview
 from src.models.FilterValues import FilterValues
+from src.repository.activity_repository import ACTIVITY_HISTORY_DAYS, ActivityRepository
+from src.repository.backup_repository import BackupRepository
 from src.repository.dataset_repository import DatasetRepository
+from src.services.activity_buffer import activity_buffer
+from src.util.cache import TTLCache
+from src.util.csv_upload import UploadedCsv, read_csv_preview, read_csv_rows
 
 from src.repository.user_repository import UserRepository
+from src.services.user_service import UserService
 from werkzeug.datastructures import FileStorage
 
-from io import BytesIO
+
+# число карточек датасетов, возвращаемых за один запрос списка
+DATASETS_PAGE_SIZE: int = int(os.getenv('DATASETS_PAGE_SIZE', 30))
+
+# кэш страниц списка датасетов по фильтрам, сортировке и версии каталога
+filter_cache = TTLCache(int(os.getenv('FILTER_CACHE_SIZE', 256)), float(os.getenv('FILTER_CACHE_TTL', 60)))
 
 
 class DatasetService:
@@ -31,18 +40,52 @@ class DatasetService:
     """
 
     @staticmethod
-    def get_all_datasets_brief() -> list:
+    def get_all_datasets_brief(after: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """
+        Обращается к методу репозитория для получения страницы Brief'ов всех датасетов в БД
+        и токена следующей страницы.
+        Если БД недоступна, возвращается пустая страница; она не кэшируется.
+        """
+        try:
+            return DatasetService._cached_page(
+                'all', after, lambda: DatasetRepository.get_all_datasets_brief(after, DATASETS_PAGE_SIZE)
+            )
+        except PyMongoError as e:
+            print(f"DatasetService: Error fetching dataset briefs from MongoDB: {e}")
+            return [], None
+
+    @staticmethod
+    def get_filtered_briefs(filters: FilterValues, after: Optional[str] = None) -> Tuple[list, Optional[str]]:
         """
-        Обращается к методу репозитория для получения списка Brief'ов всех датасетов в БД.
+        Обращается к методу репозитория для получения страницы Brief'ов датасетов, которые прошли фильтрацию,
+        и токена следующей страницы.
         """
-        return DatasetRepository.get_all_datasets_brief()
+        return DatasetService._cached_page(
+            filters.cache_key(), after, lambda: DatasetRepository.get_filtered_briefs(filters, after, DATASETS_PAGE_SIZE)
+        )
 
     @staticmethod
-    def get_filtered_briefs(filters: FilterValues) -> list:
+    def explain_filtered_briefs(filters: FilterValues, after: Optional[str] = None) -> dict:
         """
-        Обращается к методу репозитория для получения списка Brief'ов датасетов, которые прошли фильтрацию.
+        Обращается к методу репозитория для получения плана запроса фильтрации (без кэша).
         """
-        return DatasetRepository.get_filtered_briefs(filters)
+        return DatasetRepository.explain_filtered_briefs(filters, after, DATASETS_PAGE_SIZE)
+
+    @staticmethod
+    def _cached_page(filters_key: str, after: Optional[str],
+                     load: Callable[[], Tuple[list, Optional[str]]]) -> Tuple[list, Optional[str]]:
+        """
+        Возвращает страницу из кэша выборок или загружает ее из БД.
+        В ключ входит версия каталога, поэтому после добавления, изменения или удаления датасета
+        старые записи больше не находятся и вытесняются по LRU или TTL.
+        Кэшируются только успешно загруженные страницы: ошибка `load` передается вызывающему.
+        """
+        key: tuple = (DatasetRepository.get_catalog_version(), filters_key, after, DATASETS_PAGE_SIZE)
+        page: Optional[Tuple[list, Optional[str]]] = filter_cache.get(key)
+        if page is None:
+            page = load()
+            filter_cache.set(key, page)
+        return page
 
     @staticmethod
     def save_dataset(form_values: DatasetFormValues, author_username: str, filepath: str) -> str:
@@ -70,6 +113,7 @@ class DatasetService:
                     'createdDatasetsCount': user.createdDatasetsCount + 1
                 }
                 UserRepository.update_user_fields(user.id, update_payload)
+                UserService.invalidate_user(user.id)
                 current_user.createdDatasetsCount = user.createdDatasetsCount + 1
 
         return inserted_id
@@ -77,13 +121,34 @@ class DatasetService:
     @staticmethod
     def save_plots(dataset_id: str) -> None:
         graphs: list[dict] = DatasetService.create_plots(dataset_id)
-        DatasetRepository.add_plots(dataset_id, graphs)
+        DatasetRepository.edit_plots(dataset_id, graphs, DatasetRepository.get_dataset_version(dataset_id))
 
     @staticmethod
-    def create_plots(dataset_id: str) -> list[dict]:
+    def render_plots(dataset_id: str, payload: dict, on_progress: Callable[[int, int], None]) -> None:
+        """
+        Обработчик фоновой задачи построения графиков.
+        Графики сохраняются, только если в БД нет графиков более новой версии датасета.
+        Если датасет удален до или во время построения, задача отменяется.
         """
-        Создает список графиков по id датасета
+        if DatasetRepository.get_dataset_version(dataset_id) is None:
+            raise JobCancelled('Dataset was removed before plots were rendered')
+
+        graphs: list[dict] = DatasetService.create_plots(dataset_id, on_progress)
+        if not DatasetRepository.edit_plots(dataset_id, graphs, payload['version']):
+            raise JobCancelled('Dataset was removed while plots were rendered')
+
+    @staticmethod
+    def create_plots(dataset_id: str, on_progress: Optional[Callable[[int, int], None]] = None) -> list[dict]:
         """
+        Создает список графиков по id датасета.
+        После обработки каждого столбца вызывается `on_progress(done, total)`.
+        """
+        # pandas и построение графиков импортируются при первом построении, а не при запуске приложения
+        import numpy as np
+        import pandas as pd
+
+        from src.services.plot_renderer import PlotTask, plot_renderer
+
         def is_column_numeric(column) -> bool:
             if np.issubdtype(column.dtype, np.number):
                 return True
@@ -100,7 +165,9 @@ class DatasetService:
                 return True
             return column.nunique() <= max_unique_cat_count
 
-        dataset: Dataset = DatasetRepository.get_dataset(dataset_id)
+        dataset: Optional[Dataset] = DatasetRepository.get_dataset(dataset_id)
+        if dataset is None:
+            raise JobCancelled('Dataset was removed before plots were rendered')
         filepath = os.path.join(dataset.dataset_path, f'{dataset_id}.csv')
 
         max_cols_num: int = int(os.getenv('MAX_COLS_NUM', 30))
@@ -114,70 +181,39 @@ class DatasetService:
             engine='c'
         ).iloc[:max_samples_num]
 
-        graphs: list[dict] = []
         if df.empty:
-            return graphs
+            return []
 
-        cat_flag: bool = False
-        num_flag: bool = False
+        tasks: list[PlotTask] = []
         for col_idx, col in enumerate(df.columns):
             try:
-                if cat_flag := is_column_categorical(df[col], max_unique_count):
-                    pass
+                if is_column_categorical(df[col], max_unique_count):
+                    tasks.append(PlotTask(col_idx, str(col), df[col].dropna().to_numpy(), categorical=True))
 
-                elif num_flag := is_column_numeric(df[col]):
-                    df[col] = pd.to_numeric(df[col], errors='coerce').replace([np.inf, -np.inf], np.nan)
+                elif is_column_numeric(df[col]):
+                    values = pd.to_numeric(df[col], errors='coerce').replace([np.inf, -np.inf], np.nan)
 
-                    if df[col].notna().mean() < 0.5:
+                    if values.notna().mean() < 0.5:
                         # много пропущенных значений
                         continue
 
-                if cat_flag or num_flag:
-                    graph: dict = {}
-
-                    buf = BytesIO()
-                    plt.figure(figsize=(4, 2))
-
-                    if cat_flag:
-                        ax = sns.countplot(x=col, data=df, color='skyblue')
-                    else:
-                        ax = sns.histplot(data=df[col].dropna(), color='skyblue', kde=True, bins='auto')
-
-                    ax.set(xlabel=None, ylabel=None)
-                    sns.despine(left=True, bottom=True, right=True, top=True)
-                    plt.savefig(buf, format='svg', bbox_inches='tight', pad_inches=0, dpi=100)
-                    plt.close()
-
-                    graph['name'] = str(col_idx)
-                    graph['col_name'] = str(df.columns[col_idx])
-                    graph['data'] = buf.getvalue()
-
-                    if not cat_flag:
-                        buf = BytesIO()
-                        plt.figure(figsize=(4, 2))
-                        ax = sns.violinplot(data=df[col].dropna(), color='skyblue')
-                        ax.set(xlabel=None, ylabel=None)
-                        sns.despine(left=True, bottom=True, right=True, top=True)
-                        plt.savefig(buf, format='svg', bbox_inches='tight', pad_inches=0, dpi=100)
-                        plt.close()
-                        graph['violin'] = buf.getvalue()
-
-                    graphs.append(graph)
-
-                    buf.close()
+                    tasks.append(PlotTask(col_idx, str(col), values.dropna().to_numpy(), categorical=False))
 
             except Exception:
                 continue
 
-        return graphs
+        return plot_renderer.render(tasks, on_progress)
 
     @staticmethod
-    def update_dataset(dataset_id: str, form_values: DatasetFormValues, editor_username: str, filepath: str):
+    def update_dataset(dataset_id: str, form_values: DatasetFormValues, editor_username: str, filepath: str) -> Dataset:
         """
         Создает объект Dataset на основе `form_values`.
         Обращается к методу репозитория для изменения датасета в БД.
+        Возвращает обновленный датасет.
         """
-        old_dataset: Dataset = DatasetRepository.get_dataset(dataset_id)
+        old_dataset: Optional[Dataset] = DatasetRepository.get_dataset(dataset_id)
+        if old_dataset is None:
+            raise Exception(f'Element with {dataset_id} not found')
 
         if current_user.login != old_dataset.dataset_author_login and not current_user.is_admin:
             raise Exception('Invalid user permission for update dataset')
@@ -185,7 +221,7 @@ class DatasetService:
         dataset: Dataset = Dataset.from_form_values(form_values, old_dataset.dataset_id, old_dataset.dataset_author,
                                                     old_dataset.dataset_author_login,
                                                     filepath)
-        if not form_values.dataset_data:
+        if not form_values.dataset_file:
             dataset.dataset_columns = old_dataset.dataset_columns
             dataset.dataset_rows = old_dataset.dataset_rows
             dataset.dataset_size = old_dataset.dataset_size
@@ -195,35 +231,91 @@ class DatasetService:
         dataset.dataset_last_editor = editor_username
 
         DatasetRepository.edit_dataset(dataset)
+        return dataset
 
     @staticmethod
-    def update_graphs(dataset_id: str) -> None:
-        graphs: list[dict] = DatasetService.create_plots(dataset_id)
-        DatasetRepository.edit_plots(dataset_id, graphs)
-
-    @staticmethod
-    def get_dataset(dataset_id: str) -> Dataset:
+    def get_dataset(dataset_id: str) -> Optional[Dataset]:
         return DatasetRepository.get_dataset(dataset_id)
     
+    @staticmethod
+    def save_preview(dataset_id: str, dataset_version: int, dataset_file: UploadedCsv) -> None:
+        """
+        Сохраняет предпросмотр, собранный при загрузке файла.
+        """
+        preview = DatasetPreview(dataset_id, dataset_version, dataset_file.header, dataset_file.preview)
+        DatasetRepository.save_preview(preview)
+
+    @staticmethod
+    def keep_preview(dataset_id: str, dataset_version: int) -> None:
+        """
+        Оставляет сохраненный предпросмотр актуальным, если при изменении датасета файл не менялся.
+        """
+        DatasetRepository.set_preview_version(dataset_id, dataset_version)
+
+    @staticmethod
+    def get_preview(dataset: Dataset) -> DatasetPreview:
+        """
+        Возвращает предпросмотр датасета.
+        Если снимка нет или он относится к другой версии, он собирается заново из первых строк файла
+        (без pandas) и сохраняется.
+        """
+        preview: Optional[DatasetPreview] = DatasetRepository.get_preview(dataset.dataset_id)
+        if preview is not None and preview.dataset_version == dataset.dataset_version:
+            return preview
+
+        filepath = os.path.join(dataset.dataset_path, f'{dataset.dataset_id}.csv')
+        headers, rows = read_csv_preview(filepath, int(os.getenv('MAX_ROWS_NUM', 30)), int(os.getenv('MAX_COLS_NUM', 30)))
+
+        preview = DatasetPreview(dataset.dataset_id, dataset.dataset_version, headers, rows)
+        DatasetRepository.save_preview(preview)
+        return preview
+
+    @staticmethod
+    def get_rows(dataset: Dataset, offset: int, limit: int) -> list[list[str]]:
+        """
+        Возвращает записи датасета [offset, offset + limit), читая файл с ближайшего
+        проиндексированного смещения.
+        """
+        filepath = os.path.join(dataset.dataset_path, f'{dataset.dataset_id}.csv')
+        return read_csv_rows(filepath, offset, limit, int(os.getenv('MAX_COLS_NUM', 30)))
+
     @staticmethod
     def get_dataset_activity(dataset_id: str) -> DatasetActivity:
-        return DatasetRepository.get_dataset_activity(dataset_id)
+        """
+        Возвращает активность датасета по дням за последние ACTIVITY_HISTORY_DAYS дней.
+        """
+        today: date = date.today()
+        return DatasetService.get_activity_series(dataset_id, today - timedelta(days=ACTIVITY_HISTORY_DAYS - 1), today, 'day')
+
+    @staticmethod
+    def get_activity_series(dataset_id: str, date_from: date, date_to: date,
+                            granularity: Optional[str] = None) -> DatasetActivity:
+        """
+        Возвращает активность датасета за диапазон дат вместе с еще не записанными в БД инкрементами из буфера.
+        """
+        activity: DatasetActivity = ActivityRepository.get_activity_series(dataset_id, date_from, date_to, granularity)
+        activity.add_pending(activity_buffer.pending(dataset_id))
+        return activity
     
     @staticmethod
-    def init_dataset_activity(dataset_id: str) -> None:
-        DatasetRepository.init_dataset_activity(dataset_id)
+    def remove_dataset_activity(dataset_id: str) -> None:
+        ActivityRepository.remove_dataset_activity(dataset_id)
 
     @staticmethod
     def incr_dataset_views(dataset_id: str) -> None:
-        DatasetRepository.incr_dataset_views(dataset_id)
+        activity_buffer.add(dataset_id, 'views')
 
     @staticmethod
     def incr_dataset_downloads(dataset_id: str) -> None:
-        DatasetRepository.incr_dataset_downloads(dataset_id)
+        activity_buffer.add(dataset_id, 'downloads')
     
     @staticmethod
-    def get_plots(dataset_id: str) -> Optional[list[dict]]:
-        return DatasetRepository.get_plots(dataset_id)
+    def get_plots_index(dataset_id: str) -> Optional[dict]:
+        return DatasetRepository.get_plots_index(dataset_id)
+
+    @staticmethod
+    def get_plot(dataset_id: str, col_idx: int) -> Optional[dict]:
+        return DatasetRepository.get_plot(dataset_id, col_idx)
 
     @staticmethod
     def edit_dataset(dataset_id: str) -> Dataset:
@@ -257,6 +349,7 @@ class DatasetService:
                 'createdDatasetsCount': new_created_datasets_count
             }
             UserRepository.update_user_fields(author_user.id, update_payload)
+            UserService.invalidate_user(author_user.id)
 
             # If the current logged-in user is the author of the removed dataset,
             # update their in-memory (session) object attributes as well.
@@ -270,14 +363,22 @@ class DatasetService:
     @staticmethod
     def remove_graphs(dataset_id: str) -> None:
         return DatasetRepository.remove_graphs(dataset_id)
+
+    @staticmethod
+    def remove_preview(dataset_id: str) -> None:
+        return DatasetRepository.remove_preview(dataset_id)
       
     @staticmethod
-    def export_datasets_archive() -> Tuple[BytesIO, str]:
-        return DatasetRepository.export_datasets_archive()
+    def export_datasets_archive(kind: str = 'full') -> Tuple[Iterator[bytes], str]:
+        """
+        Полная (`full`) или инкрементальная (`delta`) резервная копия.
+        """
+        pretty_json: bool = os.getenv('EXPORT_PRETTY_JSON', 'false').lower() == 'true'
+        return BackupRepository.export_archive(kind, pretty_json)
 
     @staticmethod
-    def import_datasets_archive(backup: FileStorage) -> None:
-        return DatasetRepository.import_datasets_archive(backup)
+    def import_datasets_archive(backups: list[FileStorage]) -> None:
+        return BackupRepository.import_archives(backups)
 
     @staticmethod
     def extract_filter_values(request) -> FilterValues:
@@ -332,10 +433,10 @@ class DatasetService:
             return {'field': 'columnCount', 'order': form_data['column-size-sort']}
 
         if form_data['views-sort'] != '':
-            return {'field': 'totalViews', 'order': form_data['views-sort']}
+            return {'field': 'views30d', 'order': form_data['views-sort']}
 
         if form_data['downloads-sort'] != '':
-            return {'field': 'totalDownloads', 'order': form_data['downloads-sort']}
+            return {'field': 'downloads30d', 'order': form_data['downloads-sort']}
 
         if form_data['creation-date-sort'] != '':
             return {'field': 'creationDate', 'order': form_data['creation-date-sort']}
@@ -0,0 +1,91 @@
+"""
+Векторизованная оценка плотности распределения столбца.
+Значения один раз линейно раскладываются по равномерной сетке, а затем сетка сворачивается
+с гауссовским ядром через FFT. Стоимость свертки зависит только от размера сетки, а не от числа строк.
+"""
+from typing import Optional
+
+import numpy as np
+
+GRID_SIZE: int = 512
+OUTPUT_POINTS: int = 128
+
+
+def scott_bandwidth(values: np.ndarray) -> float:
+    """
+    Ширина окна по правилу Скотта (так же ее выбирают seaborn и scipy.stats.gaussian_kde).
+    """
+    if len(values) < 2:
+        return 1.0
+    std: float = float(values.std(ddof=1))
+    return std * len(values) ** (-1 / 5) if std > 0 else 1.0
+
+
+def linear_binning(values: np.ndarray, lo: float, hi: float, grid_size: int) -> np.ndarray:
+    """
+    Раскладывает значения по `grid_size` узлам равномерной сетки на [lo, hi]:
+    каждое значение делит свой вес между двумя соседними узлами пропорционально расстоянию до них.
+    """
+    step: float = (hi - lo) / (grid_size - 1)
+    position: np.ndarray = (values - lo) / step
+    left: np.ndarray = np.clip(np.floor(position).astype(np.int64), 0, grid_size - 2)
+    right_weight: np.ndarray = np.clip(position - left, 0.0, 1.0)
+
+    counts: np.ndarray = np.bincount(left, weights=1.0 - right_weight, minlength=grid_size)
+    counts += np.bincount(left + 1, weights=right_weight, minlength=grid_size)
+    return counts
+
+
+def binned_kde(values: np.ndarray, cut: float = 3.0, bandwidth: Optional[float] = None,
+               grid_size: int = GRID_SIZE, points: int = OUTPUT_POINTS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Гауссовская оценка плотности на сетке, продолженной на `cut` ширин окна за пределы данных.
+    Возвращает `points` узлов сетки и значения плотности в них (интеграл плотности равен 1).
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.zeros(0), np.zeros(0)
+
+    if bandwidth is None:
+        bandwidth = scott_bandwidth(values)
+
+    lo: float = float(values.min()) - cut * bandwidth
+    hi: float = float(values.max()) + cut * bandwidth
+    if hi <= lo:
+        lo, hi = lo - 1.0, hi + 1.0
+
+    grid: np.ndarray = np.linspace(lo, hi, grid_size)
+    step: float = grid[1] - grid[0]
+    counts: np.ndarray = linear_binning(values, lo, hi, grid_size)
+
+    # ядро обрезается на 4 ширинах окна, дальше его вклад пренебрежимо мал
+    half_width: int = min(int(np.ceil(4 * bandwidth / step)), grid_size - 1)
+    offsets: np.ndarray = np.arange(-half_width, half_width + 1) * step
+    kernel: np.ndarray = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+
+    fft_size: int = 1 << int(np.ceil(np.log2(grid_size + len(kernel) - 1)))
+    convolved: np.ndarray = np.fft.irfft(np.fft.rfft(counts, fft_size) * np.fft.rfft(kernel, fft_size), fft_size)
+    density: np.ndarray = np.maximum(convolved[half_width:half_width + grid_size], 0.0) / len(values)
+
+    if points < grid_size:
+        sampled: np.ndarray = np.linspace(lo, hi, points)
+        return sampled, np.interp(sampled, grid, density)
+    return grid, density
+
+
+def histogram(values: np.ndarray, max_bins: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Гистограмма с числом столбцов по правилу numpy bins='auto' (максимум из оценок Стёрджеса и
+    Фридмана-Диакониса), но не более `max_bins`. Возвращает границы и высоты столбцов.
+    """
+    n: int = len(values)
+    bins: float = np.log2(n) + 1 if n > 0 else 1
+
+    value_range: float = float(np.ptp(values)) if n > 0 else 0.0
+    q1, q3 = np.percentile(values, [25, 75]) if n > 0 else (0.0, 0.0)
+    if q3 > q1 and value_range > 0:
+        bins = max(bins, value_range / (2 * (q3 - q1) * n ** (-1 / 3)))
+
+    counts, edges = np.histogram(values, bins=int(min(max(np.ceil(bins), 1), max_bins)))
+    return edges, counts
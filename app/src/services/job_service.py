@@ -0,0 +1,193 @@
+"""
+Сервис фоновых задач. Содержит постановку задач в очередь и пул потоков-исполнителей,
+работающий внутри процесса приложения.
+Пул запущен в каждом рабочем процессе и в каждой реплике, но задачи забирает только процесс,
+держащий аренду JOB_CONSUMER_LOCK в SchedulerLocks, поэтому число одновременно строящихся графиков
+на всё развертывание не превышает JOB_WORKERS (и PLOT_WORKERS процессов построения SVG).
+"""
+import os
+import socket
+import threading
+import traceback
+import uuid
+from typing import Callable, Optional
+
+from flask import Flask
+
+from src.models.DatasetJob import DatasetJob, JobCancelled
+from src.repository.job_repository import JobRepository
+from src.repository.scheduler_repository import SchedulerRepository
+from src.services.dataset_service import DatasetService
+
+PLOTS_JOB: str = 'plots'
+JOB_CONSUMER_LOCK: str = 'job_consumer'
+
+
+class JobService:
+    """
+    Класс-сервис для логики, связанной с фоновыми задачами.
+    """
+
+    @staticmethod
+    def enqueue_plots(dataset_id: str, dataset_version: int) -> str:
+        """
+        Ставит в очередь построение графиков для версии `dataset_version` датасета.
+        """
+        job_id: str = JobRepository.add_job(
+            PLOTS_JOB, dataset_id,
+            payload={'version': dataset_version},
+            max_attempts=int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+        )
+        job_workers.notify()
+        return job_id
+
+    @staticmethod
+    def get_dataset_jobs(dataset_id: str) -> list[DatasetJob]:
+        return [DatasetJob(doc) for doc in JobRepository.get_dataset_jobs(dataset_id)]
+
+    @staticmethod
+    def has_pending_jobs(dataset_id: str) -> bool:
+        return JobRepository.has_pending_jobs(dataset_id)
+
+    @staticmethod
+    def remove_dataset_jobs(dataset_id: str) -> None:
+        JobRepository.remove_dataset_jobs(dataset_id)
+
+
+class JobWorkerPool:
+    """
+    Пул потоков, забирающих задачи из DatasetJobCollection.
+    Упавшая задача повторяется с экспоненциальной задержкой, пока не исчерпает `maxAttempts`.
+    """
+
+    def __init__(self, handlers: dict[str, Callable]):
+        self.handlers: dict[str, Callable] = handlers
+        self.app: Optional[Flask] = None
+
+        self.workers_num: int = int(os.getenv('JOB_WORKERS', 2))
+        self.poll_interval: float = float(os.getenv('JOB_POLL_INTERVAL', 2))
+        self.lease_seconds: float = float(os.getenv('JOB_LEASE_SECONDS', 600))
+        self.retry_delay: float = float(os.getenv('JOB_RETRY_DELAY', 5))
+        self.consumer_lease_seconds: float = float(os.getenv('SCHEDULER_LEASE_SECONDS', 60))
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._consumer = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._pid: Optional[int] = None
+        self._owner: Optional[str] = None
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+
+    def start(self) -> None:
+        """
+        Запускает потоки-исполнители. Повторный вызов в том же процессе ничего не делает.
+        """
+        if (self._threads and self._pid == os.getpid()) or self.workers_num <= 0:
+            return
+
+        # после fork потоков родителя в дочернем процессе нет
+        self._threads = []
+        self._pid = os.getpid()
+        self._owner = f'{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}'
+        self._stop.clear()
+        self._consumer.clear()
+
+        lease_thread = threading.Thread(target=self._hold_consumer_lease, name='job-consumer-lease', daemon=True)
+        lease_thread.start()
+        self._threads.append(lease_thread)
+
+        for i in range(self.workers_num):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._consumer.is_set():
+            self._consumer.clear()
+            SchedulerRepository.release_lease(JOB_CONSUMER_LOCK, self._owner)
+
+    def notify(self) -> None:
+        """
+        Будит исполнителей, чтобы новая задача не ждала очередного опроса.
+        """
+        self._wakeup.set()
+
+    def _hold_consumer_lease(self) -> None:
+        """
+        Берет аренду исполнителя задач, если ее никто не держит, и продлевает ее каждую треть срока.
+        Если процесс-исполнитель упал, аренду через SCHEDULER_LEASE_SECONDS секунд берет другой процесс.
+        """
+        while not self._stop.is_set():
+            try:
+                if self._consumer.is_set():
+                    if not SchedulerRepository.renew_lease(JOB_CONSUMER_LOCK, self._owner, self.consumer_lease_seconds):
+                        print("JobWorkerPool: Job consumer lease was taken over by another process")
+                        self._consumer.clear()
+                elif SchedulerRepository.acquire_lease(JOB_CONSUMER_LOCK, self._owner, self.consumer_lease_seconds, 0):
+                    self._consumer.set()
+                    self._wakeup.set()
+            except Exception as e:
+                print(f"JobWorkerPool: Error holding job consumer lease: {e}")
+
+            self._stop.wait(self.consumer_lease_seconds / 3)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self._consumer.is_set():
+                self._consumer.wait(self.poll_interval)
+                continue
+
+            try:
+                with self.app.app_context():
+                    job: Optional[dict] = JobRepository.claim_next_job(self.lease_seconds)
+                    if job is not None:
+                        self._execute(job)
+                        continue
+            except Exception as e:
+                print(f"JobWorkerPool: Error while polling jobs: {e}")
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _execute(self, job: dict) -> None:
+        job_id: str = job['_id']
+        handler: Optional[Callable] = self.handlers.get(job['type'])
+
+        if handler is None:
+            JobRepository.fail_job(job_id, f"Unknown job type '{job['type']}'", retry_delay=None)
+            return
+
+        if job['attempts'] > job['maxAttempts']:
+            JobRepository.fail_job(job_id, job.get('error') or 'Job lease expired', retry_delay=None)
+            return
+
+        def on_progress(done: int, total: int) -> None:
+            if not JobRepository.set_job_progress(job_id, done, total, self.lease_seconds):
+                raise JobCancelled('Job was removed while running')
+
+        try:
+            handler(job['datasetId'], job['payload'], on_progress)
+        except JobCancelled as e:
+            print(f"JobWorkerPool: Job {job_id} ({job['type']}) cancelled: {e}")
+            JobRepository.cancel_job(job_id, str(e))
+            return
+        except Exception as e:
+            print(f"JobWorkerPool: Job {job_id} ({job['type']}) failed: {e}")
+            traceback.print_exc()
+
+            retry_delay: Optional[float] = None
+            if job['attempts'] < job['maxAttempts']:
+                retry_delay = self.retry_delay * 2 ** (job['attempts'] - 1)
+            JobRepository.fail_job(job_id, str(e), retry_delay)
+            return
+
+        JobRepository.complete_job(job_id)
+
+
+job_workers = JobWorkerPool({
+    PLOTS_JOB: DatasetService.render_plots,
+})
@@ -0,0 +1,251 @@
+"""
+Построение графиков столбцов датасета.
+
+Поддерживается два режима (переменная окружения CHART_MODE):
+    data - для столбца сохраняются только числовые данные графика (границы и высоты столбцов гистограммы,
+           точки KDE гистограммы и скрипичной диаграммы, квартили, частоты категорий), а рисует их браузер;
+    svg  - графики строятся через объектный API matplotlib (Figure + FigureCanvasAgg) без глобального
+           состояния pyplot и сохраняются как SVG, поэтому столбцы можно обрабатывать параллельно в пуле процессов.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import TYPE_CHECKING, Callable, Optional
+
+import numpy as np
+
+from src.services import density
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+MAX_HIST_BINS: int = 64
+VIOLIN_CUT: float = 2.0
+SIGNIFICANT_DIGITS: int = 4
+
+
+class PlotTask:
+    """
+    Данные одного столбца, по которым строятся графики.
+    """
+
+    def __init__(self, col_idx: int, col_name: str, values: np.ndarray, categorical: bool):
+        self.col_idx: int = col_idx
+        self.col_name: str = col_name
+        self.values: np.ndarray = values
+        self.categorical: bool = categorical
+
+
+def compute_column_data(task: PlotTask) -> Optional[dict]:
+    """
+    Вычисляет данные графиков одного столбца для отрисовки на клиенте.
+    Возвращает словарь в формате DatasetGraphsCollection или None, если столбец пустой.
+    """
+    if len(task.values) == 0:
+        return None
+
+    try:
+        return _column_data(task)
+    except Exception:
+        return None
+
+
+def _column_data(task: PlotTask) -> dict:
+    graph: dict = {
+        'name': str(task.col_idx),
+        'col_name': task.col_name,
+    }
+
+    if task.categorical:
+        labels, counts = np.unique(task.values.astype(str), return_counts=True)
+        graph['kind'] = 'categorical'
+        graph['categories'] = {'labels': labels.tolist(), 'counts': counts.tolist()}
+        return graph
+
+    values: np.ndarray = task.values.astype(float)
+    edges, counts = density.histogram(values, MAX_HIST_BINS)
+    kde_x, kde_y = _histogram_kde(values, edges)
+    # скрипичная диаграмма строится по своей KDE, продолженной за пределы данных, как в _draw_violin
+    violin_x, violin_y = density.binned_kde(values, cut=VIOLIN_CUT)
+
+    graph['kind'] = 'numeric'
+    graph['hist'] = {'edges': _compact(edges), 'counts': counts.tolist()}
+    graph['kde'] = {'x': _compact(kde_x), 'y': _compact(kde_y)}
+    graph['violin'] = {'x': _compact(violin_x), 'y': _compact(violin_y)}
+    graph['quartiles'] = _compact(np.percentile(values, [0, 25, 50, 75, 100]))
+    return graph
+
+
+def _histogram_kde(values: np.ndarray, edges: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    KDE в пределах данных, масштабированная к высоте столбцов гистограммы, как в seaborn.histplot(kde=True).
+    """
+    kde_x, kde_y = density.binned_kde(values, cut=0)
+    return kde_x, kde_y * len(values) * (edges[1] - edges[0])
+
+
+def _compact(array: np.ndarray) -> list[float]:
+    """
+    Округляет значения до SIGNIFICANT_DIGITS значащих цифр, чтобы документ графика оставался маленьким.
+    """
+    return [float(f'{value:.{SIGNIFICANT_DIGITS}g}') for value in array.tolist()]
+
+
+def render_column(task: PlotTask) -> Optional[dict]:
+    """
+    Строит графики одного столбца. Возвращает словарь в формате DatasetGraphsCollection
+    или None, если построить график не удалось.
+    """
+    # seaborn и matplotlib нужны только в режиме svg и импортируются при первом графике
+    import seaborn as sns
+
+    try:
+        fig, ax = _new_figure()
+        if task.categorical:
+            sns.countplot(x=task.values, color='skyblue', ax=ax)
+        else:
+            values: np.ndarray = task.values.astype(float)
+            edges, counts = density.histogram(values, MAX_HIST_BINS)
+            ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='skyblue', edgecolor='white')
+            ax.plot(*_histogram_kde(values, edges), color='skyblue')
+
+        graph: dict = {
+            'name': str(task.col_idx),
+            'col_name': task.col_name,
+            'kind': 'categorical' if task.categorical else 'numeric',
+            'data': _to_svg(fig, ax),
+        }
+
+        if not task.categorical:
+            fig, ax = _new_figure()
+            _draw_violin(ax, values)
+            graph['violin'] = _to_svg(fig, ax)
+
+        return graph
+    except Exception:
+        return None
+
+
+def _draw_violin(ax, values: np.ndarray) -> None:
+    """
+    Рисует скрипичную диаграмму по бинированной KDE: контур плотности и внутренний box plot.
+    """
+    grid, values_density = density.binned_kde(values, cut=VIOLIN_CUT)
+    half_width: np.ndarray = values_density / values_density.max() * 0.4
+    ax.fill_betweenx(grid, -half_width, half_width, color='skyblue', linewidth=0)
+
+    min_, q1, median, q3, max_ = np.percentile(values, [0, 25, 50, 75, 100])
+    ax.vlines(0, min_, max_, color='#4c4c4c', linewidth=1)
+    ax.vlines(0, q1, q3, color='#4c4c4c', linewidth=5)
+    ax.scatter([0], [median], color='white', s=12, zorder=3)
+    ax.set_xlim(-0.5, 0.5)
+    ax.set_xticks([])
+
+
+def _new_figure() -> tuple['Figure', object]:
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(4, 2))
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def _to_svg(fig: 'Figure', ax) -> bytes:
+    import seaborn as sns
+
+    ax.set(xlabel=None, ylabel=None)
+    sns.despine(ax=ax, left=True, bottom=True, right=True, top=True)
+
+    with BytesIO() as buf:
+        fig.savefig(buf, format='svg', bbox_inches='tight', pad_inches=0, dpi=100)
+        return buf.getvalue()
+
+
+class PlotRenderer:
+    """
+    Распределяет построение SVG-графиков по ограниченному пулу процессов.
+    При PLOT_WORKERS <= 1 графики строятся последовательно в текущем процессе.
+    Данные графиков в режиме data считаются векторно и всегда в текущем процессе.
+    """
+
+    def __init__(self):
+        self.mode: str = os.getenv('CHART_MODE', 'data')
+        self.workers_num: int = int(os.getenv('PLOT_WORKERS', min(4, os.cpu_count() or 1)))
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def render(self, tasks: list[PlotTask], on_progress: Optional[Callable[[int, int], None]] = None) -> list[dict]:
+        """
+        Строит графики для всех `tasks`. Результат упорядочен по номеру столбца.
+        """
+        if self.mode == 'data':
+            return self.render_serial(tasks, on_progress, compute_column_data)
+
+        if self.workers_num <= 1 or len(tasks) <= 1:
+            return self.render_serial(tasks, on_progress)
+
+        executor: ProcessPoolExecutor = self._get_executor()
+        graphs: list[dict] = []
+        futures: list[Future] = []
+        try:
+            for task in tasks:
+                futures.append(executor.submit(render_column, task))
+            for done, future in enumerate(as_completed(futures), start=1):
+                graph: Optional[dict] = future.result()
+                if graph is not None:
+                    graphs.append(graph)
+                if on_progress is not None:
+                    on_progress(done, len(tasks))
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise
+        except Exception:
+            # задача отменена из on_progress или не все столбцы удалось отправить в пул:
+            # оставшиеся столбцы не строим
+            for future in futures:
+                future.cancel()
+            raise
+
+        graphs.sort(key=lambda graph: int(graph['name']))
+        return graphs
+
+    @staticmethod
+    def render_serial(tasks: list[PlotTask], on_progress: Optional[Callable[[int, int], None]] = None,
+                      render_func: Callable[[PlotTask], Optional[dict]] = render_column) -> list[dict]:
+        """
+        Последовательно строит графики в текущем процессе.
+        """
+        graphs: list[dict] = []
+        for done, task in enumerate(tasks, start=1):
+            graph: Optional[dict] = render_func(task)
+            if graph is not None:
+                graphs.append(graph)
+            if on_progress is not None:
+                on_progress(done, len(tasks))
+        return graphs
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            # пул, унаследованный при fork, в дочернем процессе непригоден
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers_num,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+plot_renderer = PlotRenderer()
@@ -0,0 +1,98 @@
+"""
+Задачи планировщика, которые выполняются одним процессом на весь кластер.
+Планировщик запущен в каждом рабочем процессе и в каждой реплике, но задачу выполняет только процесс,
+взявший ее аренду в SchedulerLocks. Пока задача выполняется, фоновый поток продлевает аренду;
+если процесс упал, аренда истекает через SCHEDULER_LEASE_SECONDS секунд.
+"""
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+
+from src.repository.activity_repository import ActivityRepository
+from src.repository.scheduler_repository import SchedulerRepository
+
+# один запуск ежедневной задачи на кластер, даже если часы процессов немного расходятся
+DAILY_MIN_INTERVAL_SECONDS: float = 3600
+
+
+class LeaseHeartbeat:
+    """
+    Поток, продлевающий аренду задачи каждую треть срока аренды.
+    """
+
+    def __init__(self, job_id: str, owner: str, lease_seconds: float):
+        self.job_id: str = job_id
+        self.owner: str = owner
+        self.lease_seconds: float = lease_seconds
+        self.lost: bool = False
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'lease-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not SchedulerRepository.renew_lease(self.job_id, self.owner, self.lease_seconds):
+                    self.lost = True
+                    print(f"SchedulerService: Lease of job {self.job_id} was taken over by another process")
+                    return
+            except Exception as e:
+                print(f"SchedulerService: Error renewing lease of job {self.job_id}: {e}")
+
+
+class SchedulerService:
+    """
+    Класс-сервис для выполнения задач планировщика под блокировкой.
+    """
+
+    @staticmethod
+    def run_exclusive(job_id: str, func: Callable[[], Optional[dict]],
+                      min_interval_seconds: float = DAILY_MIN_INTERVAL_SECONDS) -> bool:
+        """
+        Выполняет `func`, если удалось взять аренду задачи `job_id`, и записывает запуск в историю.
+        Возвращает False, если задачу уже выполняет или недавно выполнил другой процесс.
+        """
+        owner: str = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        lease_seconds: float = float(os.getenv('SCHEDULER_LEASE_SECONDS', 60))
+
+        if not SchedulerRepository.acquire_lease(job_id, owner, lease_seconds, min_interval_seconds):
+            return False
+
+        started_at: datetime = datetime.now()
+        result: Optional[dict] = None
+        error: Optional[str] = None
+        status: str = 'succeeded'
+        try:
+            with LeaseHeartbeat(job_id, owner, lease_seconds) as heartbeat:
+                result = func()
+            if heartbeat.lost:
+                status = 'leaseLost'
+        except Exception as e:
+            print(f"SchedulerService: Job {job_id} failed: {e}")
+            traceback.print_exc()
+            status, error = 'failed', str(e)
+        finally:
+            SchedulerRepository.release_lease(job_id, owner)
+
+        SchedulerRepository.add_history(job_id, owner, started_at, datetime.now(), status, result, error)
+        return True
+
+    @staticmethod
+    def rollup_activity() -> None:
+        SchedulerService.run_exclusive('daily_dataset_activity_rollup', ActivityRepository.rollup_activity)
+
+    @staticmethod
+    def reconcile_activity_totals() -> None:
+        SchedulerService.run_exclusive('daily_dataset_activity_totals', ActivityRepository.reconcile_activity_totals)
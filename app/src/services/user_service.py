@@ -1,14 +1,21 @@
 """
 Сервис для бизнес-логики, связанной с пользователями.
 """
+import os
 from datetime import datetime, timezone
 from typing import Optional, Tuple
 from werkzeug.security import generate_password_hash
 
 from src.repository.user_repository import UserRepository
 from src.models.user import User
+from src.util.cache import TTLCache
 import uuid
 
+# пользователи, загруженные для сессий Flask-Login.
+# Изменения в этом процессе сбрасывают запись сразу, изменения в других процессах
+# (в том числе блокировка) становятся видны не позже чем через USER_CACHE_TTL секунд
+user_cache = TTLCache(int(os.getenv('USER_CACHE_SIZE', 1024)), float(os.getenv('USER_CACHE_TTL', 30)))
+
 class UserService:
     """
     Класс-сервис для логики, связанной с пользователями.
@@ -56,6 +63,27 @@ class UserService:
         except Exception as e:
             return False, "Произошла внутренняя ошибка при регистрации."
 
+    @staticmethod
+    def load_user(user_id: str) -> Optional[User]:
+        """
+        Возвращает пользователя сессии из кэша или из БД.
+        Заблокированный пользователь не загружается, и его сессия считается анонимной.
+        """
+        user: Optional[User] = user_cache.get(user_id)
+        if user is None:
+            user = UserRepository.find_by_id(user_id)
+            if user is None:
+                return None
+            user_cache.set(user_id, user)
+        return user if user.is_active else None
+
+    @staticmethod
+    def invalidate_user(user_id: str) -> None:
+        """
+        Сбрасывает пользователя в кэше после изменения его данных в БД.
+        """
+        user_cache.pop(user_id)
+
     @staticmethod
     def update_profile(user_id: str, new_username: str, new_password: Optional[str]) -> Tuple[bool, str]:
         """
@@ -85,7 +113,9 @@ class UserService:
         # Обновление даты последнего изменения, если были изменения
         update_payload['lastAccountModificationDate'] = datetime.now(timezone.utc)
 
-        if UserRepository.update_user_fields(user_id, update_payload):
+        updated: bool = UserRepository.update_user_fields(user_id, update_payload)
+        UserService.invalidate_user(user_id)
+        if updated:
             return True, "Профиль успешно обновлен."
         else:
             return False, "Не удалось обновить профиль. Попробуйте снова."
@@ -110,7 +140,9 @@ class UserService:
             'status': 2,
         }
     
-        if not UserRepository.update_user_fields(user_id, update_payload):
+        updated: bool = UserRepository.update_user_fields(user_id, update_payload)
+        UserService.invalidate_user(user_id)
+        if not updated:
             return False, "Не удалось заблокировать профиль. Попробуйте снова."
         return True, "Профиль успешно заблокирован."
     
@@ -134,7 +166,9 @@ class UserService:
         update_payload = {
             'status': 1,
         }
-        if not UserRepository.update_user_fields(user_id, update_payload):
+        updated: bool = UserRepository.update_user_fields(user_id, update_payload)
+        UserService.invalidate_user(user_id)
+        if not updated:
             return False, "Не удалось разблокировать профиль. Попробуйте снова."
         return True, "Профиль успешно разблокирован."
     
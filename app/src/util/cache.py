@@ -0,0 +1,89 @@
+"""
+Потокобезопасный LRU-кэш в памяти процесса с ограничением времени жизни записей.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Хранит не больше `maxsize` записей, каждая живет не дольше `ttl` секунд.
+    При переполнении удаляется запись, к которой дольше всего не обращались.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize: int = maxsize
+        self.ttl: float = ttl
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._expired: int = 0
+        self._evictions: int = 0
+        self._invalidations: int = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение по ключу или None, если записи нет или она устарела.
+        """
+        with self._lock:
+            entry: Optional[tuple[float, Any]] = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._expired += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Удаляет запись, если она есть.
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        """
+        Счетчики кэша для страницы метрик.
+        """
+        with self._lock:
+            lookups: int = self._hits + self._misses
+            return {
+                'size':          len(self._entries),
+                'maxSize':       self.maxsize,
+                'ttl':           self.ttl,
+                'hits':          self._hits,
+                'misses':        self._misses,
+                'hitRatio':      self._hits / lookups if lookups else None,
+                'expired':       self._expired,
+                'evictions':     self._evictions,
+                'invalidations': self._invalidations,
+            }
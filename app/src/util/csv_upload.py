@@ -0,0 +1,395 @@
+"""
+Потоковая загрузка CSV-файлов.
+Файл из запроса копируется блоками во временный файл в директории датасетов,
+а количество строк, столбцов и байт, первые строки для предпросмотра и индекс смещений строк
+собираются в том же проходе.
+"""
+import codecs
+import csv
+import io
+import os
+import re
+import tempfile
+from array import array
+from typing import BinaryIO, Optional
+
+from werkzeug.datastructures import FileStorage
+
+CHUNK_SIZE: int = 1024 * 1024
+MAX_PREVIEW_CELL_LENGTH: int = 1000
+ROW_INDEX_STEP: int = int(os.getenv('ROW_INDEX_STEP', 1000))
+
+# строка только из этих символов считается пустой и пропускается (pandas.read_csv, skip_blank_lines)
+BLANK_CHARS: str = ' \t\r'
+BLANK_BYTES: bytes = BLANK_CHARS.encode('ascii')
+
+# запись завершается \n, \r\n или одиночным \r (как в csv.reader и pandas.read_csv)
+LINE_BREAK = re.compile(rb'(\r\n|\r|\n)')
+
+# состояния разбора поля: начало поля, поле без кавычек, поле в кавычках, кавычка внутри поля в кавычках
+FIELD_START, UNQUOTED, QUOTED, QUOTE_IN_QUOTED = range(4)
+
+# строка целиком из полей без кавычек и закрытых полей в кавычках - запись завершается на ней
+_FIELD: bytes = rb'(?:"[^"]*(?:""[^"]*)*"|[^",]*)'
+COMPLETE_LINE = re.compile(_FIELD + rb'(?:,' + _FIELD + rb')*')
+
+
+class RowIndex:
+    """
+    Индекс смещений строк CSV-файла: байтовое смещение начала каждой `step`-й записи данных
+    (без учета заголовка). Хранится рядом с файлом датасета в `<id>.idx` как массив uint64:
+    шаг, размер файла, по которому строился индекс, и сами смещения.
+    """
+
+    def __init__(self, step: int, size: int = 0, offsets: Optional[array] = None):
+        self.step: int = step
+        self.size: int = size
+        self.offsets: array = offsets if offsets is not None else array('Q')
+
+    def locate(self, row: int) -> tuple[int, int]:
+        """
+        Возвращает смещение ближайшей проиндексированной записи не после `row`
+        и количество записей, которые нужно пропустить от нее до `row`.
+        """
+        block: int = min(row // self.step, len(self.offsets) - 1)
+        return self.offsets[block], row - block * self.step
+
+    def save(self, path: str) -> None:
+        """
+        Атомарно записывает индекс в `path`. У каждой записи свой временный файл,
+        поэтому одновременные перестроения индекса одного файла не мешают друг другу.
+        """
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path),
+                                         suffix='.part', delete=False) as file:
+            array('Q', [self.step, self.size]).tofile(file)
+            self.offsets.tofile(file)
+        try:
+            os.replace(file.name, path)
+        except OSError:
+            os.remove(file.name)
+            raise
+
+    @staticmethod
+    def load(path: str) -> Optional['RowIndex']:
+        """
+        Читает индекс из `path`. Возвращает None, если файла нет или он поврежден.
+        """
+        try:
+            with open(path, 'rb') as file:
+                data = array('Q')
+                data.frombytes(file.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if len(data) < 2 or data[0] == 0:
+            return None
+        return RowIndex(data[0], data[1], data[2:])
+
+    @staticmethod
+    def path_for(filepath: str) -> str:
+        return f'{os.path.splitext(filepath)[0]}.idx'
+
+
+class CsvScanner:
+    """
+    Инкрементальный подсчет записей CSV по блокам байт.
+    Кавычка открывает поле только в его начале, внутри поля в кавычках `""` означает саму кавычку,
+    а перевод строки (\n, \r\n или \r) не завершает запись. Пустые строки и строки из одних пробелов
+    и табуляций пропускаются, BOM в начале файла отбрасывается (так же, как это делает pandas.read_csv).
+    Первые `preview_rows` записей (не более `preview_cols` полей) разбираются для предпросмотра,
+    а смещение каждой `index_step`-й записи данных сохраняется в `row_index`.
+    """
+
+    def __init__(self, preview_rows: int = 0, preview_cols: Optional[int] = None, index_step: int = ROW_INDEX_STEP):
+        self.size: int = 0
+        self.records: int = 0
+        self.header: Optional[list[str]] = None
+        self.preview: list[list[str]] = []
+        self.row_index: RowIndex = RowIndex(index_step)
+
+        self.preview_rows: int = preview_rows
+        self.preview_cols: Optional[int] = preview_cols
+
+        self._state: int = FIELD_START
+        self._pending_cr: bool = False
+        self._record_start: int = 0
+        self._record_len: int = 0
+        self._blank: bool = True
+        self._record_parts: list[bytes] = []
+
+    @property
+    def rows(self) -> int:
+        """
+        Количество записей без учета заголовка.
+        """
+        return max(self.records - 1, 0)
+
+    @property
+    def columns(self) -> int:
+        return len(self.header) if self.header else 0
+
+    @property
+    def preview_complete(self) -> bool:
+        return self.header is not None and len(self.preview) >= self.preview_rows
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Обрабатывает очередной блок байт файла.
+        """
+        self.size += len(chunk)
+        if self._pending_cr:
+            chunk = b'\r' + chunk
+            self._pending_cr = False
+        # \r в конце блока может оказаться первой половиной \r\n, решаем по следующему блоку
+        if chunk.endswith(b'\r'):
+            chunk = chunk[:-1]
+            self._pending_cr = True
+
+        if b'\r' in chunk:
+            parts: list[bytes] = LINE_BREAK.split(chunk)
+            pieces, terminators = parts[0::2], parts[1::2]
+        else:
+            pieces = chunk.split(b'\n')
+            terminators = [b'\n'] * (len(pieces) - 1)
+
+        for piece, terminator in zip(pieces, terminators):
+            self._append(piece, terminator)
+            # перевод строки внутри поля в кавычках не завершает запись
+            if self._state != QUOTED:
+                self._end_record()
+
+        self._append(pieces[-1], b'')
+
+    def close(self) -> None:
+        """
+        Завершает последнюю запись, если файл не оканчивается переводом строки.
+        """
+        if self._pending_cr:
+            self._pending_cr = False
+            self._append(b'', b'\r')
+        if self._record_len:
+            self._end_record()
+        self.row_index.size = self.size
+
+    def _append(self, piece: bytes, terminator: bytes) -> None:
+        self._scan_fields(piece, bool(terminator))
+        self._record_len += len(piece) + len(terminator)
+        if self._blank and piece.strip(BLANK_BYTES):
+            self._blank = False
+        if not self.preview_complete:
+            self._record_parts.append(piece + terminator)
+
+    def _scan_fields(self, piece: bytes, line_end: bool) -> None:
+        """
+        Продвигает состояние разбора поля по части строки без перевода строки.
+        Строка просматривается от кавычки до кавычки и от запятой до запятой, а не по байтам.
+        """
+        state: int = self._state
+        if b'"' not in piece:
+            if piece and state != QUOTED:
+                self._state = FIELD_START if piece.endswith(b',') else UNQUOTED
+            return
+        if line_end and state == FIELD_START and COMPLETE_LINE.fullmatch(piece):
+            self._state = UNQUOTED
+            return
+
+        pos: int = 0
+        while pos < len(piece):
+            if state == QUOTED:
+                pos = piece.find(b'"', pos)
+                if pos < 0:
+                    break
+                state = QUOTE_IN_QUOTED
+                pos += 1
+            elif state == QUOTE_IN_QUOTED:
+                # "" - экранированная кавычка, любой другой символ закрывает кавычки
+                if piece[pos] == ord('"'):
+                    state = QUOTED
+                    pos += 1
+                else:
+                    state = UNQUOTED
+            elif state == FIELD_START and piece[pos] == ord('"'):
+                state = QUOTED
+                pos += 1
+            else:
+                # кавычка в середине поля без кавычек - обычный символ
+                pos = piece.find(b',', pos)
+                if pos < 0:
+                    state = UNQUOTED
+                    break
+                state = FIELD_START
+                pos += 1
+        self._state = state
+
+    def _end_record(self) -> None:
+        if not self._blank:
+            if self.header is None:
+                self.header = self._parse_record(b''.join(self._record_parts).removeprefix(codecs.BOM_UTF8))
+            else:
+                if len(self.preview) < self.preview_rows:
+                    record: list[str] = self._parse_record(b''.join(self._record_parts))
+                    self.preview.append([cell[:MAX_PREVIEW_CELL_LENGTH] for cell in record[:self.preview_cols]])
+                if (self.records - 1) % self.row_index.step == 0:
+                    self.row_index.offsets.append(self._record_start)
+            self.records += 1
+
+        self._state = FIELD_START
+        self._record_start += self._record_len
+        self._record_len = 0
+        self._blank = True
+        self._record_parts = []
+
+    @staticmethod
+    def _parse_record(record: bytes) -> list[str]:
+        """
+        Разбирает одну запись. Ошибка разбора (например, слишком длинное поле) выбрасывается как ValueError.
+        """
+        text: str = record.decode('utf-8', errors='replace').rstrip('\r\n')
+        try:
+            return next(csv.reader([text]), [])
+        except csv.Error as e:
+            raise ValueError(f'Invalid CSV record: {e}') from e
+
+
+class UploadedCsv:
+    """
+    Загруженный CSV-файл, сохраненный во временный файл в директории датасетов.
+    """
+
+    def __init__(self, path: str, rows: int, columns: int, size: int,
+                 header: list[str], preview: list[list[str]], row_index: Optional[RowIndex] = None):
+        self.path: str = path
+        self.rows: int = rows
+        self.columns: int = columns
+        self.size: int = size
+        self.header: list[str] = header
+        self.preview: list[list[str]] = preview
+        self.row_index: Optional[RowIndex] = row_index
+
+    def move_to(self, filepath: str) -> None:
+        """
+        Атомарно переименовывает временный файл в `filepath` и сохраняет рядом индекс смещений строк.
+        """
+        os.replace(self.path, filepath)
+        self.path = filepath
+        if self.row_index is not None:
+            self.row_index.save(RowIndex.path_for(filepath))
+
+    def discard(self) -> None:
+        """
+        Удаляет временный файл, если он еще существует.
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def spool_csv_upload(file_storage: Optional[FileStorage], directory: str,
+                     preview_rows: int = 0, preview_cols: Optional[int] = None) -> Optional[UploadedCsv]:
+    """
+    Копирует файл из запроса во временный файл в `directory` блоками по CHUNK_SIZE байт.
+    Возвращает None, если файл не был передан.
+    """
+    if file_storage is None or not file_storage.filename:
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=directory)
+
+    scanner = CsvScanner(preview_rows, preview_cols)
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            _copy_stream(file_storage.stream, tmp_file, scanner)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return UploadedCsv(tmp_path, scanner.rows, scanner.columns, scanner.size,
+                       scanner.header or [], scanner.preview, scanner.row_index)
+
+
+def read_csv_preview(filepath: str, preview_rows: int, preview_cols: int) -> tuple[list[str], list[list[str]]]:
+    """
+    Читает заголовок и первые `preview_rows` записей уже сохраненного файла.
+    Файл читается блоками только до тех пор, пока предпросмотр не собран.
+    """
+    scanner = CsvScanner(preview_rows, preview_cols)
+    with open(filepath, 'rb') as file:
+        while not scanner.preview_complete:
+            chunk: bytes = file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            scanner.feed(chunk)
+    scanner.close()
+    return scanner.header or [], scanner.preview
+
+
+def build_row_index(filepath: str, index_step: int = ROW_INDEX_STEP) -> RowIndex:
+    """
+    Строит индекс смещений строк для уже сохраненного файла (например, загруженного до появления индекса)
+    и сохраняет его рядом с файлом.
+    """
+    scanner = CsvScanner(index_step=index_step)
+    with open(filepath, 'rb') as file:
+        while chunk := file.read(CHUNK_SIZE):
+            scanner.feed(chunk)
+    scanner.close()
+
+    scanner.row_index.save(RowIndex.path_for(filepath))
+    return scanner.row_index
+
+
+def get_row_index(filepath: str) -> RowIndex:
+    """
+    Возвращает индекс смещений строк файла. Отсутствующий или устаревший индекс строится заново.
+    """
+    row_index: Optional[RowIndex] = RowIndex.load(RowIndex.path_for(filepath))
+    if row_index is None or row_index.size != os.path.getsize(filepath):
+        row_index = build_row_index(filepath)
+    return row_index
+
+
+def read_csv_rows(filepath: str, offset: int, limit: int, max_cols: Optional[int] = None) -> list[list[str]]:
+    """
+    Читает записи данных с номерами [offset, offset + limit).
+    По индексу смещений файл открывается сразу около нужной записи, поэтому разбирается
+    не более ROW_INDEX_STEP + limit записей независимо от размера файла.
+    """
+    row_index: RowIndex = get_row_index(filepath)
+    if limit <= 0 or not row_index.offsets:
+        return []
+
+    start, skip = row_index.locate(offset)
+    rows: list[list[str]] = []
+    with open(filepath, 'rb') as file:
+        file.seek(start)
+        text = io.TextIOWrapper(file, encoding='utf-8', errors='replace', newline='')
+        for record in csv.reader(text):
+            # пустые строки и строки из пробелов не считаются записями, как и при подсчете строк
+            if not record or (len(record) == 1 and not record[0].strip(BLANK_CHARS)):
+                continue
+            if skip > 0:
+                skip -= 1
+                continue
+            rows.append([cell[:MAX_PREVIEW_CELL_LENGTH] for cell in record[:max_cols]])
+            if len(rows) >= limit:
+                break
+    return rows
+
+
+def remove_row_index(filepath: str) -> None:
+    try:
+        os.remove(RowIndex.path_for(filepath))
+    except FileNotFoundError:
+        pass
+
+
+def _copy_stream(source: BinaryIO, target: BinaryIO, scanner: CsvScanner) -> None:
+    while True:
+        chunk: bytes = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        target.write(chunk)
+        scanner.feed(chunk)
+    scanner.close()
@@ -0,0 +1,75 @@
+"""
+Поиск датасетов по названию и описанию.
+При добавлении и изменении датасета в документ записываются поля для поиска:
+    searchName     - нормализованное название (нижний регистр, схлопнутые пробелы);
+    searchTrigrams - все подстроки нормализованного названия длиной 3 символа;
+    searchTokens   - слова названия и описания.
+По searchTrigrams и searchTokens построены multikey-индексы, поэтому поиск подстроки
+не просматривает все названия, а выбирает кандидатов по индексу.
+"""
+import re
+from typing import Optional
+
+MIN_TRIGRAM_QUERY: int = 3
+MAX_TOKENS: int = 256
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text: Optional[str]) -> str:
+    return ' '.join((text or '').casefold().split())
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    """
+    Разбивает текст на уникальные слова в нижнем регистре с сохранением порядка.
+    """
+    return list(dict.fromkeys(_WORD_RE.findall(normalize(text))))
+
+
+def trigrams(text: str) -> list[str]:
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def search_fields(name: str, description: str) -> dict:
+    """
+    Поля документа датасета, по которым выполняется поиск.
+    """
+    search_name: str = normalize(name)
+    return {
+        'searchName': search_name,
+        'searchTrigrams': trigrams(search_name),
+        'searchTokens': list(dict.fromkeys(tokenize(name) + tokenize(description)))[:MAX_TOKENS],
+    }
+
+
+def search_query(text: str) -> tuple[dict, dict]:
+    """
+    Возвращает условие поиска для $match и выражение релевантности для $addFields.
+
+    Датасет найден, если его название содержит запрос как подстроку (кандидаты выбираются
+    по индексу триграмм и проверяются регулярным выражением только среди них)
+    или если его название и описание содержат все слова запроса.
+    Запрос короче трех символов ищется как начало слова по индексу слов.
+    """
+    query: str = normalize(text)
+    words: list[str] = tokenize(text)
+
+    if len(query) >= MIN_TRIGRAM_QUERY:
+        by_name: dict = {
+            'searchTrigrams': {'$all': trigrams(query)},
+            'searchName': {'$regex': re.escape(query)}
+        }
+    else:
+        by_name = {'searchTokens': {'$regex': f'^{re.escape(query)}'}}
+
+    condition: dict = {'$or': [by_name, {'searchTokens': {'$all': words}}]} if words else by_name
+
+    position: dict = {'$indexOfCP': [{'$ifNull': ['$searchName', '']}, query]}
+    score: dict = {'$add': [
+        {'$cond': [{'$eq': ['$searchName', query]}, 8, 0]},
+        {'$cond': [{'$eq': [position, 0]}, 4, 0]},
+        {'$cond': [{'$gte': [position, 0]}, 2, 0]},
+        {'$size': {'$setIntersection': [{'$ifNull': ['$searchTokens', []]}, words]}},
+    ]}
+    return condition, score
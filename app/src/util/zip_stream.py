@@ -0,0 +1,92 @@
+"""
+Потоковая запись ZIP-архива: архив отдается частями по мере чтения файлов, не собираясь целиком
+ни в памяти, ни на диске. В памяти одновременно находится не больше одного блока каждого файла.
+"""
+import io
+import subprocess
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+CHUNK_SIZE: int = 1024 * 1024
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Файл только для записи без поддержки seek: ZipFile пишет в него заголовки с дескрипторами данных,
+    а записанные байты забираются методом drain.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> Iterator[bytes]:
+        chunks, self._chunks = self._chunks, []
+        yield from chunks
+
+
+def stream_zip(entries: Iterable[tuple[zipfile.ZipInfo, Iterable[bytes]]],
+               compression: int = zipfile.ZIP_DEFLATED) -> Iterator[bytes]:
+    """
+    Генерирует байты ZIP-архива из пар (заголовок записи, блоки содержимого).
+    Блоки читаются лениво, поэтому команда или файл записи открываются только когда до нее дошла очередь.
+    Для записей с неизвестным размером (file_size == 0) включается ZIP64.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression) as archive:
+        for info, chunks in entries:
+            info.compress_type = compression
+            try:
+                with archive.open(info, 'w', force_zip64=not info.file_size) as entry:
+                    for chunk in chunks:
+                        entry.write(chunk)
+                        yield from sink.drain()
+            finally:
+                # при обрыве соединения завершаем источник сразу, а не при сборке мусора
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    close()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def stream_entry(name: str) -> zipfile.ZipInfo:
+    """
+    Заголовок записи, размер которой заранее неизвестен.
+    """
+    return zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+
+
+def file_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def command_chunks(cmd: list[str], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Читает стандартный вывод команды блоками. Если чтение прервано, процесс завершается;
+    если команда завершилась с ошибкой, выбрасывается CalledProcessError.
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        while chunk := process.stdout.read(chunk_size):
+            yield chunk
+    except GeneratorExit:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        process.stdout.close()
+
+    return_code: Optional[int] = process.wait()
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, cmd[0])
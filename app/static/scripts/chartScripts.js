@@ -0,0 +1,167 @@
+// Ленивая загрузка графиков столбцов и их отрисовка по предвычисленным данным (CHART_MODE=data).
+
+const CHART_WIDTH = 400;
+const CHART_HEIGHT = 200;
+const CHART_PADDING = 18;
+const CHART_FILL = 'rgba(135, 206, 235, 0.8)';
+const CHART_LINE = 'rgb(70, 130, 180)';
+const CHART_TEXT = 'rgb(90, 90, 90)';
+
+const plotRequests = new Map();
+
+// Графики загружаются по одному, когда их ячейка становится видимой.
+// URL содержит версию графиков, поэтому браузер может брать ответ из кэша.
+function lazyLoadCharts(datasetId, version) {
+    const observer = new IntersectionObserver(entries => {
+        entries.filter(entry => entry.isIntersecting).forEach(entry => {
+            const cell = entry.target;
+            observer.unobserve(cell);
+            fetchPlot(datasetId, cell.dataset.plot, version)
+                .then(plot => fillChart(cell, plot, cell.dataset.chart))
+                .catch(error => console.error('Error:', error));
+        });
+    });
+    document.querySelectorAll('[data-plot]').forEach(cell => observer.observe(cell));
+}
+
+function fetchPlot(datasetId, name, version) {
+    if (!plotRequests.has(name)) {
+        const request = fetch(`${FLASK_ROOT_URL}/dataset/${datasetId}/plots/${name}?v=${version}`)
+            .then(response => {
+                if (!response.ok)
+                    throw new Error('Response is not ok');
+                return response.json();
+            });
+        plotRequests.set(name, request);
+    }
+    return plotRequests.get(name);
+}
+
+function fillChart(cell, plot, chart) {
+    if (plot.hist !== undefined || plot.categories !== undefined) {
+        const canvas = document.createElement('canvas');
+        cell.replaceChildren(canvas);
+        drawChart(canvas, plot, chart);
+    } else {
+        // графики, сохраненные в режиме CHART_MODE=svg
+        cell.innerHTML = chart === 'violin' ? plot.violin : plot.data;
+    }
+}
+
+function drawChart(canvas, plot, chart) {
+    canvas.width = CHART_WIDTH;
+    canvas.height = CHART_HEIGHT;
+    const ctx = canvas.getContext('2d');
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+
+    if (plot.kind === 'categorical') {
+        drawCategories(ctx, plot.categories);
+    } else if (chart === 'violin') {
+        // у графиков, построенных до появления отдельной плотности скрипичной диаграммы, ее нет
+        drawViolin(ctx, plot.violin || plot.kde, plot.quartiles);
+    } else {
+        drawHistogram(ctx, plot.hist, plot.kde);
+    }
+}
+
+function scaleLinear(domainMin, domainMax, rangeMin, rangeMax) {
+    const span = (domainMax - domainMin) || 1;
+    return value => rangeMin + (value - domainMin) / span * (rangeMax - rangeMin);
+}
+
+function formatTick(value) {
+    return Number.parseFloat(value.toPrecision(3)).toString();
+}
+
+function drawHistogram(ctx, hist, kde) {
+    const edges = hist.edges;
+    const maxCount = Math.max(...hist.counts, ...kde.y);
+    const x = scaleLinear(edges[0], edges[edges.length - 1], CHART_PADDING, CHART_WIDTH - CHART_PADDING);
+    const y = scaleLinear(0, maxCount, CHART_HEIGHT - CHART_PADDING, CHART_PADDING);
+
+    ctx.fillStyle = CHART_FILL;
+    ctx.strokeStyle = 'white';
+    hist.counts.forEach((count, i) => {
+        const left = x(edges[i]);
+        const width = x(edges[i + 1]) - left;
+        ctx.fillRect(left, y(count), width, y(0) - y(count));
+        ctx.strokeRect(left, y(count), width, y(0) - y(count));
+    });
+
+    ctx.strokeStyle = CHART_LINE;
+    ctx.lineWidth = 1.5;
+    ctx.beginPath();
+    kde.x.forEach((value, i) => {
+        const px = Math.min(Math.max(x(value), CHART_PADDING), CHART_WIDTH - CHART_PADDING);
+        if (i === 0)
+            ctx.moveTo(px, y(kde.y[i]));
+        else
+            ctx.lineTo(px, y(kde.y[i]));
+    });
+    ctx.stroke();
+
+    drawXTicks(ctx, [edges[0], edges[edges.length - 1]], x);
+}
+
+function drawViolin(ctx, kde, quartiles) {
+    const center = CHART_WIDTH / 2;
+    const halfWidth = CHART_WIDTH / 4;
+    const maxDensity = Math.max(...kde.y);
+    const y = scaleLinear(kde.x[0], kde.x[kde.x.length - 1], CHART_HEIGHT - CHART_PADDING, CHART_PADDING);
+    const w = scaleLinear(0, maxDensity, 0, halfWidth);
+
+    ctx.fillStyle = CHART_FILL;
+    ctx.beginPath();
+    kde.x.forEach((value, i) => ctx.lineTo(center - w(kde.y[i]), y(value)));
+    for (let i = kde.x.length - 1; i >= 0; i--)
+        ctx.lineTo(center + w(kde.y[i]), y(kde.x[i]));
+    ctx.closePath();
+    ctx.fill();
+
+    const [min, q1, median, q3, max] = quartiles;
+    ctx.strokeStyle = CHART_TEXT;
+    ctx.lineWidth = 1.5;
+    ctx.beginPath();
+    ctx.moveTo(center, y(min));
+    ctx.lineTo(center, y(max));
+    ctx.stroke();
+
+    ctx.fillStyle = CHART_TEXT;
+    ctx.fillRect(center - 4, y(q3), 8, y(q1) - y(q3));
+    ctx.fillStyle = 'white';
+    ctx.beginPath();
+    ctx.arc(center, y(median), 3, 0, 2 * Math.PI);
+    ctx.fill();
+
+    ctx.fillStyle = CHART_TEXT;
+    ctx.font = '11px sans-serif';
+    ctx.textAlign = 'left';
+    ctx.fillText(formatTick(max), 2, y(max) + 4);
+    ctx.fillText(formatTick(min), 2, y(min) + 4);
+}
+
+function drawCategories(ctx, categories) {
+    const count = categories.counts.length;
+    const maxCount = Math.max(...categories.counts);
+    const slot = (CHART_WIDTH - 2 * CHART_PADDING) / count;
+    const y = scaleLinear(0, maxCount, CHART_HEIGHT - CHART_PADDING, CHART_PADDING);
+
+    ctx.fillStyle = CHART_FILL;
+    categories.counts.forEach((value, i) => {
+        ctx.fillRect(CHART_PADDING + i * slot + slot * 0.1, y(value), slot * 0.8, y(0) - y(value));
+    });
+
+    ctx.fillStyle = CHART_TEXT;
+    ctx.font = '11px sans-serif';
+    ctx.textAlign = 'center';
+    categories.labels.forEach((label, i) => {
+        ctx.fillText(label, CHART_PADDING + (i + 0.5) * slot, CHART_HEIGHT - 4, slot);
+    });
+}
+
+function drawXTicks(ctx, values, x) {
+    ctx.fillStyle = CHART_TEXT;
+    ctx.font = '11px sans-serif';
+    ctx.textAlign = 'center';
+    values.forEach(value => ctx.fillText(formatTick(value), x(value), CHART_HEIGHT - 4));
+}
@@ -103,8 +103,36 @@ function deleteDataset(datasetId) {
         });
 }
 
+let activityCharts = [];
+
+// Ряд за выбранный период: по дням, неделям или месяцам в зависимости от длины периода.
+function loadActivity(datasetId, item) {
+    const to = new Date();
+    const from = new Date(to.getTime() - (Number.parseInt(item.dataset.days) - 1) * 24 * 60 * 60 * 1000);
+    const isoDate = value => value.toISOString().slice(0, 10);
+
+    fetch(`${FLASK_ROOT_URL}/dataset/${datasetId}/activity?from=${isoDate(from)}&to=${isoDate(to)}`)
+        .then(response => {
+            if (!response.ok)
+                throw new Error('Response is not ok');
+            return response.json();
+        })
+        .then(json => {
+            document.querySelectorAll('.activity-range .item').forEach(element => element.classList.remove('active'));
+            item.classList.add('active');
+            drawViewsDownloadsPlots(json);
+        })
+        .catch(error => {
+            console.error('Error:', error);
+        });
+}
+
 function createViewsDownloadsPlots(statistics) {
-    statistics = JSON.parse(statistics.replaceAll("&#39;",'"'))
+    drawViewsDownloadsPlots(JSON.parse(statistics.replaceAll("&#39;",'"')));
+}
+
+function drawViewsDownloadsPlots(statistics) {
+    activityCharts.forEach(chart => chart.destroy());
 
     const views = document.getElementById("views-plot");
     const downloads = document.getElementById("downloads-plot");
@@ -135,7 +163,7 @@ function createViewsDownloadsPlots(statistics) {
         options: options
     };
 
-    new Chart(views, ViewsConfig);
+    const viewsChart = new Chart(views, ViewsConfig);
 
     const DownloadsData = {
     labels: labels,
@@ -153,7 +181,8 @@ function createViewsDownloadsPlots(statistics) {
         data: DownloadsData,
         options: options
     };
-    new Chart(downloads, DownloadsConfig);
+    const downloadsChart = new Chart(downloads, DownloadsConfig);
+    activityCharts = [viewsChart, downloadsChart];
 }
 
 if (document.getElementById('csvUpload') !== null) {
@@ -183,6 +212,77 @@ if (document.getElementById('name') !== null) {
 
 
 
+const JOBS_POLL_INTERVAL = 2000;
+
+function waitForPlots(datasetId) {
+    fetch(FLASK_ROOT_URL + "/dataset/" + datasetId + "/jobs")
+        .then(response => {
+            if (!response.ok)
+                throw new Error('Response is not ok');
+            return response.json();
+        })
+        .then(json => {
+            if (json.pending) {
+                setTimeout(() => waitForPlots(datasetId), JOBS_POLL_INTERVAL);
+            } else {
+                document.location.reload();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+        });
+}
+
+let rowsDatasetId = null;
+let rowsOffset = 0;
+let rowsLimit = 0;
+let rowsTotal = 0;
+let rowsTruncatedCols = false;
+
+function initRowsPager(datasetId, limit, total, truncatedCols) {
+    rowsDatasetId = datasetId;
+    rowsLimit = limit;
+    rowsTotal = total;
+    rowsTruncatedCols = truncatedCols;
+}
+
+// Страница строк загружается с сервера, который читает файл с ближайшего смещения из индекса строк.
+function showRowsPage(offset) {
+    if (offset < 0 || offset >= rowsTotal)
+        return;
+
+    fetch(`${FLASK_ROOT_URL}/dataset/${rowsDatasetId}/rows?offset=${offset}&limit=${rowsLimit}`)
+        .then(response => {
+            if (!response.ok)
+                throw new Error('Response is not ok');
+            return response.json();
+        })
+        .then(json => {
+            const tbody = document.querySelector('.data-table tbody');
+            tbody.querySelectorAll('.data-row').forEach(row => row.remove());
+
+            json.rows.forEach(cells => {
+                const row = document.createElement('tr');
+                row.className = 'data-row';
+                if (rowsTruncatedCols)
+                    cells = cells.concat(['...']);
+                cells.forEach(value => {
+                    const cell = document.createElement('td');
+                    cell.textContent = value;
+                    row.appendChild(cell);
+                });
+                tbody.appendChild(row);
+            });
+
+            rowsOffset = json.offset;
+            const last = Math.min(json.offset + json.rows.length, json.total);
+            document.getElementById('rows-range').textContent = `${json.offset + 1} - ${last} из ${json.total}`;
+        })
+        .catch(error => {
+            console.error('Error:', error);
+        });
+}
+
 let currentPage = 1;
 
 function showPage(page) {
@@ -25,7 +25,29 @@ filterForm.addEventListener('submit', (e) => {
         return;
     }
 
-    fetch(FILTER_URL, {
+    // новый запрос фильтрации начинает список с первой страницы
+    currentFilters = formData;
+    nextToken = null;
+    requestPage(null, json => redrawCards(json.items));
+})
+
+const container = document.getElementById('cards-container');
+const sentinel = document.getElementById('cards-sentinel');
+
+// фильтры, с которыми загружены текущие карточки, и токен их следующей страницы
+let currentFilters = new FormData(filterForm);
+let nextToken = sentinel.dataset.next || null;
+let pageRequest = null;
+
+function requestPage(after, onItems) {
+    const formData = new FormData();
+    for (const [key, value] of currentFilters.entries())
+        formData.append(key, value);
+    if (after !== null)
+        formData.append('after', after);
+
+    const filters = currentFilters;
+    pageRequest = fetch(FILTER_URL, {
         method: 'POST',
         body: formData,
     }).then(response => {
@@ -33,26 +55,49 @@ filterForm.addEventListener('submit', (e) => {
             throw new Error('Response is not ok');
         return response.json();
     }).then(json => {
-        redrawCards(json);
+        // ответ для уже замененных фильтров не нужен
+        if (filters !== currentFilters)
+            return;
+        onItems(json);
+        nextToken = json.next;
     }).catch(error => {
         console.error('Error:', error);
+    }).finally(() => {
+        if (filters !== currentFilters)
+            return;
+        pageRequest = null;
+        // наблюдатель не сработает повторно, если после загрузки страницы sentinel остался видимым
+        if (sentinel.getBoundingClientRect().top < window.innerHeight + 400)
+            loadNextPage();
     });
-})
+}
 
-const container = document.getElementById('cards-container');
+function loadNextPage() {
+    if (nextToken === null || pageRequest !== null)
+        return;
+    requestPage(nextToken, json => appendCards(json.items));
+}
+
+new IntersectionObserver(entries => {
+    if (entries.some(entry => entry.isIntersecting))
+        loadNextPage();
+}, {rootMargin: '400px'}).observe(sentinel);
 
 function redrawCards(arrayOfBriefs) {
     container.replaceChildren();
-
-    for (let brief of arrayOfBriefs) {
-        container.appendChild(createCard(brief));
-    }
+    appendCards(arrayOfBriefs);
 
     if (arrayOfBriefs.length !== 0) {
         container.scrollIntoView({behavior: 'smooth', block: 'start'})
     }
 }
 
+function appendCards(arrayOfBriefs) {
+    for (let brief of arrayOfBriefs) {
+        container.appendChild(createCard(brief));
+    }
+}
+
 function createCard(brief) {
     const card = document.createElement('a');
     card.className = 'ui card';
@@ -34,8 +34,8 @@ fileInput.addEventListener('change', (e) => {
 
     if (e.target.files.length > 0) {
         document.getElementById('file-error').style.display = 'none';
-        label.textContent = e.target.files[0].name;
+        label.textContent = Array.from(e.target.files, file => file.name).join(', ');
     } else {
-        label.textContent = 'Загрузить ZIP файл';
+        label.textContent = 'Загрузить ZIP файлы';
     }
 });
\ No newline at end of file
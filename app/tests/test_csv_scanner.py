@@ -0,0 +1,70 @@
+"""
+Подсчет записей, заголовок, предпросмотр и чтение страниц CsvScanner сверяются с pandas.read_csv.
+"""
+import io
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from src.util.csv_upload import CsvScanner, build_row_index, read_csv_rows  # noqa: E402
+
+CASES = {
+    'quote_in_unquoted_field': b'a,b\n5" tv,1\n2,3\n',
+    'cr_line_endings':         b'a,b\r1,2\r3,4\r',
+    'crlf_line_endings':       b'a,b\r\n1,2\r\n3,4\r\n',
+    'blank_lines':             b'a,b\n\n1,2\n \t\n3,4\n\n',
+    'bom':                     b'\xef\xbb\xbfa,b\n1,2\n',
+    'quoted_newlines':         b'a,b\n"x\ny",1\n"p\r\nq\rr",2\n',
+    'escaped_quotes':          b'a,b\n"x""\ny",1\n"""",2\n',
+    'quote_after_space':       b'a,b\n1, "x\ny",z\n2,3\n',
+    'quote_then_text':         b'a,b\n"x"y,1\n2,3\n',
+    'no_trailing_newline':     b'a,b\n1,2\n3,4',
+}
+
+
+def _scan(data: bytes, chunk_size: int) -> CsvScanner:
+    scanner = CsvScanner(preview_rows=100, index_step=1)
+    for pos in range(0, len(data), chunk_size):
+        scanner.feed(data[pos:pos + chunk_size])
+    scanner.close()
+    return scanner
+
+
+def _expected(data: bytes):
+    frame = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+    return list(frame.columns), frame.values.tolist()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 1024])
+@pytest.mark.parametrize('name', CASES)
+def test_scanner_matches_pandas(name, chunk_size):
+    data: bytes = CASES[name]
+    header, rows = _expected(data)
+
+    scanner = _scan(data, chunk_size)
+
+    assert scanner.header == header
+    assert scanner.rows == len(rows)
+    assert scanner.columns == len(header)
+    assert scanner.preview == rows
+    assert scanner.size == len(data)
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_read_csv_rows_matches_pandas(name, tmp_path):
+    data: bytes = CASES[name]
+    _, rows = _expected(data)
+    filepath = tmp_path / 'dataset.csv'
+    filepath.write_bytes(data)
+
+    build_row_index(str(filepath), index_step=1)
+
+    for offset in range(len(rows)):
+        assert read_csv_rows(str(filepath), offset, 1) == rows[offset:offset + 1]
+
+
+def test_invalid_record_is_value_error():
+    data: bytes = b'a\n"' + b'x' * 200000 + b'"\n'
+    with pytest.raises(ValueError):
+        _scan(data, 1024)
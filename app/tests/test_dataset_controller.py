@@ -0,0 +1,47 @@
+"""
+Ответы контроллера датасетов на запросы к несуществующему датасету и на некорректный файл.
+"""
+import io
+
+import pytest
+
+flask = pytest.importorskip('flask')
+pytest.importorskip('pymongo')
+pytest.importorskip('flask_login')
+
+import src.repository.dataset_repository as dataset_repository  # noqa: E402
+from src.controllers.dataset_controller import DatasetController  # noqa: E402
+
+
+class _EmptyCollection:
+    def find_one(self, *args, **kwargs):
+        return None
+
+
+@pytest.fixture
+def empty_db(monkeypatch):
+    monkeypatch.setattr(dataset_repository, 'db', {'DatasetInfoCollection': _EmptyCollection()})
+
+
+def test_get_rows_of_unknown_dataset_is_404(empty_db):
+    app = flask.Flask(__name__)
+    with app.test_request_context('/dataset/unknown/rows?offset=0&limit=10'):
+        response = DatasetController.get_rows('unknown', flask.request)
+
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Dataset not found'}
+
+
+def test_add_dataset_with_unparsable_csv_is_400(tmp_path):
+    app = flask.Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    data = {
+        'name': 'dataset',
+        'description': '',
+        'dataset': (io.BytesIO(b'a\n"' + b'x' * 200000 + b'"\n'), 'dataset.csv'),
+    }
+    with app.test_request_context('/dataset', method='POST', data=data):
+        response = DatasetController.add_dataset(flask.request)
+
+    assert response.code == 400
+    assert list(tmp_path.iterdir()) == []